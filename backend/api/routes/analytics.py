@@ -15,7 +15,7 @@ from core.ai.privacy_config import privacy_manager
 from core.database import SupabaseManager
 from core.config import settings
 from models.api_models import ApiResponse
-from core.app_state import get_smart_engine as get_global_engine
+from core.app_state import get_smart_engine as get_global_engine, get_database
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
@@ -97,7 +97,8 @@ async def get_smart_metrics(
 async def get_behavior_patterns(
     date_filter: Optional[date] = Query(None, description="Filtrar por data específica"),
     hours: int = Query(24, ge=1, le=168, description="Últimas N horas"),
-    engine: SmartAnalyticsEngine = Depends(get_smart_engine)
+    engine: SmartAnalyticsEngine = Depends(get_smart_engine),
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Obter padrões comportamentais detalhados
@@ -113,10 +114,6 @@ async def get_behavior_patterns(
         - Trajetórias mais comuns
     """
     try:
-        # Obter dados históricos do banco
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         # Calcular período
         end_time = datetime.now()
         if date_filter:
@@ -428,7 +425,7 @@ async def get_analytics_health(
         }
 
 @router.get("/realtime-data", response_model=Dict[str, Any])
-async def get_realtime_analytics():
+async def get_realtime_analytics(db: SupabaseManager = Depends(get_database)):
     """
     Obter dados de analytics em tempo real do Supabase
     
@@ -438,10 +435,6 @@ async def get_realtime_analytics():
         - Alertas ativos
     """
     try:
-        # Obter dados reais do banco
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         # Usar método específico para dados em tempo real
         realtime_data = await db.get_realtime_analytics_data()
         
@@ -460,7 +453,8 @@ async def get_realtime_analytics():
 
 @router.get("/flow-visualization", response_model=Dict[str, Any])
 async def get_flow_visualization(
-    hours: int = Query(24, ge=1, le=168, description="Período em horas")
+    hours: int = Query(24, ge=1, le=168, description="Período em horas"),
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Obter dados reais para visualização de fluxo de clientes do Supabase
@@ -474,10 +468,6 @@ async def get_flow_visualization(
         - Pontos de interesse
     """
     try:
-        # Obter dados reais do banco
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         # Usar método específico para dados de flow
         flow_data = await db.get_flow_visualization_data(hours)
         
@@ -497,7 +487,8 @@ async def get_flow_visualization(
 
 @router.get("/group-analysis", response_model=Dict[str, Any])
 async def get_group_analysis(
-    days: int = Query(7, ge=1, le=30, description="Período em dias")
+    days: int = Query(7, ge=1, le=30, description="Período em dias"),
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Obter análise real de grupos de clientes do Supabase
@@ -511,10 +502,6 @@ async def get_group_analysis(
         - Padrões de compra em grupo
     """
     try:
-        # Obter dados reais do banco
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         # Usar método específico para análise de grupos
         group_data = await db.get_group_analysis_data(days)
         
@@ -535,7 +522,8 @@ async def get_group_analysis(
 @router.get("/period-comparison", response_model=Dict[str, Any])
 async def get_period_comparison(
     current_period: str = Query(..., description="Período atual (YYYY-MM-DD to YYYY-MM-DD)"),
-    comparison_period: str = Query(..., description="Período de comparação (YYYY-MM-DD to YYYY-MM-DD)")
+    comparison_period: str = Query(..., description="Período de comparação (YYYY-MM-DD to YYYY-MM-DD)"),
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Comparar métricas reais entre dois períodos do Supabase
@@ -550,10 +538,6 @@ async def get_period_comparison(
         - Insights sobre mudanças
     """
     try:
-        # Obter dados reais do banco
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         # Usar método específico para comparação de períodos
         comparison_data = await db.get_period_comparison_data(current_period, comparison_period)
         
@@ -577,7 +561,8 @@ async def get_period_comparison(
 @router.get("/benchmarks", response_model=Dict[str, Any])
 async def get_industry_benchmarks(
     industry: str = Query("retail", description="Setor da indústria"),
-    store_size: str = Query("medium", description="Tamanho da loja (small/medium/large)")
+    store_size: str = Query("medium", description="Tamanho da loja (small/medium/large)"),
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Obter benchmarks reais da indústria para comparação
@@ -592,10 +577,6 @@ async def get_industry_benchmarks(
         - Oportunidades de melhoria
     """
     try:
-        # Obter dados reais do banco
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         # Usar método específico para benchmarks
         benchmark_data = await db.get_industry_benchmarks_data(industry, store_size)
         
@@ -613,17 +594,13 @@ async def get_industry_benchmarks(
         )
 
 @router.get("/dashboard", response_model=Dict[str, Any])
-async def get_dashboard_metrics():
+async def get_dashboard_metrics(db: SupabaseManager = Depends(get_database)):
     """
     Obter métricas do dashboard em tempo real
 
     Retorna dados reais do Supabase para uso no frontend
     """
     try:
-        # Obter dados reais do banco
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-
         # Buscar métricas do dashboard
         dashboard_data = await db.get_dashboard_metrics()
 
@@ -650,17 +627,13 @@ async def get_dashboard_metrics():
         )
 
 @router.get("/real-time", response_model=Dict[str, Any])
-async def get_real_time_analytics():
+async def get_real_time_analytics(db: SupabaseManager = Depends(get_database)):
     """
     Obter analytics em tempo real incluindo funcionários ativos e métricas anteriores
 
     Retorna dados para comparação de trends
     """
     try:
-        # Obter dados reais do banco
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-
         # Buscar dados atuais
         current_stats = await db.get_current_stats()
 
@@ -700,7 +673,8 @@ async def get_real_time_analytics():
 async def get_flow_data(
     start: str = Query(..., description="Data/hora de início (ISO format)"),
     end: str = Query(..., description="Data/hora de fim (ISO format)"),
-    period: str = Query("24h", description="Período (24h, 7d, 30d)")
+    period: str = Query("24h", description="Período (24h, 7d, 30d)"),
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Obter dados de fluxo em tempo real para gráficos
@@ -713,10 +687,6 @@ async def get_flow_data(
     Retorna dados históricos reais de fluxo por hora
     """
     try:
-        # Obter dados reais do banco
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-
         # Buscar eventos de câmera no período
         camera_events = await db.get_camera_events(
             camera_id=None,  # Todas as câmeras
@@ -777,7 +747,7 @@ import json
 import asyncio
 
 @router.get("/stream")
-async def stream_real_time_events():
+async def stream_real_time_events(db: SupabaseManager = Depends(get_database)):
     """
     Stream de eventos em tempo real via Server-Sent Events (SSE)
 
@@ -785,10 +755,6 @@ async def stream_real_time_events():
     """
     async def event_generator():
         try:
-            # Configurar conexão com dados reais
-            db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-            await db.initialize()
-
             while True:
                 try:
                     # Buscar eventos recentes (últimos 10 segundos)
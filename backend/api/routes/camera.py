@@ -15,9 +15,12 @@ from loguru import logger
 
 # Imports internos
 from core.detector import YOLOPersonDetector
+from core.tracker import detector_confidence
 from core.ai.smart_analytics_engine import SmartAnalyticsEngine  # DESCOMENTAR
 from core.database import SupabaseManager
-from core.app_state import get_smart_engine  # ADICIONAR
+from core.event_writer import EventWriter
+from core.pipeline_state import DETECTED, GATED
+from core.app_state import get_smart_engine, get_pipelines, get_database, get_event_writer  # ADICIONAR
 from core.config import settings
 from models.api_models import CameraConfigData
 
@@ -31,7 +34,19 @@ async def get_detector():
     """Singleton do detector YOLO11"""
     global detector
     if detector is None:
-        detector = YOLOPersonDetector()
+        detector = YOLOPersonDetector(
+            model_path=settings.YOLO_MODEL,
+            confidence=detector_confidence(settings.TRACKER_ENGINE, settings.YOLO_CONFIDENCE, settings.TRACKER_LOW_THRESHOLD),
+            iou=settings.YOLO_IOU,
+            max_batch_size=settings.YOLO_BATCH_SIZE,
+            max_batch_wait_ms=settings.YOLO_BATCH_TIMEOUT_MS,
+            inference_workers=settings.YOLO_INFERENCE_WORKERS,
+            torch_threads=settings.YOLO_TORCH_THREADS,
+            engine=settings.YOLO_ENGINE,
+            export_dir=settings.YOLO_EXPORT_DIR,
+            imgsz=settings.YOLO_IMGSZ,
+            calibration_dir=settings.YOLO_INT8_CALIBRATION_DIR or None
+        )
         await detector.load_model()
     return detector
 
@@ -57,7 +72,8 @@ async def process_camera_frame(
     frame: UploadFile = File(..., description="Frame da câmera em formato JPEG"),
     timestamp: str = Form(..., description="Timestamp do frame em formato ISO"),
     camera_id: str = Form(..., description="ID da câmera"),
-    auth_key: str = Depends(verify_bridge_auth)
+    auth_key: str = Depends(verify_bridge_auth),
+    event_writer: EventWriter = Depends(get_event_writer)
 ):
     """
     🎯 Endpoint principal para processar frames da bridge
@@ -83,17 +99,30 @@ async def process_camera_frame(
         if img is None:
             raise HTTPException(status_code=400, detail="Invalid image format")
         
-        # Processa com YOLO11
-        detector_instance = await get_detector()
-        detections = await detector_instance.detect_persons(img)
-
-        # Adiciona IDs únicos às detecções para o SmartAnalyticsEngine
-        for i, detection in enumerate(detections):
-            detection['id'] = i
-
-        # Processa com Smart Analytics
         analytics_instance = await get_analytics_engine()
-        smart_metrics = await analytics_instance.process_frame(img, detections, timestamp)
+        
+        # Estado da câmera: tracker, tracks comportamentais, heatmap e zonas próprios
+        state = get_pipelines().get(camera_id)
+        
+        async with state.lock:
+            state.touch()
+            
+            # Cadência (detectar a cada N frames, Kalman nos demais) + gate de movimento + YOLO11
+            detector_instance = await get_detector()
+            detections, source = await state.detect(img, detector_instance)
+            
+            if source == GATED:
+                # Cena estática e vazia: reaproveita o último resultado
+                smart_metrics = state.motion_gate.last_result
+            else:
+                # Processa com Smart Analytics (IDs estáveis do tracker da câmera)
+                timestamp_dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+                smart_metrics = await analytics_instance.process_frame(img, detections, timestamp_dt, pipeline=state)
+                if source == DETECTED and state.motion_gate:
+                    state.motion_gate.record_inference(detections, smart_metrics)
+
+        # Descarta câmeras ociosas (mesmo cleanup periódico do bridge)
+        await get_pipelines().evict_idle()
 
         # Extrai métricas básicas
         people_count = len(detections)
@@ -106,15 +135,9 @@ async def process_camera_frame(
         if hasattr(smart_metrics, 'group_shopping_rate') and smart_metrics.group_shopping_rate > 0:
             groups_detected = [{"rate": smart_metrics.group_shopping_rate}]
         
-        # Salva no Supabase usando o manager global
-        from core.database import SupabaseManager
-        from core.config import settings
-        supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await supabase.initialize()
-        
+        # Enfileira no write-behind (gravado em lote no Supabase, fora do caminho do frame)
         try:
-            # Insere evento no banco usando método específico para câmeras
-            await supabase.insert_camera_event(
+            event_writer.add_camera_event(
                 camera_id=camera_id,
                 timestamp=timestamp,
                 people_count=people_count,
@@ -134,7 +157,7 @@ async def process_camera_frame(
                 }
             )
             
-            logger.info(f"💾 Evento salvo: {camera_id} - {people_count} pessoas")
+            logger.info(f"💾 Evento enfileirado: {camera_id} - {people_count} pessoas")
             
         except Exception as db_error:
             logger.warning(f"⚠️ Erro ao salvar no banco: {db_error}")
@@ -179,6 +202,9 @@ async def camera_status():
         
         return {
             'detector_loaded': detector_instance.model is not None,
+            'detector_engine': detector_instance.engine,
+            'detector_batching': detector_instance.get_batching_stats(),
+            'pipelines': get_pipelines().get_stats(),
             'analytics_initialized': analytics_instance.face_manager is not None,
             'modules': {
                 'face_recognition': analytics_instance.face_manager is not None,
@@ -195,6 +221,45 @@ async def camera_status():
             'analytics_initialized': False
         }
 
+def _encode_heatmap(heatmap: np.ndarray) -> str:
+    """Heatmap uint8 -> PNG colorido em base64 (data URL)"""
+    import base64
+    colored = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
+    ok, buffer = cv2.imencode('.png', colored)
+    if not ok:
+        raise ValueError("Falha ao codificar heatmap")
+    return f"data:image/png;base64,{base64.b64encode(buffer.tobytes()).decode('utf-8')}"
+
+@router.get("/heatmaps")
+async def get_camera_heatmaps(
+    hour: Optional[datetime] = None,
+    camera_id: Optional[str] = None
+):
+    """🔥 Heatmaps das câmeras ativas (atual com decaimento, ou bucket de uma hora)"""
+    try:
+        heatmaps = await get_pipelines().get_heatmaps(hour)
+        if camera_id is not None:
+            heatmaps = {key: value for key, value in heatmaps.items() if key == camera_id}
+        
+        cameras = {}
+        for key, heatmap in heatmaps.items():
+            cameras[key] = {
+                'resolution': f"{heatmap.shape[1]}x{heatmap.shape[0]}",
+                'format': 'image/png',
+                'data': await asyncio.to_thread(_encode_heatmap, heatmap)
+            }
+        
+        return {
+            'success': True,
+            'hour': hour.isoformat() if hour else None,
+            'cameras': cameras,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"❌ Erro ao gerar heatmaps: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/test")
 async def test_camera_endpoint(
     auth_key: str = Depends(verify_bridge_auth)
@@ -212,12 +277,9 @@ async def test_camera_endpoint(
 # ============================================================================
 
 @router.get("/")
-async def list_cameras():
+async def list_cameras(supabase: SupabaseManager = Depends(get_database)):
     """📋 Listar todas as câmeras configuradas"""
     try:
-        supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await supabase.initialize()
-        
         cameras = await supabase.get_cameras()
         return {
             'success': True,
@@ -230,15 +292,12 @@ async def list_cameras():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/")
-async def create_camera(camera_data: dict):
+async def create_camera(camera_data: dict, supabase: SupabaseManager = Depends(get_database)):
     """➕ Criar nova configuração de câmera"""
     try:
         # Validar dados
         camera_config = CameraConfigData(**camera_data)
         
-        supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await supabase.initialize()
-        
         camera_id = await supabase.create_camera(camera_config.dict())
         logger.info(f"📷 Nova câmera criada: {camera_id}")
         
@@ -253,12 +312,9 @@ async def create_camera(camera_data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{camera_id}")
-async def get_camera(camera_id: str):
+async def get_camera(camera_id: str, supabase: SupabaseManager = Depends(get_database)):
     """🔍 Obter detalhes de uma câmera específica"""
     try:
-        supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await supabase.initialize()
-        
         camera = await supabase.get_camera_by_id(camera_id)
         if not camera:
             raise HTTPException(status_code=404, detail="Câmera não encontrada")
@@ -275,12 +331,9 @@ async def get_camera(camera_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/{camera_id}")
-async def update_camera(camera_id: str, camera_data: dict):
+async def update_camera(camera_id: str, camera_data: dict, supabase: SupabaseManager = Depends(get_database)):
     """✏️ Atualizar configuração de uma câmera"""
     try:
-        supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await supabase.initialize()
-        
         success = await supabase.update_camera(camera_id, camera_data)
         if not success:
             raise HTTPException(status_code=404, detail="Câmera não encontrada")
@@ -299,12 +352,9 @@ async def update_camera(camera_id: str, camera_data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{camera_id}")
-async def delete_camera(camera_id: str):
+async def delete_camera(camera_id: str, supabase: SupabaseManager = Depends(get_database)):
     """🗑️ Remover uma câmera"""
     try:
-        supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await supabase.initialize()
-        
         success = await supabase.delete_camera(camera_id)
         if not success:
             raise HTTPException(status_code=404, detail="Câmera não encontrada")
@@ -323,16 +373,11 @@ async def delete_camera(camera_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/{camera_id}/test-connection")
-async def test_camera_connection(camera_id: str):
+async def test_camera_connection(camera_id: str, supabase: SupabaseManager = Depends(get_database)):
     """🔗 Testar conexão com uma câmera específica"""
     try:
-        from core.database import SupabaseManager
-        from core.config import settings
         import cv2
         
-        supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await supabase.initialize()
-        
         camera = await supabase.get_camera_by_id(camera_id)
         if not camera:
             raise HTTPException(status_code=404, detail="Câmera não encontrada")
@@ -373,16 +418,11 @@ async def get_camera_events(
     camera_id: str,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    limit: int = 100
+    limit: int = 100,
+    supabase: SupabaseManager = Depends(get_database)
 ):
     """📊 Obter eventos recentes de uma câmera"""
     try:
-        from core.database import SupabaseManager
-        from core.config import settings
-        
-        supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await supabase.initialize()
-        
         events = await supabase.get_camera_events(camera_id, start_date, end_date, limit)
         
         return {
@@ -397,19 +437,14 @@ async def get_camera_events(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{camera_id}/snapshot")
-async def get_camera_snapshot(camera_id: str):
+async def get_camera_snapshot(camera_id: str, supabase: SupabaseManager = Depends(get_database)):
     """📸 Obter snapshot atual da câmera"""
     try:
-        from core.database import SupabaseManager
-        from core.config import settings
         import base64
         from io import BytesIO
         from PIL import Image, ImageDraw, ImageFont
         import numpy as np
         
-        supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await supabase.initialize()
-        
         camera = await supabase.get_camera_by_id(camera_id)
         if not camera:
             raise HTTPException(status_code=404, detail="Câmera não encontrada")
@@ -497,7 +532,7 @@ async def get_camera_snapshot(camera_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{camera_id}/detections")
-async def get_camera_detections(camera_id: str):
+async def get_camera_detections(camera_id: str, supabase: SupabaseManager = Depends(get_database)):
     """🎯 Obter detecções em tempo real da câmera processando frame atual"""
     try:
         import cv2
@@ -506,9 +541,6 @@ async def get_camera_detections(camera_id: str):
         from datetime import datetime
 
         # Buscar câmera no banco
-        supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await supabase.initialize()
-
         camera = await supabase.get_camera_by_id(camera_id)
         if not camera:
             raise HTTPException(status_code=404, detail="Câmera não encontrada")
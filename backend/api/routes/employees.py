@@ -19,7 +19,7 @@ from core.ai.privacy_config import privacy_manager
 from core.database import SupabaseManager
 from core.config import settings
 from models.api_models import ApiResponse
-from core.app_state import get_smart_engine as get_global_engine
+from core.app_state import get_smart_engine as get_global_engine, get_database
 
 router = APIRouter(prefix="/api/employees", tags=["employees"])
 
@@ -95,7 +95,8 @@ async def register_employee(
     department: Optional[str] = Form(None, description="Departamento/Seção"),
     position: Optional[str] = Form(None, description="Cargo"),
     file: UploadFile = File(..., description="Foto do funcionário"),
-    engine: SmartAnalyticsEngine = Depends(get_smart_engine)
+    engine: SmartAnalyticsEngine = Depends(get_smart_engine),
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Registrar novo funcionário com reconhecimento facial
@@ -135,8 +136,6 @@ async def register_employee(
         )
         
         # Salvar dados adicionais no banco
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
         try:
             await db.execute("""
                 INSERT INTO employees (employee_id, name, department, position, registered_at, is_active)
@@ -182,7 +181,8 @@ async def register_employee(
 @router.delete("/{employee_id}", response_model=Dict[str, Any])
 async def remove_employee(
     employee_id: str,
-    engine: SmartAnalyticsEngine = Depends(get_smart_engine)
+    engine: SmartAnalyticsEngine = Depends(get_smart_engine),
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Remover funcionário do sistema
@@ -212,8 +212,6 @@ async def remove_employee(
             )
         
         # Remover/desativar no banco de dados
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
         try:
             # Marcar como inativo ao invés de deletar (para auditoria)
             await db.execute("""
@@ -256,7 +254,8 @@ async def list_employees(
     limit: int = 20,
     active_only: bool = True,
     include_last_seen: bool = True,
-    engine: SmartAnalyticsEngine = Depends(get_smart_engine)
+    engine: SmartAnalyticsEngine = Depends(get_smart_engine),
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Listar funcionários registrados com filtros e paginação
@@ -275,9 +274,6 @@ async def list_employees(
         - Estatísticas gerais
     """
     try:
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         # Construir query
         base_query = "SELECT * FROM employees WHERE 1=1"
         count_query = "SELECT COUNT(*) as total FROM employees WHERE 1=1"
@@ -387,7 +383,8 @@ async def list_employees(
 @router.get("/{employee_id}/analytics", response_model=Dict[str, Any])
 async def get_employee_analytics(
     employee_id: str,
-    days: int = 30
+    days: int = 30,
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Obter analytics específicas de um funcionário
@@ -402,9 +399,6 @@ async def get_employee_analytics(
         - Estatísticas de produtividade
     """
     try:
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         start_date = datetime.now() - timedelta(days=days)
         
         # Buscar dados analíticos
@@ -477,7 +471,8 @@ async def get_employee_analytics(
 @router.get("/{employee_id}", response_model=Dict[str, Any])
 async def get_employee_details(
     employee_id: str,
-    include_analytics: bool = True
+    include_analytics: bool = True,
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Obter detalhes de um funcionário específico
@@ -492,9 +487,6 @@ async def get_employee_details(
         - Histórico de avistamentos
     """
     try:
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         # Buscar dados do funcionário
         try:
             employee_query = "SELECT * FROM employees WHERE employee_id = %s"
@@ -570,7 +562,8 @@ async def update_employee(
     position: Optional[str] = Form(None),
     is_active: Optional[bool] = Form(None),
     file: Optional[UploadFile] = File(None, description="Nova foto (opcional)"),
-    engine: SmartAnalyticsEngine = Depends(get_smart_engine)
+    engine: SmartAnalyticsEngine = Depends(get_smart_engine),
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Atualizar dados de um funcionário
@@ -588,9 +581,6 @@ async def update_employee(
         - Status da operação
     """
     try:
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         # Verificar se funcionário existe
         try:
             existing = await db.fetch_one(
@@ -685,7 +675,8 @@ async def update_employee(
 @router.get("/analytics/presence", response_model=Dict[str, Any])
 async def get_employee_presence_analytics(
     days: int = 30,
-    employee_id: Optional[str] = None
+    employee_id: Optional[str] = None,
+    db: SupabaseManager = Depends(get_database)
 ):
     """
     Obter análises de presença de funcionários
@@ -700,9 +691,6 @@ async def get_employee_presence_analytics(
         - Estatísticas de pontualidade
     """
     try:
-        db = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        await db.initialize()
-        
         # Período de análise
         start_date = datetime.now() - timedelta(days=days)
         
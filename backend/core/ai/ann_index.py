@@ -0,0 +1,554 @@
+"""
+ANN Index - Busca aproximada de vizinhos para galerias grandes de clientes
+Permite reconhecer clientes recorrentes entre meses (100k+ embeddings) sem
+busca linear. Implementações:
+- brute: busca exata vetorizada (EmbeddingGallery)
+- ivf: IVF-flat em NumPy puro (k-means + listas invertidas), sem dependências
+- hnsw: grafo HNSW via hnswlib (se instalado)
+Todas suportam inserção/remoção incremental e persistência em disco.
+"""
+
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+from .embedding_gallery import EmbeddingGallery
+
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
+class ANNIndex(ABC):
+    """Interface comum dos índices (mesma API de busca da EmbeddingGallery)"""
+    
+    kind = "base"
+    
+    def __init__(self, metric: str = "euclidean"):
+        self.metric = metric
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+    
+    @abstractmethod
+    def __contains__(self, identity_id: str) -> bool:
+        ...
+    
+    @abstractmethod
+    def add(self, identity_id: str, embedding: np.ndarray):
+        ...
+    
+    @abstractmethod
+    def remove(self, identity_id: str) -> bool:
+        ...
+    
+    @abstractmethod
+    def get(self, identity_id: str) -> Optional[np.ndarray]:
+        ...
+    
+    @abstractmethod
+    def items(self) -> List[Tuple[str, np.ndarray]]:
+        """Todos os (id, embedding) armazenados"""
+        ...
+    
+    @abstractmethod
+    def search(self, embedding: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        """k vizinhos mais próximos [(id, distância)] em ordem crescente"""
+        ...
+    
+    def match(self, embedding: np.ndarray, threshold: float) -> Tuple[Optional[str], float]:
+        """Melhor identidade dentro do threshold (id ou None, menor distância)"""
+        results = self.search(embedding, k=1)
+        if not results:
+            return None, float('inf')
+        
+        identity_id, distance = results[0]
+        if distance < threshold:
+            return identity_id, distance
+        return None, distance
+    
+    def save(self, path: str):
+        """Persistir ids e vetores (formato comum .npz)"""
+        items = self.items()
+        ids = np.array([identity_id for identity_id, _ in items], dtype=object)
+        vectors = np.stack([vector for _, vector in items]).astype(np.float32) if items else np.zeros((0, 0), np.float32)
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, ids=ids, vectors=vectors, kind=self.kind, metric=self.metric)
+        os.replace(tmp_path, path)
+    
+    def load(self, path: str) -> int:
+        """Carregar ids e vetores salvos por save() (reconstrói a estrutura)"""
+        data = np.load(path, allow_pickle=True)
+        ids, vectors = data['ids'], data['vectors']
+        self.add_many(list(ids), vectors)
+        return len(ids)
+    
+    def add_many(self, identity_ids: List[str], embeddings: np.ndarray):
+        """Inserção em lote"""
+        for identity_id, embedding in zip(identity_ids, embeddings):
+            self.add(str(identity_id), embedding)
+
+class BruteForceIndex(ANNIndex):
+    """Busca exata (referência de recall e padrão para galerias pequenas)"""
+    
+    kind = "brute"
+    
+    def __init__(self, metric: str = "euclidean"):
+        super().__init__(metric)
+        self.gallery = EmbeddingGallery(metric=metric)
+    
+    def __len__(self) -> int:
+        return len(self.gallery)
+    
+    def __contains__(self, identity_id: str) -> bool:
+        return identity_id in self.gallery
+    
+    def add(self, identity_id: str, embedding: np.ndarray):
+        self.gallery.add(identity_id, embedding)
+    
+    def remove(self, identity_id: str) -> bool:
+        return self.gallery.remove(identity_id)
+    
+    def get(self, identity_id: str) -> Optional[np.ndarray]:
+        return self.gallery.get(identity_id)
+    
+    def items(self) -> List[Tuple[str, np.ndarray]]:
+        return list(zip(self.gallery.ids, self.gallery.matrix))
+    
+    def search(self, embedding: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        distances = self.gallery.distances(embedding)
+        if distances.size == 0:
+            return []
+        
+        k = min(k, distances.size)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        ids = self.gallery.ids
+        return [(ids[i], float(distances[i])) for i in top]
+
+class IVFFlatIndex(ANNIndex):
+    """
+    IVF-flat em NumPy: k-means divide o espaço em nlist células; cada célula é
+    uma EmbeddingGallery. A busca visita apenas as nprobe células mais próximas.
+    Abaixo de min_train_size (ou antes do treino) funciona como busca exata.
+    Com event loop ativo, o (re)treino roda em executor sobre uma cópia dos
+    vetores; a estrutura atual continua servindo buscas até a troca.
+    """
+    
+    kind = "ivf"
+    
+    def __init__(
+        self,
+        metric: str = "euclidean",
+        nprobe: int = 8,
+        min_train_size: int = 2048,
+        retrain_factor: float = 4.0,
+        kmeans_iterations: int = 10,
+        max_train_samples: int = 50000,
+        seed: int = 42
+    ):
+        super().__init__(metric)
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.retrain_factor = retrain_factor  # Re-treinar quando crescer N vezes desde o último treino
+        self.kmeans_iterations = kmeans_iterations
+        self.max_train_samples = max_train_samples
+        self.rng = np.random.default_rng(seed)
+        
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[EmbeddingGallery] = []
+        self.assignment: Dict[str, int] = {}  # id -> célula
+        self.flat = EmbeddingGallery(metric=metric)  # Antes do treino
+        self.trained_size = 0
+        
+        # Treino em segundo plano: alterações feitas durante o treino são reaplicadas na troca
+        self._train_future: Optional[asyncio.Future] = None
+        self._pending: Dict[str, Optional[np.ndarray]] = {}  # id -> vetor (None = removido)
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+    
+    def __len__(self) -> int:
+        return len(self.assignment) if self.is_trained else len(self.flat)
+    
+    def __contains__(self, identity_id: str) -> bool:
+        return identity_id in self.assignment if self.is_trained else identity_id in self.flat
+    
+    def _prepare(self, embedding: np.ndarray) -> np.ndarray:
+        return self.flat._prepare(embedding)
+    
+    def _nearest_cells(self, vector: np.ndarray, count: int) -> np.ndarray:
+        """Células mais próximas do vetor"""
+        distances = np.sum((self.centroids - vector) ** 2, axis=1)
+        count = min(count, len(distances))
+        cells = np.argpartition(distances, count - 1)[:count]
+        return cells[np.argsort(distances[cells])]
+    
+    @property
+    def is_training(self) -> bool:
+        return self._train_future is not None
+    
+    def add(self, identity_id: str, embedding: np.ndarray):
+        if self.is_training:
+            self._pending[identity_id] = self._prepare(embedding)
+        
+        if not self.is_trained:
+            self.flat.add(identity_id, embedding)
+            if len(self.flat) >= self.min_train_size:
+                self._schedule_train()
+            return
+        
+        self._discard(identity_id)  # Sem tocar em _pending: o add já registrado precisa valer na troca
+        vector = self._prepare(embedding)
+        cell = int(self._nearest_cells(vector, 1)[0])
+        self.lists[cell].add(identity_id, vector)
+        self.assignment[identity_id] = cell
+        
+        if len(self.assignment) >= self.trained_size * self.retrain_factor:
+            self._schedule_train()
+    
+    def remove(self, identity_id: str) -> bool:
+        if self.is_training:
+            self._pending[identity_id] = None
+        return self._discard(identity_id)
+    
+    def _discard(self, identity_id: str) -> bool:
+        """Tirar o vetor da estrutura viva (sem registrar em _pending)"""
+        if not self.is_trained:
+            return self.flat.remove(identity_id)
+        
+        cell = self.assignment.pop(identity_id, None)
+        if cell is None:
+            return False
+        return self.lists[cell].remove(identity_id)
+    
+    def get(self, identity_id: str) -> Optional[np.ndarray]:
+        if not self.is_trained:
+            return self.flat.get(identity_id)
+        cell = self.assignment.get(identity_id)
+        return None if cell is None else self.lists[cell].get(identity_id)
+    
+    def items(self) -> List[Tuple[str, np.ndarray]]:
+        if not self.is_trained:
+            return list(zip(self.flat.ids, self.flat.matrix))
+        
+        items = []
+        for gallery in self.lists:
+            items.extend(zip(gallery.ids, gallery.matrix))
+        return items
+    
+    def train(self):
+        """(Re)treinar o k-means e redistribuir os vetores nas células (síncrono)"""
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return
+        self._install(*self._build(*snapshot))
+    
+    def _schedule_train(self):
+        """Treinar em executor se houver event loop (caminho dos frames); senão síncrono"""
+        if self.is_training:
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.train()
+            return
+        
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return
+        
+        self._pending = {}
+        self._train_future = loop.run_in_executor(None, self._build, *snapshot)
+        self._train_future.add_done_callback(self._on_trained)
+    
+    def _on_trained(self, future: asyncio.Future):
+        """Trocar a estrutura (no loop) e reaplicar o que mudou durante o treino"""
+        self._train_future = None
+        pending, self._pending = self._pending, {}
+        
+        try:
+            built = future.result()
+        except Exception as e:
+            logger.error(f"❌ Erro no treino do índice IVF (mantendo estrutura atual): {e}")
+            return
+        
+        self._install(*built)
+        for identity_id, vector in pending.items():
+            if vector is None:
+                self.remove(identity_id)
+            else:
+                self.add(identity_id, vector)
+    
+    async def wait_trained(self):
+        """Aguardar o treino em segundo plano, se houver"""
+        future = self._train_future
+        if future is not None:
+            try:
+                await future
+            except Exception:
+                pass
+    
+    def _snapshot(self) -> Optional[Tuple[List[str], np.ndarray]]:
+        """Cópia de ids e vetores atuais (o treino não toca a estrutura viva)"""
+        galleries = [gallery for gallery in (self.lists if self.is_trained else [self.flat]) if len(gallery)]
+        if not galleries:
+            return None
+        
+        ids = [identity_id for gallery in galleries for identity_id in gallery.ids]
+        vectors = np.concatenate([gallery.matrix for gallery in galleries]).astype(np.float32, copy=False)
+        return ids, vectors
+    
+    def _build(self, ids: List[str], vectors: np.ndarray) -> Tuple[np.ndarray, List[EmbeddingGallery], Dict[str, int]]:
+        """k-means + listas invertidas a partir de uma cópia (seguro para executor)"""
+        nlist = max(16, int(np.sqrt(len(vectors))))
+        centroids = self._kmeans(vectors, nlist)
+        lists = [EmbeddingGallery(metric=self.metric) for _ in range(len(centroids))]
+        assignment = {}
+        
+        cells = self._assign(vectors, centroids)
+        for identity_id, vector, cell in zip(ids, vectors, cells):
+            lists[cell].add(identity_id, vector)
+            assignment[identity_id] = int(cell)
+        
+        return centroids, lists, assignment
+    
+    def _install(self, centroids: np.ndarray, lists: List[EmbeddingGallery], assignment: Dict[str, int]):
+        """Trocar a estrutura de busca pela recém-treinada"""
+        self.centroids = centroids
+        self.lists = lists
+        self.assignment = assignment
+        self.flat = EmbeddingGallery(metric=self.metric)
+        self.trained_size = len(assignment)
+        logger.info(f"🗂️ Índice IVF treinado: {len(assignment)} embeddings em {len(centroids)} células")
+    
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+        """Célula mais próxima de cada vetor (em blocos para limitar memória)"""
+        centroid_sq = np.sum(centroids ** 2, axis=1)
+        cells = np.empty(len(vectors), dtype=np.int64)
+        
+        for start in range(0, len(vectors), chunk):
+            block = vectors[start:start + chunk]
+            distances = centroid_sq[None, :] - 2.0 * block @ centroids.T
+            cells[start:start + chunk] = np.argmin(distances, axis=1)
+        
+        return cells
+    
+    def _kmeans(self, vectors: np.ndarray, nlist: int) -> np.ndarray:
+        """k-means (Lloyd) sobre uma amostra"""
+        sample = vectors
+        if len(sample) > self.max_train_samples:
+            sample = vectors[self.rng.choice(len(vectors), self.max_train_samples, replace=False)]
+        
+        nlist = min(nlist, len(sample))
+        centroids = sample[self.rng.choice(len(sample), nlist, replace=False)].copy()
+        
+        for _ in range(self.kmeans_iterations):
+            cells = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, cells, sample)
+            counts = np.bincount(cells, minlength=nlist).astype(np.float32)
+            
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            # Células vazias recebem pontos aleatórios
+            empty = np.where(~filled)[0]
+            if len(empty):
+                centroids[empty] = sample[self.rng.choice(len(sample), len(empty), replace=False)]
+        
+        return centroids
+    
+    def search(self, embedding: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        if not self.is_trained:
+            if len(self.flat) == 0:
+                return []
+            distances = self.flat.distances(embedding)
+            order = np.argsort(distances)[:k]
+            ids = self.flat.ids
+            return [(ids[i], float(distances[i])) for i in order]
+        
+        query = self._prepare(embedding)
+        results = []
+        for cell in self._nearest_cells(query, self.nprobe):
+            gallery = self.lists[cell]
+            if len(gallery) == 0:
+                continue
+            distances = gallery.distances(query)
+            ids = gallery.ids
+            for i in np.argsort(distances)[:k]:
+                results.append((ids[i], float(distances[i])))
+        
+        results.sort(key=lambda item: item[1])
+        return results[:k]
+
+class HNSWIndex(ANNIndex):
+    """Grafo HNSW via hnswlib (remoção com mark_deleted, capacidade cresce sob demanda)"""
+    
+    kind = "hnsw"
+    
+    def __init__(
+        self,
+        metric: str = "euclidean",
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        initial_capacity: int = 1024
+    ):
+        if not HNSWLIB_AVAILABLE:
+            raise ImportError("hnswlib não instalado")
+        
+        super().__init__(metric)
+        self.space = 'cosine' if metric == 'cosine' else 'l2'
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.initial_capacity = initial_capacity
+        
+        self.index = None
+        self.dim: Optional[int] = None
+        self.labels: Dict[str, int] = {}  # id -> label inteiro do hnswlib
+        self.ids_by_label: Dict[int, str] = {}
+        self.next_label = 0
+    
+    def __len__(self) -> int:
+        return len(self.labels)
+    
+    def __contains__(self, identity_id: str) -> bool:
+        return identity_id in self.labels
+    
+    def _create(self, dim: int, capacity: int):
+        self.dim = dim
+        self.index = hnswlib.Index(space=self.space, dim=dim)
+        self.index.init_index(max_elements=capacity, ef_construction=self.ef_construction, M=self.m, allow_replace_deleted=True)
+        self.index.set_ef(self.ef_search)
+    
+    def add(self, identity_id: str, embedding: np.ndarray):
+        self.add_many([identity_id], np.asarray(embedding, dtype=np.float32).reshape(1, -1))
+    
+    def add_many(self, identity_ids: List[str], embeddings: np.ndarray):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if len(vectors) == 0:
+            return
+        if self.index is None:
+            self._create(vectors.shape[1], max(self.initial_capacity, len(vectors)))
+        
+        for identity_id in identity_ids:
+            self.remove(str(identity_id))
+        
+        needed = self.index.get_current_count() + len(vectors)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, self.index.get_max_elements() * 2))
+        
+        labels = np.arange(self.next_label, self.next_label + len(vectors))
+        self.next_label += len(vectors)
+        self.index.add_items(vectors, labels, replace_deleted=True)
+        
+        for identity_id, label in zip(identity_ids, labels):
+            self.labels[str(identity_id)] = int(label)
+            self.ids_by_label[int(label)] = str(identity_id)
+    
+    def remove(self, identity_id: str) -> bool:
+        label = self.labels.pop(identity_id, None)
+        if label is None:
+            return False
+        self.ids_by_label.pop(label, None)
+        self.index.mark_deleted(label)
+        return True
+    
+    def get(self, identity_id: str) -> Optional[np.ndarray]:
+        label = self.labels.get(identity_id)
+        if label is None:
+            return None
+        return np.asarray(self.index.get_items([label])[0], dtype=np.float32)
+    
+    def items(self) -> List[Tuple[str, np.ndarray]]:
+        if not self.labels:
+            return []
+        ids = list(self.labels.keys())
+        vectors = self.index.get_items([self.labels[i] for i in ids])
+        return list(zip(ids, np.asarray(vectors, dtype=np.float32)))
+    
+    def search(self, embedding: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        if not self.labels:
+            return []
+        
+        k = min(k, len(self.labels))
+        query = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        labels, distances = self.index.knn_query(query, k=k)
+        
+        results = []
+        for label, distance in zip(labels[0], distances[0]):
+            # hnswlib 'l2' devolve a distância ao quadrado
+            distance = float(np.sqrt(max(distance, 0.0))) if self.space == 'l2' else float(distance)
+            results.append((self.ids_by_label[int(label)], distance))
+        return results
+    
+    def save(self, path: str):
+        """Salvar grafo nativo + mapeamento de ids"""
+        if self.index is None:
+            return super().save(path)
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.index.save_index(f"{path}.hnsw")
+        with open(f"{path}.labels.json", 'w') as f:
+            json.dump({'dim': self.dim, 'next_label': self.next_label, 'labels': self.labels}, f)
+        super().save(path)
+    
+    def load(self, path: str) -> int:
+        """Carregar grafo nativo (ou reconstruir a partir do .npz)"""
+        graph_path, labels_path = f"{path}.hnsw", f"{path}.labels.json"
+        if not (os.path.exists(graph_path) and os.path.exists(labels_path)):
+            return super().load(path)
+        
+        with open(labels_path) as f:
+            meta = json.load(f)
+        
+        self.dim = meta['dim']
+        self.index = hnswlib.Index(space=self.space, dim=self.dim)
+        self.index.load_index(graph_path, allow_replace_deleted=True)
+        self.index.set_ef(self.ef_search)
+        self.labels = {identity_id: int(label) for identity_id, label in meta['labels'].items()}
+        self.ids_by_label = {label: identity_id for identity_id, label in self.labels.items()}
+        self.next_label = meta['next_label']
+        return len(self.labels)
+
+ANN_INDEX_TYPES = {
+    'brute': BruteForceIndex,
+    'ivf': IVFFlatIndex,
+    'hnsw': HNSWIndex
+}
+
+def create_ann_index(kind: str = "auto", metric: str = "euclidean", nprobe: int = 8, **kwargs) -> ANNIndex:
+    """
+    Criar índice de vizinhos
+    
+    Args:
+        kind: auto (hnsw se disponível, senão ivf), brute, ivf ou hnsw
+        metric: euclidean ou cosine
+        nprobe: Células visitadas por busca (apenas ivf)
+    """
+    if kind == "auto":
+        kind = "hnsw" if HNSWLIB_AVAILABLE else "ivf"
+    
+    if kind == "hnsw" and not HNSWLIB_AVAILABLE:
+        logger.warning("⚠️ hnswlib não instalado - usando índice IVF em NumPy")
+        kind = "ivf"
+    
+    if kind not in ANN_INDEX_TYPES:
+        logger.warning(f"⚠️ Tipo de índice desconhecido '{kind}', usando brute")
+        kind = "brute"
+    
+    if kind == "ivf":
+        kwargs['nprobe'] = nprobe
+    
+    return ANN_INDEX_TYPES[kind](metric=metric, **kwargs)
@@ -9,23 +9,24 @@ from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from collections import deque, defaultdict
-import json
+import copy
 import math
 from loguru import logger
-from scipy import ndimage
-from scipy.spatial.distance import euclidean
 from sklearn.cluster import DBSCAN
 import pandas as pd
 
 from ..config import get_settings
 from ..database import DatabaseManager
+from ..event_writer import EventWriter
+from .zone_raster import ZoneRaster
+from .heatmap import HeatmapAccumulator
 
 settings = get_settings()
 
 @dataclass
 class PersonTrack:
     """Dados de rastreamento de uma pessoa"""
-    person_id: int
+    person_id: str  # track_id do PersonTracker
     positions: deque  # Últimas posições (x, y, timestamp)
     first_seen: datetime
     last_seen: datetime
@@ -41,6 +42,14 @@ class PersonTrack:
     zones_visited: List[str] = None
     trajectory_complexity: float = 0.0
     
+    # Acumuladores incrementais (atualizados em O(1) por posição)
+    first_point: Optional[Tuple[float, float]] = None
+    last_point: Optional[Tuple[float, float]] = None
+    last_time: Optional[datetime] = None
+    speed_sum: float = 0.0
+    speed_samples: int = 0
+    low_speed_run: int = 0  # Amostras lentas consecutivas (máquina de estados de paradas)
+    
     def __post_init__(self):
         if self.zones_visited is None:
             self.zones_visited = []
@@ -60,11 +69,13 @@ class BehaviorAnalyzer:
     Analisador de comportamento principal
     """
     
-    def __init__(self):
+    def __init__(self, camera_id: Optional[str] = None):
         self.db = None
+        self.writer: Optional[EventWriter] = None  # Gravações em lote (write-behind)
+        self.camera_id = camera_id  # None = analisador base (template das câmeras)
         
         # Tracking de pessoas
-        self.person_tracks: Dict[int, PersonTrack] = {}
+        self.person_tracks: Dict[str, PersonTrack] = {}
         self.max_track_history = 100  # Máximo de posições por pessoa
         
         # Configurações
@@ -77,10 +88,10 @@ class BehaviorAnalyzer:
         self.zones: Dict[str, ZoneInfo] = {}
         self.frame_width = 640
         self.frame_height = 480
+        self.zone_raster: Optional[ZoneRaster] = None  # Recompilado quando as zonas mudam
         
-        # Heatmap de movimento
-        self.heatmap = None
-        self.heatmap_alpha = 0.1
+        # Heatmap de movimento (grade reduzida com decaimento preguiçoso)
+        self.heatmap: Optional[HeatmapAccumulator] = None
         
         # Estatísticas em tempo real
         self.current_stats = {
@@ -96,12 +107,18 @@ class BehaviorAnalyzer:
         
         logger.info("🔍 Behavior Analyzer inicializado")
     
-    async def initialize(self):
+    async def initialize(self, db: Optional[DatabaseManager] = None, writer: Optional[EventWriter] = None):
         """Inicializar o analisador"""
         try:
-            # Initialize database connection
-            self.db = DatabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-            await self.db.initialize()
+            # Initialize database connection (cliente compartilhado quando fornecido)
+            if db is None:
+                db = DatabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+                await db.initialize()
+            self.db = db
+            if writer is None:
+                writer = EventWriter(db)
+                await writer.start()
+            self.writer = writer
             await self._load_store_zones()
             self._initialize_heatmap()
             logger.success("✅ Behavior Analyzer pronto")
@@ -139,19 +156,43 @@ class BehaviorAnalyzer:
                 )
             }
             
+            self._rebuild_zone_raster()
             logger.info(f"✅ Carregadas {len(self.zones)} zonas da loja")
             
         except Exception as e:
             logger.error(f"Erro ao carregar zonas: {e}")
     
+    def spawn(self, camera_id: str) -> 'BehaviorAnalyzer':
+        """Criar analisador de uma câmera compartilhando o banco e a configuração de zonas"""
+        analyzer = BehaviorAnalyzer(camera_id=camera_id)
+        analyzer.db = self.db
+        analyzer.writer = self.writer
+        analyzer.zones = copy.deepcopy(self.zones)
+        analyzer.frame_width = self.frame_width
+        analyzer.frame_height = self.frame_height
+        analyzer.zone_raster = self.zone_raster  # Somente leitura; configure_zones recompila por câmera
+        analyzer._initialize_heatmap()
+        return analyzer
+    
+    async def finalize_all_tracks(self):
+        """Finalizar todos os tracks ativos (câmera ociosa ou desligamento)"""
+        for track in list(self.person_tracks.values()):
+            await self._finalize_person_track(track)
+        self.person_tracks.clear()
+    
     def _initialize_heatmap(self):
         """Inicializar heatmap de movimento"""
-        self.heatmap = np.zeros((self.frame_height, self.frame_width), dtype=np.float32)
+        self.heatmap = HeatmapAccumulator(
+            self.frame_width,
+            self.frame_height,
+            cell_size=settings.HEATMAP_CELL_SIZE,
+            half_life=settings.HEATMAP_HALF_LIFE
+        )
     
     async def analyze(
         self,
         detections: List[Dict],
-        person_types: Dict[int, Any],
+        person_types: Dict[str, Any],
         timestamp: datetime
     ) -> Dict[str, Any]:
         """
@@ -185,7 +226,7 @@ class BehaviorAnalyzer:
             flow_analysis = await self._analyze_flow_patterns()
             
             # Atualizar heatmap
-            self._update_heatmap(detections)
+            self._update_heatmap(detections, timestamp)
             
             # Compilar resultados
             behavior_data = {
@@ -223,22 +264,24 @@ class BehaviorAnalyzer:
     async def _update_person_tracks(
         self,
         detections: List[Dict],
-        person_types: Dict[int, Any],
+        person_types: Dict[str, Any],
         timestamp: datetime
     ):
         """Atualizar rastreamento de pessoas"""
         try:
             current_ids = set()
             
-            for detection in detections:
+            # Centros de todas as pessoas e zonas de cada uma em um único gather
+            centers = np.array(
+                [((d['bbox'][0] + d['bbox'][2]) / 2, (d['bbox'][1] + d['bbox'][3]) / 2) for d in detections],
+                dtype=np.float64
+            ).reshape(-1, 2)
+            zone_masks = self.zone_raster.lookup(centers[:, 0], centers[:, 1]) if self.zone_raster else None
+            
+            for i, detection in enumerate(detections):
                 person_id = detection['id']
-                bbox = detection['bbox']
                 current_ids.add(person_id)
-                
-                # Calcular centro da bounding box
-                x1, y1, x2, y2 = bbox
-                center_x = (x1 + x2) / 2
-                center_y = (y1 + y2) / 2
+                center_x, center_y = float(centers[i, 0]), float(centers[i, 1])
                 
                 person_type = str(person_types.get(person_id, 'unknown')).split('.')[-1].lower()
                 
@@ -259,11 +302,12 @@ class BehaviorAnalyzer:
                 track.last_seen = timestamp
                 track.positions.append((center_x, center_y, timestamp))
                 
-                # Calcular métricas de movimento
-                await self._calculate_movement_metrics(track)
+                # Atualizar métricas de movimento com a nova posição
+                await self._calculate_movement_metrics(track, center_x, center_y, timestamp)
                 
                 # Verificar zonas visitadas
-                await self._check_zone_visits(track, center_x, center_y)
+                if zone_masks is not None:
+                    await self._check_zone_visits(track, zone_masks[i])
             
             # Remover tracks inativos (não vistos há mais de 30 segundos)
             inactive_threshold = timestamp - timedelta(seconds=30)
@@ -280,143 +324,79 @@ class BehaviorAnalyzer:
         except Exception as e:
             logger.error(f"Erro ao atualizar tracks: {e}")
     
-    async def _calculate_movement_metrics(self, track: PersonTrack):
-        """Calcular métricas de movimento para uma pessoa"""
+    async def _calculate_movement_metrics(self, track: PersonTrack, x: float, y: float, timestamp: datetime):
+        """
+        Atualizar métricas de movimento com uma nova posição
+        
+        Custo constante por posição: distância, velocidades, paradas e
+        sinuosidade vêm de acumuladores, sem percorrer o histórico.
+        """
         try:
-            if len(track.positions) < 2:
+            if track.last_point is None:
+                track.first_point = track.last_point = (x, y)
+                track.last_time = timestamp
                 return
             
-            positions = list(track.positions)
-            total_distance = 0
-            speeds = []
-            
-            for i in range(1, len(positions)):
-                prev_x, prev_y, prev_time = positions[i-1]
-                curr_x, curr_y, curr_time = positions[i]
+            prev_x, prev_y = track.last_point
+            distance = math.hypot(x - prev_x, y - prev_y)
+            time_diff = (timestamp - track.last_time).total_seconds()
+            
+            track.total_distance += distance
+            track.last_point = (x, y)
+            track.last_time = timestamp
+            
+            # Velocidade (pixels por segundo)
+            if time_diff > 0:
+                speed = distance / time_diff
+                track.speed_sum += speed
+                track.speed_samples += 1
+                track.avg_speed = track.speed_sum / track.speed_samples
+                track.max_speed = max(track.max_speed, speed)
                 
-                # Distância euclidiana
-                distance = euclidean((prev_x, prev_y), (curr_x, curr_y))
-                total_distance += distance
-                
-                # Velocidade (pixels por segundo)
-                time_diff = (curr_time - prev_time).total_seconds()
-                if time_diff > 0:
-                    speed = distance / time_diff
-                    speeds.append(speed)
-            
-            track.total_distance = total_distance
-            
-            if speeds:
-                track.avg_speed = np.mean(speeds)
-                track.max_speed = max(speeds)
+                # Paradas: sequência de amostras lentas encerrada por movimento
+                if speed < self.movement_threshold:
+                    track.low_speed_run += 1
+                else:
+                    if track.low_speed_run >= self.stop_threshold:
+                        track.stops_count += 1
+                    track.low_speed_run = 0
             
             # Tempo de permanência (dwell time)
-            time_diff = (track.last_seen - track.first_seen).total_seconds() / 60  # minutos
-            track.dwell_time = time_diff
+            track.dwell_time = (track.last_seen - track.first_seen).total_seconds() / 60  # minutos
             
-            # Complexidade da trajetória (sinuosidade)
-            if len(positions) >= 3:
-                track.trajectory_complexity = self._calculate_trajectory_complexity(positions)
-            
-            # Contar paradas (baixa velocidade por período prolongado)
-            track.stops_count = self._count_stops(positions)
+            # Complexidade da trajetória (sinuosidade): percorrido vs direto
+            if len(track.positions) >= 3:
+                direct_distance = math.hypot(x - track.first_point[0], y - track.first_point[1])
+                if direct_distance == 0:
+                    track.trajectory_complexity = 1.0  # Pessoa não se moveu
+                else:
+                    complexity = (track.total_distance - direct_distance) / track.total_distance
+                    track.trajectory_complexity = min(complexity, 1.0)
             
         except Exception as e:
             logger.error(f"Erro ao calcular métricas de movimento: {e}")
     
-    def _calculate_trajectory_complexity(self, positions: List[Tuple]) -> float:
-        """Calcular complexidade da trajetória (0 = linha reta, 1 = muito complexa)"""
+    async def _check_zone_visits(self, track: PersonTrack, zone_mask: int):
+        """Registrar zonas em que a pessoa está (bitmask do raster de zonas)"""
         try:
-            if len(positions) < 3:
-                return 0.0
-            
-            # Distância total percorrida vs distância direta
-            total_distance = 0
-            for i in range(1, len(positions)):
-                prev_x, prev_y, _ = positions[i-1]
-                curr_x, curr_y, _ = positions[i]
-                total_distance += euclidean((prev_x, prev_y), (curr_x, curr_y))
-            
-            # Distância direta (primeiro ao último ponto)
-            first_x, first_y, _ = positions[0]
-            last_x, last_y, _ = positions[-1]
-            direct_distance = euclidean((first_x, first_y), (last_x, last_y))
-            
-            if direct_distance == 0:
-                return 1.0  # Pessoa não se moveu
-            
-            complexity = (total_distance - direct_distance) / total_distance
-            return min(complexity, 1.0)
-            
-        except Exception as e:
-            logger.error(f"Erro ao calcular complexidade: {e}")
-            return 0.0
-    
-    def _count_stops(self, positions: List[Tuple]) -> int:
-        """Contar número de paradas significativas"""
-        try:
-            stops = 0
-            consecutive_low_speed = 0
+            if not zone_mask:
+                return
             
-            for i in range(1, len(positions)):
-                prev_x, prev_y, prev_time = positions[i-1]
-                curr_x, curr_y, curr_time = positions[i]
-                
-                distance = euclidean((prev_x, prev_y), (curr_x, curr_y))
-                time_diff = (curr_time - prev_time).total_seconds()
-                
-                if time_diff > 0:
-                    speed = distance / time_diff
+            for zone_id in self.zone_raster.zones_in(zone_mask):
+                if zone_id not in track.zones_visited:
+                    track.zones_visited.append(zone_id)
+                    self.zones[zone_id].visit_count += 1
+                    logger.debug(f"Pessoa {track.person_id} entrou na zona {zone_id}")
                     
-                    if speed < self.movement_threshold:  # Movimento muito lento
-                        consecutive_low_speed += 1
-                    else:
-                        if consecutive_low_speed >= self.stop_threshold:
-                            stops += 1
-                        consecutive_low_speed = 0
-            
-            return stops
-            
-        except Exception as e:
-            logger.error(f"Erro ao contar paradas: {e}")
-            return 0
-    
-    async def _check_zone_visits(self, track: PersonTrack, x: float, y: float):
-        """Verificar se pessoa está em alguma zona específica"""
-        try:
-            for zone_id, zone_info in self.zones.items():
-                if self._point_in_polygon(x, y, zone_info.polygon):
-                    if zone_id not in track.zones_visited:
-                        track.zones_visited.append(zone_id)
-                        zone_info.visit_count += 1
-                        logger.debug(f"Pessoa {track.person_id} entrou na zona {zone_id}")
-                        
         except Exception as e:
             logger.error(f"Erro ao verificar zonas: {e}")
     
-    def _point_in_polygon(self, x: float, y: float, polygon: List[Tuple[int, int]]) -> bool:
-        """Verificar se ponto está dentro do polígono"""
-        try:
-            n = len(polygon)
-            inside = False
-            
-            p1x, p1y = polygon[0]
-            for i in range(1, n + 1):
-                p2x, p2y = polygon[i % n]
-                if y > min(p1y, p2y):
-                    if y <= max(p1y, p2y):
-                        if x <= max(p1x, p2x):
-                            if p1y != p2y:
-                                xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                            if p1x == p2x or x <= xinters:
-                                inside = not inside
-                p1x, p1y = p2x, p2y
-                
-            return inside
-            
-        except Exception as e:
-            logger.error(f"Erro no cálculo point-in-polygon: {e}")
-            return False
+    def _rebuild_zone_raster(self):
+        """Compilar as zonas atuais no raster de bitmasks"""
+        polygons = {zone_id: zone.polygon for zone_id, zone in self.zones.items()}
+        extent_x = max([self.frame_width] + [x for p in polygons.values() for x, _ in p])
+        extent_y = max([self.frame_height] + [y for p in polygons.values() for _, y in p])
+        self.zone_raster = ZoneRaster(extent_x, extent_y).build(polygons)
     
     async def _analyze_movement_patterns(self) -> Dict[str, Any]:
         """Analisar padrões de movimento geral"""
@@ -652,37 +632,14 @@ class BehaviorAnalyzer:
             logger.error(f"Erro na análise de fluxo: {e}")
             return {'pattern': 'normal', 'flow_direction': 'neutral'}
     
-    def _update_heatmap(self, detections: List[Dict]):
-        """Atualizar heatmap de movimento"""
+    def _update_heatmap(self, detections: List[Dict], timestamp: datetime):
+        """Atualizar heatmap de movimento (splat do kernel no centro de cada pessoa)"""
         try:
-            # Criar máscara temporária
-            temp_heatmap = np.zeros_like(self.heatmap)
-            
-            for detection in detections:
-                bbox = detection['bbox']
-                x1, y1, x2, y2 = bbox
-                center_x = int((x1 + x2) / 2)
-                center_y = int((y1 + y2) / 2)
-                
-                # Adicionar gaussian blur em torno do centro
-                if 0 <= center_x < self.frame_width and 0 <= center_y < self.frame_height:
-                    # Criar gaussian kernel pequeno
-                    kernel_size = 21
-                    sigma = 7
-                    
-                    y_min = max(0, center_y - kernel_size//2)
-                    y_max = min(self.frame_height, center_y + kernel_size//2 + 1)
-                    x_min = max(0, center_x - kernel_size//2)
-                    x_max = min(self.frame_width, center_x + kernel_size//2 + 1)
-                    
-                    temp_heatmap[y_min:y_max, x_min:x_max] += 1
-            
-            # Aplicar blur
-            if np.sum(temp_heatmap) > 0:
-                temp_heatmap = ndimage.gaussian_filter(temp_heatmap, sigma=10)
+            if self.heatmap is None:
+                return
             
-            # Atualizar heatmap principal com decay
-            self.heatmap = (1 - self.heatmap_alpha) * self.heatmap + self.heatmap_alpha * temp_heatmap
+            centers = [((d['bbox'][0] + d['bbox'][2]) / 2, (d['bbox'][1] + d['bbox'][3]) / 2) for d in detections]
+            self.heatmap.add_points(centers, timestamp)
             
         except Exception as e:
             logger.error(f"Erro ao atualizar heatmap: {e}")
@@ -699,26 +656,20 @@ class BehaviorAnalyzer:
                 oldest_key = min(self.behavior_cache.keys())
                 del self.behavior_cache[oldest_key]
             
-            # Salvar principais métricas no banco
-            query = """
-            INSERT INTO behavior_analytics 
-            (timestamp, dwell_time_minutes, zone_visits, behavior_pattern, metadata)
-            VALUES ($1, $2, $3, $4, $5)
-            """
-            
-            await self.db.execute(
-                query,
-                timestamp,
-                behavior_data.get('avg_dwell_time', 0),
-                json.dumps(behavior_data.get('zone_interactions', {})),
-                behavior_data.get('flow_pattern', 'normal'),
-                json.dumps({
+            # Salvar principais métricas no banco (enfileirado, gravado em lote pelo writer)
+            self.writer.enqueue("behavior_analytics", {
+                'timestamp': timestamp.isoformat(),
+                'dwell_time_minutes': int(round(behavior_data.get('avg_dwell_time', 0))),
+                'zone_visits': behavior_data.get('zone_interactions', {}),
+                'behavior_pattern': behavior_data.get('flow_pattern', 'normal'),
+                'metadata': {
+                    'camera_id': self.camera_id,
                     'crowd_density': behavior_data.get('crowd_density', 0),
                     'group_rate': behavior_data.get('group_rate', 0),
                     'movement_intensity': behavior_data.get('movement_intensity', 0),
                     'total_tracks': behavior_data.get('total_tracks', 0)
-                })
-            )
+                }
+            })
             
         except Exception as e:
             logger.error(f"Erro ao salvar dados comportamentais: {e}")
@@ -736,36 +687,30 @@ class BehaviorAnalyzer:
     async def _finalize_person_track(self, track: PersonTrack):
         """Finalizar track de pessoa quando ela sai de cena"""
         try:
-            # Salvar dados finais da pessoa no banco
-            query = """
-            INSERT INTO behavior_analytics 
-            (timestamp, person_id, person_type, dwell_time_minutes, trajectory_data, zone_visits, behavior_pattern, metadata)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-            """
-            
+            # Salvar dados finais da pessoa no banco (enfileirado, gravado em lote pelo writer)
             trajectory_data = [
                 {'x': pos[0], 'y': pos[1], 'timestamp': pos[2].isoformat()}
                 for pos in list(track.positions)
             ]
             
-            await self.db.execute(
-                query,
-                track.last_seen,
-                str(track.person_id),
-                track.person_type,
-                track.dwell_time,
-                json.dumps(trajectory_data),
-                json.dumps(track.zones_visited),
-                'completed',
-                json.dumps({
+            self.writer.enqueue("behavior_analytics", {
+                'timestamp': track.last_seen.isoformat(),
+                'person_id': str(track.person_id),
+                'person_type': track.person_type,
+                'dwell_time_minutes': int(round(track.dwell_time)),
+                'trajectory_data': trajectory_data,
+                'zone_visits': track.zones_visited,
+                'behavior_pattern': 'completed',
+                'metadata': {
+                    'camera_id': self.camera_id,
                     'total_distance': track.total_distance,
                     'avg_speed': track.avg_speed,
                     'max_speed': track.max_speed,
                     'stops_count': track.stops_count,
                     'trajectory_complexity': track.trajectory_complexity,
                     'identity_id': track.identity_id
-                })
-            )
+                }
+            })
             
             logger.debug(f"✅ Track finalizado: Pessoa {track.person_id} ({track.dwell_time:.1f}min)")
             
@@ -782,13 +727,18 @@ class BehaviorAnalyzer:
             'heatmap_available': self.heatmap is not None
         }
     
-    async def get_heatmap_data(self) -> Optional[np.ndarray]:
-        """Obter dados do heatmap atual"""
-        if self.heatmap is not None:
-            # Normalizar heatmap para visualização
-            normalized = (self.heatmap / np.max(self.heatmap) * 255).astype(np.uint8) if np.max(self.heatmap) > 0 else self.heatmap.astype(np.uint8)
-            return normalized
-        return None
+    async def get_heatmap_data(self, hour: Optional[datetime] = None) -> Optional[np.ndarray]:
+        """
+        Obter heatmap normalizado (uint8, tamanho do frame)
+        
+        Args:
+            hour: Hora específica (bucket horário); None = heatmap atual com decaimento
+        """
+        if self.heatmap is None:
+            return None
+        if hour is not None:
+            return self.heatmap.render_hour(hour)
+        return self.heatmap.render()
     
     def configure_zones(self, zones_config: Dict[str, Any]):
         """Configurar zonas customizadas da loja"""
@@ -800,6 +750,7 @@ class BehaviorAnalyzer:
                     zone_type=config.get('type', 'product')
                 )
             
+            self._rebuild_zone_raster()
             logger.info(f"✅ Configuradas {len(zones_config)} zonas customizadas")
             
         except Exception as e:
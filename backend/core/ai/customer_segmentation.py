@@ -5,7 +5,7 @@ Classifica clientes em diferentes perfis e analisa padrões de comportamento
 
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Set, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import json
@@ -17,6 +17,7 @@ import asyncio
 
 from ..config import get_settings
 from ..database import DatabaseManager
+from ..event_writer import EventWriter
 
 settings = get_settings()
 
@@ -59,10 +60,18 @@ class CustomerSegmentation:
     
     def __init__(self):
         self.db = None
+        self.writer: Optional[EventWriter] = None  # Upserts em lote (write-behind)
         
         # Cache de perfis
         self.customer_profiles: Dict[str, CustomerProfile] = {}
         
+        # Persistência incremental: só perfis alterados desde a última gravação são enviados
+        self._dirty_profiles: Set[str] = set()
+        self._persisted_rows: Dict[str, Dict[str, Any]] = {}  # customer_id -> última linha gravada
+        
+        # Visitas já contadas: chave do registro de pessoas (um track) -> customer_id
+        self._counted_visits: Dict[Any, str] = {}
+        
         # Configurações de segmentação
         self.segment_rules = {
             'new': {
@@ -104,14 +113,20 @@ class CustomerSegmentation:
         
         logger.info("👥 Customer Segmentation inicializado")
     
-    async def initialize(self):
+    async def initialize(self, db: Optional[DatabaseManager] = None, writer: Optional[EventWriter] = None):
         """Inicializar o sistema de segmentação"""
         try:
-            # Initialize database connection
-            from ..config import get_settings
-            settings = get_settings()
-            self.db = DatabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-            await self.db.initialize()
+            # Initialize database connection (cliente compartilhado quando fornecido)
+            if db is None:
+                from ..config import get_settings
+                settings = get_settings()
+                db = DatabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+                await db.initialize()
+            self.db = db
+            if writer is None:
+                writer = EventWriter(db)
+                await writer.start()
+            self.writer = writer
             await self.load_customer_profiles()
             await self.update_segmentation()
             
@@ -138,9 +153,13 @@ class CustomerSegmentation:
             results = await self.db.fetch_all(query, cutoff_date)
             
             self.customer_profiles.clear()
+            self._dirty_profiles.clear()
+            self._persisted_rows.clear()
             
             for row in results:
-                profile_data = json.loads(row['profile_data'] or '{}')
+                profile_data = row['profile_data'] or {}
+                if isinstance(profile_data, str):
+                    profile_data = json.loads(profile_data)
                 
                 profile = CustomerProfile(
                     customer_id=row['customer_id'],
@@ -158,6 +177,7 @@ class CustomerSegmentation:
                 )
                 
                 self.customer_profiles[row['customer_id']] = profile
+                self._persisted_rows[profile.customer_id] = self._profile_row(profile)
             
             logger.info(f"✅ Carregados {len(self.customer_profiles)} perfis de clientes")
             
@@ -173,11 +193,12 @@ class CustomerSegmentation:
         Segmentar clientes baseado no registro atual e dados comportamentais
         
         Args:
-            person_registry: Registro de pessoas detectadas
+            person_registry: Registro completo de pessoas presentes (uma entrada por track);
+                cada entrada conta uma única visita para o seu cliente
             behavior_data: Dados comportamentais atuais
             
         Returns:
-            Contagem de clientes por segmento
+            Contagem de todos os clientes conhecidos por segmento
         """
         try:
             # Atualizar perfis baseado no registro atual
@@ -186,6 +207,8 @@ class CustomerSegmentation:
             # Executar re-segmentação se necessário
             if self._should_re_segment():
                 await self.update_segmentation()
+            else:
+                self._save_dirty_profiles()
             
             # Contar clientes por segmento
             segment_counts = {}
@@ -210,6 +233,11 @@ class CustomerSegmentation:
                 if person_data.get('type') == 'customer' and person_data.get('identity_id'):
                     customer_id = person_data['identity_id']
                     
+                    # O registro é o mesmo a cada frame: a visita de um track é contada uma vez
+                    if self._counted_visits.get(person_id) == customer_id:
+                        continue
+                    self._counted_visits[person_id] = customer_id
+                    
                     # Criar ou atualizar perfil
                     if customer_id not in self.customer_profiles:
                         # Novo cliente
@@ -240,9 +268,13 @@ class CustomerSegmentation:
                     if new_segment != profile.segment:
                         logger.info(f"Cliente {customer_id} movido de {profile.segment} para {new_segment}")
                         profile.segment = new_segment
-                        
-                        # Atualizar no banco
-                        await self._save_customer_profile(profile)
+                    
+                    # Gravado no banco no próximo _save_dirty_profiles
+                    self._dirty_profiles.add(customer_id)
+            
+            # Tracks que saíram do registro (podado por TTL/tamanho no engine)
+            for person_id in [k for k in self._counted_visits if k not in person_registry]:
+                del self._counted_visits[person_id]
                         
         except Exception as e:
             logger.error(f"Erro ao atualizar perfis: {e}")
@@ -341,9 +373,9 @@ class CustomerSegmentation:
             # Analisar segmentos
             await self._analyze_segments()
             
-            # Salvar todos os perfis atualizados
-            for profile in self.customer_profiles.values():
-                await self._save_customer_profile(profile)
+            # Salvar os perfis atualizados (só os que mudaram desde a última gravação)
+            self._dirty_profiles.update(self.customer_profiles.keys())
+            self._save_dirty_profiles()
             
             self.last_analysis_time = datetime.now()
             logger.success(f"✅ Segmentação atualizada para {len(self.customer_profiles)} clientes")
@@ -537,45 +569,51 @@ class CustomerSegmentation:
         except Exception as e:
             logger.error(f"Erro na análise de segmentos: {e}")
     
-    async def _save_customer_profile(self, profile: CustomerProfile):
-        """Salvar perfil de cliente no banco de dados"""
-        try:
-            profile_data = {
+    def _profile_row(self, profile: CustomerProfile) -> Dict[str, Any]:
+        """Linha de customer_segments de um perfil"""
+        return {
+            'customer_id': profile.customer_id,
+            'segment': profile.segment,
+            'first_visit': profile.first_visit.isoformat() if isinstance(profile.first_visit, datetime) else profile.first_visit,
+            'last_visit': profile.last_visit.isoformat() if isinstance(profile.last_visit, datetime) else profile.last_visit,
+            'visit_count': profile.visit_count,
+            'avg_dwell_time': profile.avg_dwell_time,
+            'conversion_rate': profile.conversion_rate,
+            'profile_data': {
                 'total_value': profile.total_value,
                 'preferred_zones': profile.preferred_zones,
                 'visit_frequency_days': profile.visit_frequency_days,
                 'loyalty_score': profile.loyalty_score,
                 'risk_score': profile.risk_score
             }
+        }
+    
+    def _save_dirty_profiles(self) -> int:
+        """
+        Enfileirar upsert (ON CONFLICT customer_id) dos perfis marcados como alterados
+        Perfis cuja linha não mudou desde a última gravação são ignorados
+        """
+        saved = 0
+        try:
+            for customer_id in self._dirty_profiles:
+                profile = self.customer_profiles.get(customer_id)
+                if profile is None:
+                    continue
+                
+                row = self._profile_row(profile)
+                if self._persisted_rows.get(customer_id) == row:
+                    continue
+                
+                self.writer.upsert("customer_segments", row, on_conflict="customer_id")
+                self._persisted_rows[customer_id] = row
+                saved += 1
             
-            query = """
-            INSERT INTO customer_segments 
-            (customer_id, segment, first_visit, last_visit, visit_count, avg_dwell_time, conversion_rate, profile_data)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-            ON CONFLICT (customer_id) 
-            DO UPDATE SET
-                segment = EXCLUDED.segment,
-                last_visit = EXCLUDED.last_visit,
-                visit_count = EXCLUDED.visit_count,
-                avg_dwell_time = EXCLUDED.avg_dwell_time,
-                conversion_rate = EXCLUDED.conversion_rate,
-                profile_data = EXCLUDED.profile_data
-            """
-            
-            await self.db.execute(
-                query,
-                profile.customer_id,
-                profile.segment,
-                profile.first_visit,
-                profile.last_visit,
-                profile.visit_count,
-                profile.avg_dwell_time,
-                profile.conversion_rate,
-                json.dumps(profile_data)
-            )
+            self._dirty_profiles.clear()
             
         except Exception as e:
-            logger.error(f"Erro ao salvar perfil do cliente: {e}")
+            logger.error(f"Erro ao salvar perfis de clientes: {e}")
+        
+        return saved
     
     def _should_re_segment(self) -> bool:
         """Determinar se deve executar re-segmentação"""
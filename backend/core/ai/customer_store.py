@@ -0,0 +1,286 @@
+"""
+Customer Embedding Store - Embeddings de clientes recorrentes persistidos em disco
+Array memory-mapped (float16/float32) + metadados em JSON:
+- Eviction LRU em O(1) (OrderedDict ordenado por last_seen)
+- Expiração por TTL (clientes não vistos há N dias)
+- Warm start após restart sem consultar o banco
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+@dataclass
+class CustomerRecord:
+    """Metadados de um cliente (o vetor fica na linha `slot` do memmap)"""
+    slot: int
+    first_seen: float  # time.time()
+    last_seen: float
+    visit_count: int = 1
+
+class CustomerEmbeddingStore:
+    """
+    Armazenamento compacto de embeddings de clientes
+    """
+    
+    def __init__(
+        self,
+        directory: str,
+        max_size: int = 100000,
+        dtype: str = "float16",
+        initial_capacity: int = 1024,
+        flush_interval: float = 60.0
+    ):
+        if dtype not in ("float16", "float32"):
+            raise ValueError(f"dtype não suportado: {dtype}")
+        
+        self.directory = directory
+        self.max_size = max_size
+        self.dtype = np.dtype(dtype)
+        self.initial_capacity = initial_capacity
+        self.flush_interval = flush_interval  # Segundos entre gravações automáticas (maybe_flush)
+        
+        self.vectors_path = os.path.join(directory, "customer_vectors.mmap")
+        self.meta_path = os.path.join(directory, "customer_meta.json")
+        
+        self.dim: Optional[int] = None
+        self.capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self.records: "OrderedDict[str, CustomerRecord]" = OrderedDict()  # LRU: mais antigo primeiro
+        self.free_slots: List[int] = []
+        self.next_slot = 0
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._write_lock = threading.Lock()  # flush() síncrono e flush_async() no mesmo arquivo
+        
+        # Estatísticas
+        self.stats = {
+            'evicted_lru': 0,
+            'expired_ttl': 0
+        }
+        
+        os.makedirs(directory, exist_ok=True)
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def __contains__(self, customer_id: str) -> bool:
+        return customer_id in self.records
+    
+    def _open(self, capacity: int):
+        """(Re)abrir o memmap com a capacidade pedida (cresce o arquivo se necessário)"""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        
+        size = capacity * self.dim * self.dtype.itemsize
+        mode = 'r+' if os.path.exists(self.vectors_path) else 'w+'
+        if mode == 'r+' and os.path.getsize(self.vectors_path) < size:
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(size)
+        
+        self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode=mode, shape=(capacity, self.dim))
+        self.capacity = capacity
+    
+    def _allocate_slot(self) -> int:
+        if self.free_slots:
+            return self.free_slots.pop()
+        
+        if self.next_slot >= self.capacity:
+            self._open(max(self.initial_capacity, self.capacity * 2))
+        
+        slot = self.next_slot
+        self.next_slot += 1
+        return slot
+    
+    def add(self, customer_id: str, embedding: np.ndarray, now: Optional[float] = None) -> List[str]:
+        """
+        Adicionar cliente (ou substituir embedding)
+        
+        Returns:
+            IDs removidos por LRU para abrir espaço
+        """
+        now = time.time() if now is None else now
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        
+        if self.dim is None:
+            self.dim = vector.shape[0]
+            self._open(self.initial_capacity)
+        elif vector.shape[0] != self.dim:
+            logger.warning(f"Embedding de dimensão {vector.shape[0]} ignorado (store usa {self.dim})")
+            return []
+        
+        evicted = []
+        record = self.records.get(customer_id)
+        
+        if record is None:
+            while len(self.records) >= self.max_size:
+                evicted.append(self._pop_oldest())
+                self.stats['evicted_lru'] += 1
+            record = CustomerRecord(slot=self._allocate_slot(), first_seen=now, last_seen=now)
+            self.records[customer_id] = record
+        else:
+            record.last_seen = now
+            self.records.move_to_end(customer_id)
+        
+        self._vectors[record.slot] = vector.astype(self.dtype)
+        self._dirty = True
+        return evicted
+    
+    def _pop_oldest(self) -> str:
+        customer_id, record = self.records.popitem(last=False)
+        self.free_slots.append(record.slot)
+        return customer_id
+    
+    def remove(self, customer_id: str) -> bool:
+        record = self.records.pop(customer_id, None)
+        if record is None:
+            return False
+        self.free_slots.append(record.slot)
+        self._dirty = True
+        return True
+    
+    def touch(self, customer_id: str, now: Optional[float] = None) -> Optional[CustomerRecord]:
+        """Registrar que o cliente foi visto (move para o fim da LRU)"""
+        record = self.records.get(customer_id)
+        if record is not None:
+            record.last_seen = time.time() if now is None else now
+            self.records.move_to_end(customer_id)
+            self._dirty = True
+        return record
+    
+    def record_visit(self, customer_id: str) -> int:
+        """Incrementar visitas (retorna o total, 0 se desconhecido)"""
+        record = self.records.get(customer_id)
+        if record is None:
+            return 0
+        record.visit_count += 1
+        self._dirty = True
+        return record.visit_count
+    
+    def get(self, customer_id: str) -> Optional[np.ndarray]:
+        record = self.records.get(customer_id)
+        return None if record is None else np.asarray(self._vectors[record.slot], dtype=np.float32)
+    
+    def get_record(self, customer_id: str) -> Optional[CustomerRecord]:
+        return self.records.get(customer_id)
+    
+    def items(self) -> Iterator[Tuple[str, np.ndarray]]:
+        """(customer_id, embedding float32) de todos os clientes"""
+        for customer_id, record in self.records.items():
+            yield customer_id, np.asarray(self._vectors[record.slot], dtype=np.float32)
+    
+    def expire(self, max_age_seconds: float, now: Optional[float] = None) -> List[str]:
+        """Remover clientes não vistos há max_age_seconds (varre só o início da LRU)"""
+        now = time.time() if now is None else now
+        expired = []
+        
+        while self.records:
+            oldest_id = next(iter(self.records))
+            if now - self.records[oldest_id].last_seen < max_age_seconds:
+                break
+            expired.append(self._pop_oldest())
+        
+        if expired:
+            self.stats['expired_ttl'] += len(expired)
+            self._dirty = True
+        return expired
+    
+    def _snapshot(self) -> Optional[Dict[str, Any]]:
+        """Cópia rasa do estado a gravar (mudanças posteriores marcam sujo de novo)"""
+        if not self._dirty or self.dim is None:
+            return None
+        
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        return {
+            'vectors': self._vectors,
+            'dim': self.dim,
+            'dtype': self.dtype.name,
+            'capacity': self.capacity,
+            'next_slot': self.next_slot,
+            'free_slots': list(self.free_slots),
+            'records': list(self.records.items())
+        }
+    
+    def _write(self, snapshot: Dict[str, Any]):
+        """Serializar e gravar um snapshot (seguro para executor)"""
+        with self._write_lock:
+            snapshot['vectors'].flush()
+            
+            meta = {key: value for key, value in snapshot.items() if key != 'vectors'}
+            meta['records'] = [[customer_id, asdict(record)] for customer_id, record in snapshot['records']]
+            tmp_path = f"{self.meta_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, self.meta_path)
+    
+    def flush(self):
+        """Gravar vetores e metadados no disco (síncrono: shutdown e scripts)"""
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            self._write(snapshot)
+    
+    async def flush_async(self):
+        """flush() com serialização e escrita em executor (chamadores no event loop)"""
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return
+        
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, snapshot)
+        except Exception:
+            self._dirty = True  # Tentar de novo no próximo flush
+            raise
+    
+    async def maybe_flush(self):
+        """Gravar se houver mudanças e o intervalo de flush tiver passado"""
+        if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush_async()
+    
+    def load(self) -> int:
+        """Warm start: reabrir o memmap e os metadados salvos por flush()"""
+        if not os.path.exists(self.meta_path) or not os.path.exists(self.vectors_path):
+            return 0
+        
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            
+            if meta['dtype'] != self.dtype.name:
+                logger.warning(f"Store de clientes salvo em {meta['dtype']}, configurado {self.dtype.name} - ignorando")
+                return 0
+            
+            self.dim = meta['dim']
+            self._open(meta['capacity'])
+            self.next_slot = meta['next_slot']
+            self.free_slots = list(meta['free_slots'])
+            self.records = OrderedDict(
+                (customer_id, CustomerRecord(**record)) for customer_id, record in meta['records']
+            )
+            
+            # Respeitar um max_size menor que o salvo
+            while len(self.records) > self.max_size:
+                self._pop_oldest()
+            
+            return len(self.records)
+        
+        except Exception as e:
+            logger.error(f"Erro ao carregar store de clientes: {e}")
+            self.records = OrderedDict()
+            return 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'customers': len(self.records),
+            'capacity': self.capacity,
+            'dtype': self.dtype.name
+        }
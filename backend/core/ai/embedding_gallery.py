@@ -0,0 +1,152 @@
+"""
+Embedding Gallery - Galeria de embeddings faciais em matriz contígua
+Busca vetorizada (uma operação matriz-vetor + argmin) no lugar de loops
+Python sobre dicionários de embeddings.
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+class EmbeddingGallery:
+    """
+    Matriz float32 (N x D) + array de IDs, atualizada incrementalmente.
+    Remoção por swap com a última linha (O(D)), inserção amortizada O(D).
+    """
+    
+    def __init__(self, metric: str = "euclidean", initial_capacity: int = 64):
+        if metric not in ("euclidean", "cosine"):
+            raise ValueError(f"Métrica não suportada: {metric}")
+        
+        self.metric = metric
+        self.dim: Optional[int] = None
+        self.initial_capacity = initial_capacity
+        
+        self._matrix: Optional[np.ndarray] = None  # Linhas [0, size) válidas
+        self._sq_norms: Optional[np.ndarray] = None  # ||e||² por linha (euclidiana)
+        self._ids: List[str] = []
+        self._index: Dict[str, int] = {}  # id -> linha
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def __contains__(self, identity_id: str) -> bool:
+        return identity_id in self._index
+    
+    @property
+    def ids(self) -> List[str]:
+        return list(self._ids)
+    
+    @property
+    def matrix(self) -> np.ndarray:
+        """Visão das linhas válidas (sem cópia)"""
+        if self._matrix is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._matrix[:len(self._ids)]
+    
+    def _prepare(self, embedding: np.ndarray) -> np.ndarray:
+        """Converter para float32 (normalizado na métrica cosseno)"""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        if self.metric == "cosine":
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector = vector / norm
+        return vector
+    
+    def _ensure_capacity(self, needed: int):
+        """Crescer a matriz dobrando a capacidade"""
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        
+        new_capacity = max(self.initial_capacity, capacity * 2, needed)
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        sq_norms = np.zeros(new_capacity, dtype=np.float32)
+        
+        if self._matrix is not None:
+            matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+            sq_norms[:len(self._ids)] = self._sq_norms[:len(self._ids)]
+        
+        self._matrix = matrix
+        self._sq_norms = sq_norms
+    
+    def add(self, identity_id: str, embedding: np.ndarray):
+        """Adicionar (ou substituir) o embedding de uma identidade"""
+        vector = self._prepare(embedding)
+        
+        if self.dim is None:
+            self.dim = vector.shape[0]
+        elif vector.shape[0] != self.dim:
+            logger.warning(f"Embedding de dimensão {vector.shape[0]} ignorado (galeria usa {self.dim})")
+            return
+        
+        row = self._index.get(identity_id)
+        if row is None:
+            row = len(self._ids)
+            self._ensure_capacity(row + 1)
+            self._ids.append(identity_id)
+            self._index[identity_id] = row
+        
+        self._matrix[row] = vector
+        self._sq_norms[row] = float(vector @ vector)
+    
+    def remove(self, identity_id: str) -> bool:
+        """Remover identidade (a última linha ocupa o lugar da removida)"""
+        row = self._index.pop(identity_id, None)
+        if row is None:
+            return False
+        
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._sq_norms[row] = self._sq_norms[last]
+            self._ids[row] = moved_id
+            self._index[moved_id] = row
+        
+        self._ids.pop()
+        return True
+    
+    def clear(self):
+        """Esvaziar a galeria (mantém a capacidade alocada)"""
+        self._ids.clear()
+        self._index.clear()
+    
+    def get(self, identity_id: str) -> Optional[np.ndarray]:
+        """Embedding armazenado de uma identidade"""
+        row = self._index.get(identity_id)
+        return None if row is None else self._matrix[row].copy()
+    
+    def distances(self, embedding: np.ndarray) -> np.ndarray:
+        """Distância do embedding para todas as identidades (uma operação matriz-vetor)"""
+        if not self._ids:
+            return np.zeros(0, dtype=np.float32)
+        
+        query = self._prepare(embedding)
+        size = len(self._ids)
+        dots = self._matrix[:size] @ query
+        
+        if self.metric == "cosine":
+            return 1.0 - dots
+        
+        # ||a - b||² = ||a||² - 2a·b + ||b||²
+        sq = self._sq_norms[:size] - 2.0 * dots + float(query @ query)
+        return np.sqrt(np.maximum(sq, 0.0))
+    
+    def match(self, embedding: np.ndarray, threshold: float) -> Tuple[Optional[str], float]:
+        """
+        Melhor identidade dentro do threshold
+        
+        Returns:
+            (identity_id ou None, menor distância)
+        """
+        distances = self.distances(embedding)
+        if distances.size == 0:
+            return None, float('inf')
+        
+        best = int(np.argmin(distances))
+        best_distance = float(distances[best])
+        
+        if best_distance < threshold:
+            return self._ids[best], best_distance
+        return None, best_distance
@@ -0,0 +1,127 @@
+"""
+Face Encoding Worker - Encoding de faces em lote fora do event loop
+Funções de nível de módulo (serializáveis) executadas em um pool de processos
+ou em thread. Cada processo carrega o backend uma única vez no initializer.
+Mantém importações mínimas: processos filhos não carregam config nem banco.
+"""
+
+from typing import List, Optional
+import cv2
+import numpy as np
+
+# import face_recognition  # Desabilitado como em core/ai/face_recognition.py até resolver o dlib
+face_recognition = None
+
+DEEPFACE_MODEL = "Facenet512"
+
+# Backend carregado no processo atual (por init_worker ou sob demanda)
+_backend = {}
+
+class _DeepFaceBackend:
+    """Modelo DeepFace carregado uma vez; crops alinhados viram um único predict"""
+    
+    def __init__(self):
+        from deepface import DeepFace
+        self.DeepFace = DeepFace
+        self.model = DeepFace.build_model(DEEPFACE_MODEL)  # Modelo fica em cache no processo
+        try:
+            from deepface.commons import functions
+            self.target_size = functions.find_target_size(model_name=DEEPFACE_MODEL)
+            self.functions = functions
+        except (ImportError, AttributeError):
+            self.target_size = None
+            self.functions = None  # API interna indisponível: represent por face
+
+def init_worker(method: str):
+    """Carregar o backend de encoding uma vez por processo"""
+    if method in _backend:
+        return
+    
+    if method == "deepface":
+        try:
+            _backend[method] = _DeepFaceBackend()
+        except ImportError:
+            _backend[method] = None
+    else:
+        _backend[method] = face_recognition
+
+def _cuda_available() -> bool:
+    try:
+        import dlib
+        return bool(dlib.DLIB_USE_CUDA)
+    except Exception:
+        return False
+
+def _encode_face_recognition(lib, crops: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+    """Localização + encoding de todas as faces com face_recognition"""
+    rgb_crops = [cv2.cvtColor(crop, cv2.COLOR_BGR2RGB) for crop in crops]
+    
+    # Crops do mesmo tamanho com dlib em GPU: localização em lote (uma passada da CNN)
+    if len(rgb_crops) > 1 and len({crop.shape for crop in rgb_crops}) == 1 and _cuda_available():
+        locations = lib.batch_face_locations(rgb_crops, number_of_times_to_upsample=0)
+    else:
+        locations = [lib.face_locations(crop) for crop in rgb_crops]
+    
+    encodings = []
+    for crop, crop_locations in zip(rgb_crops, locations):
+        if not crop_locations:
+            encodings.append(None)
+            continue
+        found = lib.face_encodings(crop, crop_locations[:1])
+        encodings.append(np.asarray(found[0]) if found else None)
+    
+    return encodings
+
+def _encode_deepface(backend: _DeepFaceBackend, crops: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+    """Embeddings DeepFace a partir de arrays: alinhamento por crop, inferência em um lote"""
+    encodings: List[Optional[np.ndarray]] = [None] * len(crops)
+    
+    if backend.functions is None:
+        for i, crop in enumerate(crops):
+            try:
+                result = backend.DeepFace.represent(img_path=crop, model_name=DEEPFACE_MODEL, enforce_detection=False)
+                encodings[i] = np.array(result[0]["embedding"]) if result else None
+            except Exception:
+                pass
+        return encodings
+    
+    aligned, owners = [], []
+    for i, crop in enumerate(crops):
+        try:
+            faces = backend.functions.extract_faces(
+                img=crop,
+                target_size=backend.target_size,
+                grayscale=False,
+                enforce_detection=False,
+                align=True
+            )
+        except Exception:
+            continue
+        
+        if faces:
+            aligned.append(backend.functions.normalize_input(img=faces[0][0], normalization='base'))
+            owners.append(i)
+    
+    if aligned:
+        vectors = backend.model.predict(np.concatenate(aligned, axis=0), verbose=0)
+        for i, vector in zip(owners, vectors):
+            encodings[i] = np.asarray(vector)
+    
+    return encodings
+
+def encode_batch(method: str, crops: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+    """
+    Encoding de um lote de crops BGR
+    
+    Returns:
+        Lista alinhada com crops (None onde não houve face)
+    """
+    init_worker(method)
+    lib = _backend.get(method)
+    
+    if lib is None or not crops:
+        return [None] * len(crops)
+    
+    if method == "deepface":
+        return _encode_deepface(lib, crops)
+    return _encode_face_recognition(lib, crops)
@@ -0,0 +1,123 @@
+"""
+Face Quality - Pré-estágio barato antes do encoding facial
+Recorta a região da cabeça (topo da bbox da pessoa), reduz a resolução e
+descarta crops pequenos, borrados ou escuros antes de chamar o encoder.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+import cv2
+import numpy as np
+from loguru import logger
+
+from utils.helpers import calculate_frame_quality
+
+@dataclass
+class FaceCrop:
+    """Crop da cabeça pronto para o encoder"""
+    image: Optional[np.ndarray]  # BGR reduzido (None quando rejeitado)
+    quality: float  # 0-1 (tamanho x nitidez)
+    reject_reason: Optional[str] = None  # small, blurry, dark, overexposed ou None
+    
+    @property
+    def usable(self) -> bool:
+        return self.image is not None
+
+class FaceCropper:
+    """
+    Crop da região da cabeça + filtro de qualidade
+    """
+    
+    def __init__(
+        self,
+        head_ratio: float = 0.35,
+        max_size: int = 160,
+        min_size: int = 32,
+        min_sharpness: float = 30.0,
+        min_brightness: float = 40.0,
+        max_brightness: float = 230.0
+    ):
+        self.head_ratio = head_ratio  # Fração superior da bbox onde está a cabeça
+        self.max_size = max_size  # Lado maior do crop entregue ao encoder (px)
+        self.min_size = min_size  # Lado menor mínimo da região da cabeça no frame original (px)
+        self.min_sharpness = min_sharpness  # Variância do Laplaciano mínima
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        
+        # Estatísticas
+        self.stats = {
+            'crops': 0,
+            'accepted': 0,
+            'rejected_small': 0,
+            'rejected_blurry': 0,
+            'rejected_dark': 0,
+            'rejected_overexposed': 0
+        }
+    
+    def _head_region(self, frame: np.ndarray, bbox: List[int]) -> Optional[np.ndarray]:
+        """Topo da bbox com uma pequena margem lateral"""
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = [int(v) for v in bbox]
+        
+        head_height = int((y2 - y1) * self.head_ratio)
+        margin = int((x2 - x1) * 0.05)
+        
+        x1 = max(0, x1 - margin)
+        x2 = min(width, x2 + margin)
+        y1 = max(0, y1)
+        y2 = min(height, y1 + head_height)
+        
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return frame[y1:y2, x1:x2]
+    
+    def _reject(self, reason: str) -> FaceCrop:
+        self.stats[f'rejected_{reason}'] += 1
+        return FaceCrop(image=None, quality=0.0, reject_reason=reason)
+    
+    def crop(self, frame: np.ndarray, bbox: List[int]) -> FaceCrop:
+        """
+        Recortar e avaliar a cabeça de uma pessoa
+        
+        Returns:
+            FaceCrop (image None quando o crop não vale um encoding)
+        """
+        self.stats['crops'] += 1
+        
+        try:
+            head = self._head_region(frame, bbox)
+            if head is None or min(head.shape[:2]) < self.min_size:
+                return self._reject('small')
+            
+            # Reduzir antes de medir: métricas e encoder trabalham na resolução final
+            scale = self.max_size / max(head.shape[:2])
+            if scale < 1.0:
+                head = cv2.resize(head, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            
+            metrics = calculate_frame_quality(head)
+            if metrics['brightness'] < self.min_brightness:
+                return self._reject('dark')
+            if metrics['brightness'] > self.max_brightness:
+                return self._reject('overexposed')
+            if metrics['sharpness'] < self.min_sharpness:
+                return self._reject('blurry')
+            
+            # Rostos maiores e mais nítidos valem mais (tamanho satura em max_size/2, nitidez em 4x o mínimo)
+            size_score = min(1.0, min(head.shape[:2]) / (self.max_size / 2))
+            sharpness_score = min(1.0, metrics['sharpness'] / (self.min_sharpness * 4))
+            quality = size_score * sharpness_score
+            
+            self.stats['accepted'] += 1
+            return FaceCrop(image=head, quality=float(quality))
+        
+        except Exception as e:
+            logger.error(f"Erro ao recortar face: {e}")
+            return FaceCrop(image=None, quality=0.0, reject_reason='error')
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de aceitação/rejeição"""
+        crops = self.stats['crops']
+        return {
+            **self.stats,
+            'acceptance_rate': round(self.stats['accepted'] / crops, 3) if crops else 0.0
+        }
@@ -7,15 +7,18 @@ import cv2
 import numpy as np
 # import face_recognition  # Temporarily disabled until dlib is resolved
 face_recognition = None
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Union
 import pickle
 import os
 import json
 import hashlib
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
+import time
 from loguru import logger
 import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     from deepface import DeepFace
@@ -33,17 +36,32 @@ except ImportError:
 
 from ..config import get_settings
 from ..database import DatabaseManager
+from .embedding_gallery import EmbeddingGallery
+from .ann_index import ANNIndex, create_ann_index
+from .customer_store import CustomerEmbeddingStore
+from . import face_encoding_worker
 
 settings = get_settings()
 
 class FaceEncoder:
     """Classe para encoding de faces usando diferentes backends"""
     
-    def __init__(self, method: str = "face_recognition"):
+    def __init__(self, method: str = "face_recognition", workers: int = 0):
         self.method = method
         self.model = None
         self.initialized = False
         
+        # Pool de processos para face_recognition/DeepFace (0 = uma thread do loop)
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        
+        # Estatísticas de lote
+        self.batch_stats = {
+            'batches': 0,
+            'faces_encoded': 0,
+            'total_batch_ms': 0.0
+        }
+        
     async def initialize(self):
         """Inicializar o modelo de encoding"""
         try:
@@ -67,6 +85,8 @@ class FaceEncoder:
                 self.method = "face_recognition"
                 self.initialized = True
                 logger.info("✅ face_recognition encoder inicializado")
+            
+            self._start_executor()
                 
         except Exception as e:
             logger.error(f"Erro ao inicializar encoder {self.method}: {e}")
@@ -79,45 +99,97 @@ class FaceEncoder:
                 logger.warning("⚠️ Face recognition não disponível - módulo desabilitado")
                 self.initialized = False
     
+    def _start_executor(self):
+        """Criar pool de processos (cada processo carrega o modelo uma vez)"""
+        if self.workers <= 0 or self.executor is not None or self.method not in ("face_recognition", "deepface"):
+            return
+        
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),  # TensorFlow/dlib não são fork-safe
+            initializer=face_encoding_worker.init_worker,
+            initargs=(self.method,)
+        )
+        logger.info(f"✅ Pool de encoding facial: {self.workers} processos ({self.method})")
+    
     async def encode_face(self, face_image: np.ndarray) -> Optional[np.ndarray]:
         """Extrair encoding da face"""
+        encodings = await self.encode_faces([face_image])
+        return encodings[0]
+    
+    async def encode_faces(self, face_images: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """
+        Extrair encodings de todas as faces de um frame em lote
+        
+        Uma única ida ao executor por processo (conversão de cor, localização e
+        encoding de todas as crops juntas) no lugar de uma chamada por pessoa.
+        
+        Returns:
+            Lista alinhada com face_images (None onde não houve face)
+        """
+        if not face_images:
+            return []
+        
         if not self.initialized:
             await self.initialize()
-            
+        
+        if not self.initialized:
+            return [None] * len(face_images)
+        
         try:
-            if self.method == "deepface" and DEEPFACE_AVAILABLE:
-                # DeepFace
-                embedding = DeepFace.represent(
-                    img_path=face_image,
-                    model_name="Facenet512",
-                    enforce_detection=False
-                )
-                return np.array(embedding[0]["embedding"])
+            start = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            
+            if self.method == "insightface" and self.model:
+                encodings = await loop.run_in_executor(None, self._encode_insightface, face_images)
                 
-            elif self.method == "insightface" and self.model:
-                # InsightFace
-                faces = self.model.get(face_image)
-                if len(faces) > 0:
-                    return faces[0].embedding
-                return None
+            elif self.executor is not None:
+                # Dividir o lote entre os processos do pool
+                chunk_size = -(-len(face_images) // self.workers)
+                chunks = [face_images[i:i + chunk_size] for i in range(0, len(face_images), chunk_size)]
+                results = await asyncio.gather(*[
+                    loop.run_in_executor(self.executor, face_encoding_worker.encode_batch, self.method, chunk)
+                    for chunk in chunks
+                ])
+                encodings = [encoding for result in results for encoding in result]
                 
             else:
-                # face_recognition (se disponível)
-                if face_recognition is not None:
-                    rgb_image = cv2.cvtColor(face_image, cv2.COLOR_BGR2RGB)
-                    face_locations = face_recognition.face_locations(rgb_image)
-                    
-                    if len(face_locations) > 0:
-                        face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
-                        if len(face_encodings) > 0:
-                            return face_encodings[0]
-                
-                logger.warning("Face recognition não disponível")
-                return None
-                
+                encodings = await loop.run_in_executor(
+                    None, face_encoding_worker.encode_batch, self.method, face_images
+                )
+            
+            self.batch_stats['batches'] += 1
+            self.batch_stats['faces_encoded'] += len(face_images)
+            self.batch_stats['total_batch_ms'] += (time.perf_counter() - start) * 1000
+            return encodings
+            
         except Exception as e:
-            logger.error(f"Erro ao extrair encoding: {e}")
-            return None
+            logger.error(f"Erro ao extrair encodings em lote: {e}")
+            return [None] * len(face_images)
+    
+    def _encode_insightface(self, face_images: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """InsightFace (modelo no processo principal)"""
+        encodings = []
+        for face_image in face_images:
+            faces = self.model.get(face_image)
+            encodings.append(faces[0].embedding if len(faces) > 0 else None)
+        return encodings
+    
+    def get_batch_stats(self) -> Dict[str, Any]:
+        """Estatísticas do encoding em lote"""
+        batches = self.batch_stats['batches']
+        return {
+            **self.batch_stats,
+            'workers': self.workers if self.executor else 0,
+            'avg_batch_size': round(self.batch_stats['faces_encoded'] / batches, 2) if batches else 0.0,
+            'avg_batch_ms': round(self.batch_stats['total_batch_ms'] / batches, 2) if batches else 0.0
+        }
+    
+    def close(self):
+        """Encerrar pool de processos"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
     
     def compare_faces(self, known_encoding: np.ndarray, unknown_encoding: np.ndarray, threshold: float = 0.6) -> bool:
         """Comparar duas faces"""
@@ -141,16 +213,32 @@ class FaceRecognitionManager:
     
     def __init__(self):
         self.db = None  # Será inicializado posteriormente
-        self.encoder = FaceEncoder(method="face_recognition")  # Mais estável
+        self.encoder = FaceEncoder(method="face_recognition", workers=settings.FACE_ENCODER_WORKERS)  # Mais estável
         
         # Cache de embeddings
         self.employee_embeddings = {}  # employee_id -> embedding
-        self.customer_embeddings = {}  # customer_id -> embedding
         
         # Configurações
         self.similarity_threshold = 0.6
         self.face_embeddings_dir = "face_embeddings"
-        self.max_customers_cache = 1000
+        self.customer_index_path = f"{self.face_embeddings_dir}/customers/customer_index.npz"
+        self.max_customers_cache = settings.FACE_CUSTOMER_CACHE_SIZE
+        self.customer_ttl = timedelta(days=settings.FACE_CUSTOMER_TTL_DAYS)
+        
+        # Clientes: store memory-mapped (LRU/TTL, sobrevive a restarts)
+        self.customer_store = CustomerEmbeddingStore(
+            f"{self.face_embeddings_dir}/customers",
+            max_size=self.max_customers_cache,
+            dtype=settings.FACE_STORE_DTYPE
+        )
+        
+        # Galerias vetorizadas sincronizadas com os caches acima
+        # Clientes usam índice ANN (HNSW/IVF) para galerias de 100k+ recorrentes
+        self.employee_gallery = EmbeddingGallery()
+        self.customer_gallery = create_ann_index(
+            settings.FACE_INDEX_TYPE,
+            nprobe=settings.FACE_INDEX_NPROBE
+        )
         
         # Estatísticas
         self.recognition_stats = {
@@ -168,15 +256,18 @@ class FaceRecognitionManager:
         os.makedirs(f"{self.face_embeddings_dir}/employees", exist_ok=True)
         os.makedirs(f"{self.face_embeddings_dir}/customers", exist_ok=True)
     
-    async def initialize(self):
+    async def initialize(self, db: Optional[DatabaseManager] = None):
         """Inicializar o sistema de reconhecimento facial"""
         try:
-            # Inicializar database manager com configurações
-            settings = get_settings()
-            self.db = DatabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-            await self.db.initialize()
+            # Inicializar database manager (cliente compartilhado quando fornecido)
+            if db is None:
+                settings = get_settings()
+                db = DatabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+                await db.initialize()
+            self.db = db
             
             await self.encoder.initialize()
+            self.load_customer_index()
             logger.info("✅ Face Recognition Manager inicializado")
             
         except Exception as e:
@@ -195,6 +286,7 @@ class FaceRecognitionManager:
             results = await self.db.fetch_all(query)
             
             self.employee_embeddings.clear()
+            self.employee_gallery.clear()
             
             for row in results:
                 employee_id = row['employee_id']
@@ -206,6 +298,7 @@ class FaceRecognitionManager:
                         'encoding': np.array(face_encoding),
                         'last_seen': None
                     }
+                    self.employee_gallery.add(employee_id, self.employee_embeddings[employee_id]['encoding'])
             
             logger.info(f"✅ Carregados {len(self.employee_embeddings)} funcionários")
             
@@ -241,9 +334,9 @@ class FaceRecognitionManager:
                 raise Exception("Não foi possível detectar face na imagem")
             
             # Verificar se já existe funcionário similar
-            for emp_id, emp_data in self.employee_embeddings.items():
-                if self.encoder.compare_faces(emp_data['encoding'], encoding):
-                    raise Exception(f"Funcionário similar já registrado: {emp_data['name']}")
+            similar_id, _ = self.employee_gallery.match(encoding, self.similarity_threshold)
+            if similar_id is not None and similar_id != employee_id:
+                raise Exception(f"Funcionário similar já registrado: {self.employee_embeddings[similar_id]['name']}")
             
             # Salvar no banco de dados
             query = """
@@ -271,6 +364,7 @@ class FaceRecognitionManager:
                 'encoding': encoding,
                 'last_seen': None
             }
+            self.employee_gallery.add(employee_id, encoding)
             
             # Salvar embedding em arquivo para backup
             embedding_file = f"{self.face_embeddings_dir}/employees/{employee_id}.pkl"
@@ -298,6 +392,7 @@ class FaceRecognitionManager:
             # Remover do cache
             if employee_id in self.employee_embeddings:
                 del self.employee_embeddings[employee_id]
+            self.employee_gallery.remove(employee_id)
             
             # Remover arquivo de embedding
             embedding_file = f"{self.face_embeddings_dir}/employees/{employee_id}.pkl"
@@ -311,34 +406,35 @@ class FaceRecognitionManager:
             logger.error(f"Erro ao remover funcionário: {e}")
             return False
     
-    async def is_employee(self, face_image: np.ndarray) -> Tuple[bool, Optional[str]]:
+    async def encode(self, face_image: np.ndarray) -> Optional[np.ndarray]:
+        """Extrair encoding uma única vez para as verificações de funcionário e cliente"""
+        self.recognition_stats['total_recognitions'] += 1
+        return await self.encoder.encode_face(face_image)
+    
+    async def encode_many(self, face_images: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """Encodings de todas as faces de um frame em uma única chamada em lote"""
+        self.recognition_stats['total_recognitions'] += len(face_images)
+        return await self.encoder.encode_faces(face_images)
+    
+    def _best_match(self, gallery: Union[EmbeddingGallery, ANNIndex], encoding: np.ndarray) -> Tuple[Optional[str], float]:
+        """Melhor match da galeria dentro do threshold (id, distância) - busca vetorizada/ANN"""
+        return gallery.match(encoding, self.similarity_threshold)
+    
+    def match_confidence(self, distance: float) -> float:
+        """Converter distância em confiança 0-1 relativa ao threshold"""
+        if not np.isfinite(distance):
+            return 0.0
+        return float(max(0.0, 1.0 - distance / self.similarity_threshold))
+    
+    async def match_employee(self, encoding: np.ndarray) -> Tuple[bool, Optional[str], float]:
         """
-        Verificar se uma face pertence a um funcionário
+        Comparar encoding com funcionários conhecidos
         
         Returns:
-            (is_employee, employee_id)
+            (is_employee, employee_id, distance)
         """
         try:
-            self.recognition_stats['total_recognitions'] += 1
-            
-            # Extrair encoding da face
-            unknown_encoding = await self.encoder.encode_face(face_image)
-            
-            if unknown_encoding is None:
-                return False, None
-            
-            # Comparar com funcionários conhecidos
-            best_match = None
-            best_distance = float('inf')
-            
-            for employee_id, emp_data in self.employee_embeddings.items():
-                if self.encoder.compare_faces(emp_data['encoding'], unknown_encoding, self.similarity_threshold):
-                    # Calcular distância para escolher o melhor match
-                    distance = np.linalg.norm(emp_data['encoding'] - unknown_encoding)
-                    
-                    if distance < best_distance:
-                        best_distance = distance
-                        best_match = employee_id
+            best_match, best_distance = self._best_match(self.employee_gallery, encoding)
             
             if best_match:
                 self.recognition_stats['successful_employee_matches'] += 1
@@ -349,9 +445,64 @@ class FaceRecognitionManager:
                 await self.db.execute(query, datetime.now(), best_match)
                 
                 logger.debug(f"✅ Funcionário reconhecido: {best_match}")
-                return True, best_match
+                return True, best_match, best_distance
             
-            return False, None
+            return False, None, best_distance
+            
+        except Exception as e:
+            logger.error(f"Erro no reconhecimento de funcionário: {e}")
+            return False, None, float('inf')
+    
+    async def match_customer(self, encoding: np.ndarray, count_visit: bool = True) -> Tuple[Optional[str], float]:
+        """
+        Comparar encoding com clientes conhecidos (registra cliente novo se não houver match)
+        
+        Args:
+            encoding: Embedding da face
+            count_visit: Contar visita ao reconhecer (False em re-verificações do mesmo track)
+            
+        Returns:
+            (customer_id, distance)
+        """
+        try:
+            # Comparar com clientes conhecidos (cache limitado)
+            best_match, best_distance = self._best_match(self.customer_gallery, encoding)
+            
+            if best_match:
+                self.recognition_stats['successful_customer_matches'] += 1
+                self.customer_store.touch(best_match)
+                
+                # Atualizar segmentação do cliente
+                if count_visit:
+                    await self._update_customer_segment(best_match)
+                
+                logger.debug(f"✅ Cliente reconhecido: {best_match}")
+                return best_match, best_distance
+            
+            # Cliente novo - adicionar ao cache se houver espaço
+            customer_id = await self._register_new_customer(encoding)
+            return customer_id, 0.0
+            
+        except Exception as e:
+            logger.error(f"Erro na identificação de cliente: {e}")
+            return None, float('inf')
+    
+    async def is_employee(self, face_image: np.ndarray) -> Tuple[bool, Optional[str]]:
+        """
+        Verificar se uma face pertence a um funcionário
+        
+        Returns:
+            (is_employee, employee_id)
+        """
+        try:
+            # Extrair encoding da face
+            unknown_encoding = await self.encode(face_image)
+            
+            if unknown_encoding is None:
+                return False, None
+            
+            is_employee, employee_id, _ = await self.match_employee(unknown_encoding)
+            return is_employee, employee_id
             
         except Exception as e:
             logger.error(f"Erro no reconhecimento de funcionário: {e}")
@@ -371,31 +522,8 @@ class FaceRecognitionManager:
             if unknown_encoding is None:
                 return None
             
-            # Comparar com clientes conhecidos (cache limitado)
-            best_match = None
-            best_distance = float('inf')
-            
-            for customer_id, customer_data in self.customer_embeddings.items():
-                if self.encoder.compare_faces(customer_data['encoding'], unknown_encoding, self.similarity_threshold):
-                    distance = np.linalg.norm(customer_data['encoding'] - unknown_encoding)
-                    
-                    if distance < best_distance:
-                        best_distance = distance
-                        best_match = customer_id
-            
-            if best_match:
-                self.recognition_stats['successful_customer_matches'] += 1
-                self.customer_embeddings[best_match]['last_seen'] = datetime.now()
-                
-                # Atualizar segmentação do cliente
-                await self._update_customer_segment(best_match)
-                
-                logger.debug(f"✅ Cliente reconhecido: {best_match}")
-                return best_match
-            else:
-                # Cliente novo - adicionar ao cache se houver espaço
-                customer_id = await self._register_new_customer(unknown_encoding)
-                return customer_id
+            customer_id, _ = await self.match_customer(unknown_encoding)
+            return customer_id
             
         except Exception as e:
             logger.error(f"Erro na identificação de cliente: {e}")
@@ -406,22 +534,15 @@ class FaceRecognitionManager:
         try:
             customer_id = f"customer_{hashlib.md5(encoding.tobytes()).hexdigest()[:8]}"
             
-            # Verificar limite de cache
-            if len(self.customer_embeddings) >= self.max_customers_cache:
-                # Remover o mais antigo
-                oldest_customer = min(
-                    self.customer_embeddings.items(),
-                    key=lambda x: x[1].get('last_seen', datetime.min)
-                )[0]
-                del self.customer_embeddings[oldest_customer]
-            
-            # Adicionar novo cliente
-            self.customer_embeddings[customer_id] = {
-                'encoding': encoding,
-                'first_seen': datetime.now(),
-                'last_seen': datetime.now(),
-                'visit_count': 1
-            }
+            # Expirar clientes não vistos há FACE_CUSTOMER_TTL_DAYS (só o início da LRU)
+            for expired_id in self.customer_store.expire(self.customer_ttl.total_seconds()):
+                self.customer_gallery.remove(expired_id)
+            
+            # Adicionar novo cliente (o store remove os menos recentes ao atingir o limite)
+            for evicted_id in self.customer_store.add(customer_id, encoding):
+                self.customer_gallery.remove(evicted_id)
+            self.customer_gallery.add(customer_id, encoding)
+            await self.customer_store.maybe_flush()
             
             # Salvar no banco de segmentação
             query = """
@@ -450,12 +571,8 @@ class FaceRecognitionManager:
         """Atualizar segmentação de cliente conhecido"""
         try:
             # Incrementar contador de visitas
-            if customer_id in self.customer_embeddings:
-                self.customer_embeddings[customer_id]['visit_count'] = \
-                    self.customer_embeddings[customer_id].get('visit_count', 0) + 1
-                
-                visit_count = self.customer_embeddings[customer_id]['visit_count']
-                
+            visit_count = self.customer_store.record_visit(customer_id)
+            if visit_count:
                 # Determinar segmento baseado no número de visitas
                 if visit_count >= 10:
                     segment = 'vip'
@@ -510,29 +627,75 @@ class FaceRecognitionManager:
         return {
             **self.recognition_stats,
             'employees_loaded': len(self.employee_embeddings),
-            'customers_cached': len(self.customer_embeddings),
+            'customers_cached': len(self.customer_store),
+            'customer_store': self.customer_store.get_stats(),
+            'customer_index': self.customer_gallery.kind,
             'encoder_method': self.encoder.method,
+            'encoder_batches': self.encoder.get_batch_stats(),
             'similarity_threshold': self.similarity_threshold
         }
     
-    async def cleanup_old_customers(self, days: int = 30):
-        """Limpar clientes antigos do cache"""
+    async def cleanup_old_customers(self, days: Optional[int] = None):
+        """Limpar clientes antigos do cache (padrão: FACE_CUSTOMER_TTL_DAYS)"""
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
+            max_age = timedelta(days=days) if days is not None else self.customer_ttl
             
-            to_remove = []
-            for customer_id, data in self.customer_embeddings.items():
-                if data.get('last_seen', datetime.min) < cutoff_date:
-                    to_remove.append(customer_id)
+            # TTL: o store é ordenado por last_seen, só o início da fila é visitado
+            to_remove = self.customer_store.expire(max_age.total_seconds())
             
             for customer_id in to_remove:
-                del self.customer_embeddings[customer_id]
+                self.customer_gallery.remove(customer_id)
+            await self.customer_store.flush_async()
             
             logger.info(f"✅ Removidos {len(to_remove)} clientes antigos do cache")
             
         except Exception as e:
             logger.error(f"Erro ao limpar clientes antigos: {e}")
     
+    def close(self):
+        """Persistir índice de clientes e encerrar o pool de encoding"""
+        self.save_customer_index()
+        self.encoder.close()
+    
+    def save_customer_index(self):
+        """Persistir store de clientes e índice ANN (warm start no próximo boot)"""
+        try:
+            self.customer_store.flush()
+            # Só o grafo HNSW é caro de reconstruir; brute/IVF são refeitos a partir do store
+            if self.customer_gallery.kind == 'hnsw':
+                self.customer_gallery.save(self.customer_index_path)
+            logger.info(f"💾 Clientes salvos ({len(self.customer_store)} embeddings)")
+            
+        except Exception as e:
+            logger.error(f"Erro ao salvar clientes: {e}")
+    
+    def load_customer_index(self):
+        """Warm start: reabrir o store e o índice (reconstruído a partir do store se divergir)"""
+        try:
+            loaded = self.customer_store.load()
+            if not loaded:
+                return
+            
+            if self.customer_gallery.kind == 'hnsw' and os.path.exists(self.customer_index_path):
+                self.customer_gallery.load(self.customer_index_path)
+            
+            in_sync = len(self.customer_gallery) == loaded and all(
+                customer_id in self.customer_gallery for customer_id in self.customer_store.records
+            )
+            if not in_sync:
+                self.customer_gallery = create_ann_index(
+                    settings.FACE_INDEX_TYPE,
+                    nprobe=settings.FACE_INDEX_NPROBE
+                )
+                for customer_id, encoding in self.customer_store.items():
+                    self.customer_gallery.add(customer_id, encoding)
+                logger.info("🔁 Índice de clientes reconstruído a partir do store")
+            
+            logger.info(f"✅ Clientes carregados ({loaded} embeddings, índice {self.customer_gallery.kind})")
+            
+        except Exception as e:
+            logger.error(f"Erro ao carregar clientes: {e}")
+    
     def set_similarity_threshold(self, threshold: float):
         """Ajustar threshold de similaridade"""
         if 0.1 <= threshold <= 1.0:
@@ -4,6 +4,7 @@ Sistema que NÃO armazena fotos, apenas embeddings matemáticos irreversíveis
 """
 
 import os
+import asyncio
 import hashlib
 import numpy as np
 from pathlib import Path
@@ -11,9 +12,11 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 import cv2
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 
+from core.ai.ann_index import create_ann_index
+
 try:
     from deepface import DeepFace
     import tensorflow as tf
@@ -25,6 +28,87 @@ except ImportError:
     logger.warning("DeepFace não instalado. Reconhecimento facial desabilitado.")
     DeepFace = None
 
+class DeepFaceEmbedder:
+    """
+    Embeddings DeepFace direto de arrays em memória
+    Modelo e detector carregados uma vez; várias faces viram um único predict.
+    """
+    
+    def __init__(self, model_name: str = 'Facenet512', detector_backend: str = 'mtcnn'):
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self.model = None
+        self.target_size: Optional[Tuple[int, int]] = None
+        self._functions = None  # deepface.commons.functions (None = usar DeepFace.represent)
+    
+    def warmup(self):
+        """Carregar modelo e detector (cache do processo)"""
+        if self.model is not None or DeepFace is None:
+            return
+        
+        self.model = DeepFace.build_model(self.model_name)
+        try:
+            from deepface.commons import functions
+            from deepface.detectors import FaceDetector
+            FaceDetector.build_model(self.detector_backend)
+            self.target_size = functions.find_target_size(model_name=self.model_name)
+            self._functions = functions
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"API interna do DeepFace indisponível, usando represent por face: {e}")
+        
+        logger.info(f"✅ DeepFace {self.model_name} + {self.detector_backend} carregados")
+    
+    def _represent_single(self, face_region: np.ndarray, enforce_detection: bool) -> Optional[np.ndarray]:
+        result = DeepFace.represent(
+            img_path=face_region,
+            model_name=self.model_name,
+            enforce_detection=enforce_detection,
+            detector_backend=self.detector_backend
+        )
+        return np.array(result[0]['embedding']) if result else None
+    
+    def represent_batch(self, face_regions: List[np.ndarray], enforce_detection: bool = True) -> List[Optional[np.ndarray]]:
+        """
+        Embeddings de várias faces BGR (alinhado com a entrada, None onde não há face)
+        """
+        self.warmup()
+        
+        if self._functions is None:
+            embeddings = []
+            for face_region in face_regions:
+                try:
+                    embeddings.append(self._represent_single(face_region, enforce_detection))
+                except Exception:
+                    embeddings.append(None)
+            return embeddings
+        
+        # Detecção/alinhamento por face, inferência do modelo em um único lote
+        aligned, owners = [], []
+        for i, face_region in enumerate(face_regions):
+            try:
+                faces = self._functions.extract_faces(
+                    img=face_region,
+                    target_size=self.target_size,
+                    detector_backend=self.detector_backend,
+                    grayscale=False,
+                    enforce_detection=enforce_detection,
+                    align=True
+                )
+            except ValueError:
+                continue  # Nenhuma face com enforce_detection=True
+            
+            if faces:
+                aligned.append(self._functions.normalize_input(img=faces[0][0], normalization='base'))
+                owners.append(i)
+        
+        embeddings: List[Optional[np.ndarray]] = [None] * len(face_regions)
+        if aligned:
+            vectors = self.model.predict(np.concatenate(aligned, axis=0), verbose=0)
+            for i, vector in zip(owners, vectors):
+                embeddings[i] = np.asarray(vector)
+        
+        return embeddings
+
 @dataclass
 class EmployeeRecord:
     """Registro do funcionário com apenas dados necessários"""
@@ -74,6 +158,7 @@ class PrivacyFirstFaceRegistry:
         # Registros na memória
         self.employee_embeddings: Dict[str, EmployeeRecord] = {}
         self.customer_embeddings: Dict[str, Dict] = {}  # Para clientes frequentes (opcional)
+        self.customer_index = create_ann_index(metric="cosine")  # Busca ANN sobre os vetores acima
         
         # Configurações
         self.models_available = ['Facenet512', 'ArcFace', 'VGG-Face']
@@ -83,6 +168,8 @@ class PrivacyFirstFaceRegistry:
         
         # Cache para otimização
         self._embedding_cache = {}
+        self.embedder = DeepFaceEmbedder(self.default_model)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deepface")  # TF em uma thread
         
         # Carregar dados existentes
         self._load_existing_data()
@@ -214,45 +301,7 @@ class PrivacyFirstFaceRegistry:
         try:
             # Extrair embedding da face atual
             current_embedding = await self._extract_embedding_from_region(face_region)
-            if current_embedding is None:
-                return IdentificationResult(type='unknown', confidence=0.0)
-            
-            # Verificar funcionários cadastrados
-            employee_match = self._match_employee(current_embedding)
-            if employee_match:
-                # Atualizar último acesso
-                employee_match['record'].last_seen = datetime.now()
-                
-                logger.debug(f"Funcionário identificado: {employee_match['record'].name}")
-                
-                return IdentificationResult(
-                    type='employee',
-                    confidence=employee_match['confidence'],
-                    person_id=employee_match['record'].employee_id,
-                    name=employee_match['record'].name,
-                    additional_info={'last_seen': employee_match['record'].last_seen}
-                )
-            
-            # Verificar clientes frequentes (se habilitado)
-            if self.customer_embeddings:
-                customer_match = self._match_customer(current_embedding)
-                if customer_match:
-                    # Incrementar contador de visitas
-                    customer_match['visits'] = customer_match.get('visits', 0) + 1
-                    
-                    return IdentificationResult(
-                        type='frequent_customer',
-                        confidence=customer_match['confidence'],
-                        person_id=customer_match['customer_id'],
-                        additional_info={'visits': customer_match['visits']}
-                    )
-            
-            # Cliente novo/desconhecido
-            return IdentificationResult(
-                type='new_customer',
-                confidence=1.0,
-                additional_info={'first_visit': datetime.now()}
-            )
+            return self._identify_embedding(current_embedding)
             
         except Exception as e:
             logger.error(f"Erro na identificação: {e}")
@@ -262,6 +311,63 @@ class PrivacyFirstFaceRegistry:
                 additional_info={'error': str(e)}
             )
     
+    async def identify_people(self, face_regions: List[np.ndarray]) -> List[IdentificationResult]:
+        """
+        Identifica todas as faces de um frame com um único lote de embeddings
+        """
+        if not self.is_available():
+            return [IdentificationResult(type='unknown', confidence=0.0) for _ in face_regions]
+        
+        try:
+            embeddings = await self._extract_embeddings(face_regions)
+            return [self._identify_embedding(embedding) for embedding in embeddings]
+            
+        except Exception as e:
+            logger.error(f"Erro na identificação em lote: {e}")
+            return [IdentificationResult(type='unknown', confidence=0.0) for _ in face_regions]
+    
+    def _identify_embedding(self, current_embedding: Optional[np.ndarray]) -> IdentificationResult:
+        """Classifica um embedding como funcionário, cliente frequente ou novo"""
+        if current_embedding is None:
+            return IdentificationResult(type='unknown', confidence=0.0)
+        
+        # Verificar funcionários cadastrados
+        employee_match = self._match_employee(current_embedding)
+        if employee_match:
+            # Atualizar último acesso
+            employee_match['record'].last_seen = datetime.now()
+            
+            logger.debug(f"Funcionário identificado: {employee_match['record'].name}")
+            
+            return IdentificationResult(
+                type='employee',
+                confidence=employee_match['confidence'],
+                person_id=employee_match['record'].employee_id,
+                name=employee_match['record'].name,
+                additional_info={'last_seen': employee_match['record'].last_seen}
+            )
+        
+        # Verificar clientes frequentes (se habilitado)
+        if self.customer_embeddings:
+            customer_match = self._match_customer(current_embedding)
+            if customer_match:
+                # Incrementar contador de visitas
+                customer_match['visits'] = customer_match.get('visits', 0) + 1
+                
+                return IdentificationResult(
+                    type='frequent_customer',
+                    confidence=customer_match['confidence'],
+                    person_id=customer_match['customer_id'],
+                    additional_info={'visits': customer_match['visits']}
+                )
+        
+        # Cliente novo/desconhecido
+        return IdentificationResult(
+            type='new_customer',
+            confidence=1.0,
+            additional_info={'first_visit': datetime.now()}
+        )
+    
     async def register_frequent_customer(self, face_region: np.ndarray, customer_id: str = None) -> bool:
         """
         Registra cliente frequente (opcional - precisa ser habilitado nas configurações)
@@ -274,6 +380,7 @@ class PrivacyFirstFaceRegistry:
                     key=lambda x: x[1].get('last_visit', datetime.min)
                 )
                 del self.customer_embeddings[oldest_customer[0]]
+                self.customer_index.remove(oldest_customer[0])
             
             embedding = await self._extract_embedding_from_region(face_region)
             if embedding is None:
@@ -288,6 +395,7 @@ class PrivacyFirstFaceRegistry:
                 'last_visit': datetime.now(),
                 'visit_count': 1
             }
+            self.customer_index.add(customer_id, embedding)
             
             logger.info(f"Cliente frequente registrado: {customer_id}")
             return True
@@ -371,50 +479,34 @@ class PrivacyFirstFaceRegistry:
         return best_match
     
     def _match_customer(self, embedding: np.ndarray) -> Optional[Dict]:
-        """Encontra cliente frequente correspondente"""
-        best_match = None
-        best_similarity = 0
-        
-        for customer_id, customer_data in self.customer_embeddings.items():
-            similarity = self._cosine_distance(embedding, customer_data['vector'])
-            if similarity > self.confidence_threshold and similarity > best_similarity:
-                best_match = {
-                    'customer_id': customer_id,
-                    'confidence': similarity,
-                    'visits': customer_data.get('visit_count', 1)
-                }
-                best_similarity = similarity
+        """Encontra cliente frequente correspondente (índice ANN, distância cosseno = 1 - similaridade)"""
+        customer_id, distance = self.customer_index.match(embedding, 1.0 - self.confidence_threshold)
+        if customer_id is None:
+            return None
         
-        return best_match
+        return {
+            'customer_id': customer_id,
+            'confidence': 1.0 - distance,
+            'visits': self.customer_embeddings[customer_id].get('visit_count', 1)
+        }
     
     async def _extract_embedding_from_region(self, face_region: np.ndarray) -> Optional[np.ndarray]:
-        """Extrai embedding de uma região de face"""
+        """Extrai embedding de uma região de face (array em memória, sem arquivo temporário)"""
+        embeddings = await self._extract_embeddings([face_region])
+        return embeddings[0]
+    
+    async def _extract_embeddings(self, face_regions: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """Extrai embeddings de várias regiões de face em lote"""
+        if not face_regions:
+            return []
+        
         try:
-            # Salvar temporariamente para o DeepFace
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
-                cv2.imwrite(tmp_file.name, face_region)
-                tmp_path = tmp_file.name
-            
-            try:
-                embedding_result = DeepFace.represent(
-                    img_path=tmp_path,
-                    model_name=self.default_model,
-                    enforce_detection=True,
-                    detector_backend='mtcnn'
-                )
-                
-                if embedding_result:
-                    return np.array(embedding_result[0]['embedding'])
-                
-            finally:
-                # Deletar arquivo temporário
-                os.unlink(tmp_path)
-            
-            return None
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self.embedder.represent_batch, face_regions)
             
         except Exception as e:
             logger.error(f"Erro ao extrair embedding: {e}")
-            return None
+            return [None] * len(face_regions)
     
     async def _save_employee_data(self, employee: EmployeeRecord):
         """Salva dados do funcionário (sem embedding para segurança)"""
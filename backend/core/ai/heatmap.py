@@ -0,0 +1,153 @@
+"""
+Heatmap Accumulator - Heatmap de movimento em grade reduzida
+- Splat de um kernel gaussiano pré-calculado por pessoa (sem array do tamanho do frame)
+- Decaimento exponencial preguiçoso: a escala global cresce com o tempo e a
+  grade só é multiplicada na leitura (ou ao renormalizar), não a cada frame
+- Blur aplicado apenas na leitura
+- Buckets por hora (contagem sem decaimento) para heatmaps horários
+"""
+
+import math
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+
+class HeatmapAccumulator:
+    """
+    Heatmap de uma câmera em células de cell_size x cell_size pixels
+    """
+    
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        cell_size: int = 8,
+        sigma: float = 1.5,
+        half_life: float = 300.0,
+        max_hour_buckets: int = 48
+    ):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.half_life = half_life  # Segundos para o calor cair pela metade
+        self.decay_rate = math.log(2) / half_life if half_life > 0 else 0.0
+        self.max_hour_buckets = max_hour_buckets
+        
+        self.rows = int(math.ceil(height / cell_size))
+        self.cols = int(math.ceil(width / cell_size))
+        self.grid = np.zeros((self.rows, self.cols), dtype=np.float64)
+        
+        # Kernel gaussiano (em células) calculado uma vez
+        self.sigma = sigma
+        radius = max(1, int(math.ceil(3 * sigma)))
+        axis = np.arange(-radius, radius + 1, dtype=np.float64)
+        kernel_1d = np.exp(-(axis ** 2) / (2 * sigma ** 2))
+        self.kernel = np.outer(kernel_1d, kernel_1d)
+        self.kernel /= self.kernel.max()
+        self.radius = radius
+        
+        # Decaimento preguiçoso: valor real = grid * exp(-rate * (t - reference_time))
+        self.reference_time: Optional[float] = None
+        self.last_time: Optional[float] = None
+        
+        # Contagens por hora ("YYYY-MM-DDTHH" -> grade de contagens)
+        self.hourly: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.points_added = 0
+    
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(y // self.cell_size), int(x // self.cell_size)
+    
+    def _hour_bucket(self, key: str) -> np.ndarray:
+        bucket = self.hourly.get(key)
+        if bucket is None:
+            bucket = np.zeros((self.rows, self.cols), dtype=np.float32)
+            self.hourly[key] = bucket
+            while len(self.hourly) > self.max_hour_buckets:
+                self.hourly.popitem(last=False)
+        return bucket
+    
+    def add_points(self, points: List[Tuple[float, float]], timestamp: datetime, weight: float = 1.0):
+        """Adicionar posições (pixels do frame) observadas em timestamp"""
+        t = timestamp.timestamp()
+        if self.reference_time is None:
+            self.reference_time = t
+        self.last_time = t if self.last_time is None else max(self.last_time, t)
+        
+        # Peso inflado pelo tempo decorrido desde a referência (decai na leitura)
+        exponent = self.decay_rate * (t - self.reference_time)
+        if exponent > 50:
+            self._renormalize(t)
+            exponent = 0.0
+        scaled_weight = weight * math.exp(exponent)
+        
+        bucket = self._hour_bucket(timestamp.strftime('%Y-%m-%dT%H'))
+        k = self.radius
+        
+        for x, y in points:
+            row, col = self._cell(x, y)
+            if not (0 <= row < self.rows and 0 <= col < self.cols):
+                continue
+            
+            bucket[row, col] += weight
+            
+            # Splat do kernel recortado nas bordas da grade
+            r0, r1 = max(0, row - k), min(self.rows, row + k + 1)
+            c0, c1 = max(0, col - k), min(self.cols, col + k + 1)
+            self.grid[r0:r1, c0:c1] += scaled_weight * self.kernel[
+                r0 - row + k:r1 - row + k,
+                c0 - col + k:c1 - col + k
+            ]
+            self.points_added += 1
+    
+    def _renormalize(self, t: float):
+        """Aplicar o decaimento acumulado à grade e mover a referência para t"""
+        self.grid *= math.exp(-self.decay_rate * (t - self.reference_time))
+        self.reference_time = t
+    
+    def values(self, now: Optional[datetime] = None) -> np.ndarray:
+        """Grade com decaimento aplicado até now (padrão: último ponto)"""
+        if self.reference_time is None:
+            return np.zeros_like(self.grid)
+        t = now.timestamp() if now is not None else self.last_time
+        return self.grid * math.exp(-self.decay_rate * (t - self.reference_time))
+    
+    def _render(self, grid: np.ndarray, blur: bool, full_resolution: bool) -> np.ndarray:
+        """Blur + normalização 0-255 (+ upsample para o tamanho do frame)"""
+        image = grid.astype(np.float32)
+        if blur:
+            image = cv2.GaussianBlur(image, (0, 0), self.sigma)
+        
+        peak = float(image.max())
+        image = (image / peak * 255).astype(np.uint8) if peak > 0 else np.zeros(image.shape, dtype=np.uint8)
+        
+        if full_resolution:
+            image = cv2.resize(image, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+        return image
+    
+    def render(self, now: Optional[datetime] = None, blur: bool = True, full_resolution: bool = True) -> np.ndarray:
+        """Heatmap atual normalizado (uint8)"""
+        return self._render(self.values(now), blur, full_resolution)
+    
+    def render_hour(self, hour: datetime, blur: bool = True, full_resolution: bool = True) -> Optional[np.ndarray]:
+        """Heatmap de uma hora específica (None se não houver dados)"""
+        bucket = self.hourly.get(hour.strftime('%Y-%m-%dT%H'))
+        if bucket is None:
+            return None
+        return self._render(bucket, blur, full_resolution)
+    
+    def reset(self):
+        self.grid[:] = 0
+        self.hourly.clear()
+        self.reference_time = self.last_time = None
+        self.points_added = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'grid': [self.rows, self.cols],
+            'cell_size': self.cell_size,
+            'half_life': self.half_life,
+            'points_added': self.points_added,
+            'hour_buckets': list(self.hourly.keys())
+        }
@@ -0,0 +1,172 @@
+"""
+Identity Cache - Identidade facial resolvida por track
+Evita extrair e comparar embeddings de todas as pessoas em todos os frames:
+a identidade é resolvida uma vez por track e só é re-verificada após um
+intervalo (menor quando o match foi pouco confiável) ou quando aparece uma
+face de qualidade melhor.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from loguru import logger
+
+@dataclass
+class TrackIdentity:
+    """Identidade cacheada de um track"""
+    person_type: Any  # PersonType
+    identity_id: Optional[str]
+    confidence: float  # 0-1 (1 = distância zero até a galeria)
+    quality: float  # Qualidade da face usada na última verificação
+    verified_at: float  # time.monotonic() da última verificação com face
+    last_attempt: float  # time.monotonic() da última tentativa (com ou sem face)
+    last_seen: float
+    verifications: int = 1
+
+class TrackIdentityCache:
+    """
+    Cache de identidade por track (chave "camera:track_id")
+    """
+    
+    def __init__(
+        self,
+        reverify_interval: float = 10.0,
+        retry_interval: float = 1.0,
+        quality_gain: float = 0.2,
+        low_confidence: float = 0.3,
+        ttl: float = 600.0,
+        max_size: int = 5000
+    ):
+        self.reverify_interval = reverify_interval  # Segundos até re-verificar uma identidade confiável
+        self.retry_interval = retry_interval  # Segundos entre tentativas quando não há face utilizável
+        self.quality_gain = quality_gain  # Melhora relativa de qualidade que força re-verificação
+        self.low_confidence = low_confidence  # Abaixo disso o intervalo de re-verificação cai para 1/3
+        self.ttl = ttl
+        self.max_size = max_size
+        
+        self.entries: "OrderedDict[str, TrackIdentity]" = OrderedDict()
+        
+        # Estatísticas
+        self.stats = {
+            'cache_hits': 0,
+            'verifications': 0,
+            'failed_attempts': 0
+        }
+    
+    def get(self, key: str, now: Optional[float] = None) -> Optional[TrackIdentity]:
+        """Obter identidade do track (atualiza last_seen)"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry.last_seen = time.monotonic() if now is None else now
+            self.entries.move_to_end(key)
+        return entry
+    
+    def needs_verification(self, entry: Optional[TrackIdentity], quality: float, now: Optional[float] = None) -> bool:
+        """Decidir se o track precisa de um novo encoding"""
+        now = time.monotonic() if now is None else now
+        
+        if entry is None:
+            return True
+        
+        # Sem identidade ainda: tentar de novo só após retry_interval
+        if entry.identity_id is None:
+            return now - entry.last_attempt >= self.retry_interval
+        
+        # Face bem melhor que a usada na última verificação
+        if quality > entry.quality * (1 + self.quality_gain) and now - entry.last_attempt >= self.retry_interval:
+            return True
+        
+        interval = self.reverify_interval
+        if entry.confidence < self.low_confidence:
+            interval /= 3
+        
+        return now - entry.verified_at >= interval
+    
+    def store(
+        self,
+        key: str,
+        person_type: Any,
+        identity_id: Optional[str],
+        confidence: float,
+        quality: float,
+        now: Optional[float] = None
+    ) -> TrackIdentity:
+        """Registrar resultado de uma verificação com face"""
+        now = time.monotonic() if now is None else now
+        entry = self.entries.get(key)
+        
+        if entry is None:
+            entry = TrackIdentity(
+                person_type=person_type,
+                identity_id=identity_id,
+                confidence=confidence,
+                quality=quality,
+                verified_at=now,
+                last_attempt=now,
+                last_seen=now
+            )
+            self.entries[key] = entry
+        else:
+            entry.person_type = person_type
+            entry.identity_id = identity_id
+            entry.confidence = confidence
+            entry.quality = max(quality, entry.quality) if identity_id == entry.identity_id else quality
+            entry.verified_at = entry.last_attempt = entry.last_seen = now
+            entry.verifications += 1
+            self.entries.move_to_end(key)
+        
+        self.stats['verifications'] += 1
+        return entry
+    
+    def mark_attempt(self, key: str, person_type: Any, now: Optional[float] = None) -> TrackIdentity:
+        """Registrar tentativa sem face utilizável (mantém identidade anterior, se houver)"""
+        now = time.monotonic() if now is None else now
+        entry = self.entries.get(key)
+        
+        if entry is None:
+            entry = TrackIdentity(
+                person_type=person_type,
+                identity_id=None,
+                confidence=0.0,
+                quality=0.0,
+                verified_at=now,
+                last_attempt=now,
+                last_seen=now,
+                verifications=0
+            )
+            self.entries[key] = entry
+        else:
+            entry.last_attempt = entry.last_seen = now
+            self.entries.move_to_end(key)
+        
+        self.stats['failed_attempts'] += 1
+        return entry
+    
+    def record_hit(self):
+        self.stats['cache_hits'] += 1
+    
+    def prune(self, now: Optional[float] = None) -> int:
+        """Remover tracks não vistos há ttl segundos e limitar o tamanho"""
+        now = time.monotonic() if now is None else now
+        removed = 0
+        
+        while self.entries:
+            oldest_key = next(iter(self.entries))
+            if now - self.entries[oldest_key].last_seen < self.ttl and len(self.entries) <= self.max_size:
+                break
+            self.entries.popitem(last=False)
+            removed += 1
+        
+        if removed:
+            logger.debug(f"Cache de identidade: {removed} tracks removidos")
+        return removed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas do cache"""
+        lookups = self.stats['cache_hits'] + self.stats['verifications'] + self.stats['failed_attempts']
+        return {
+            **self.stats,
+            'tracks_cached': len(self.entries),
+            'hit_rate': round(self.stats['cache_hits'] / lookups, 3) if lookups else 0.0
+        }
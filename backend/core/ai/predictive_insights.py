@@ -21,6 +21,7 @@ warnings.filterwarnings('ignore')
 
 from ..config import get_settings
 from ..database import DatabaseManager
+from ..event_writer import EventWriter
 
 settings = get_settings()
 
@@ -68,6 +69,7 @@ class PredictiveEngine:
     
     def __init__(self):
         self.db = None
+        self.writer: Optional[EventWriter] = None  # Gravações em lote (write-behind)
         
         # Modelos de ML
         self.flow_model = RandomForestRegressor(n_estimators=100, random_state=42)
@@ -114,14 +116,20 @@ class PredictiveEngine:
         
         logger.info("🔮 Predictive Engine inicializado")
     
-    async def initialize(self):
+    async def initialize(self, db: Optional[DatabaseManager] = None, writer: Optional[EventWriter] = None):
         """Inicializar o motor preditivo"""
         try:
-            # Initialize database connection
-            from ..config import get_settings
-            settings = get_settings()
-            self.db = DatabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-            await self.db.initialize()
+            # Initialize database connection (cliente compartilhado quando fornecido)
+            if db is None:
+                from ..config import get_settings
+                settings = get_settings()
+                db = DatabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+                await db.initialize()
+            self.db = db
+            if writer is None:
+                writer = EventWriter(db)
+                await writer.start()
+            self.writer = writer
             await self.load_historical_data()
             await self.train_models()
             
@@ -440,7 +448,7 @@ class PredictiveEngine:
             self._cleanup_prediction_cache()
             
             # Salvar predições no banco
-            await self._save_predictions(predictions, timestamp)
+            self._save_predictions(predictions, timestamp)
             
             return predictions
             
@@ -667,28 +675,22 @@ class PredictiveEngine:
         except Exception as e:
             logger.error(f"Erro ao limpar cache: {e}")
     
-    async def _save_predictions(self, predictions: Dict, timestamp: datetime):
-        """Salvar predições no banco de dados"""
+    def _save_predictions(self, predictions: Dict, timestamp: datetime):
+        """Salvar predições no banco de dados (uma linha por tipo, gravadas em lote pelo writer)"""
         try:
             for pred_type, value in predictions.items():
                 if pred_type.endswith('_confidence'):
                     continue  # Não salvar scores de confiança separadamente
                 
-                query = """
-                INSERT INTO predictions (timestamp, prediction_type, prediction_value, confidence_score)
-                VALUES ($1, $2, $3, $4)
-                """
-                
                 confidence_key = f"{pred_type}_confidence"
                 confidence = predictions.get(confidence_key, 0.5)
                 
-                await self.db.execute(
-                    query,
-                    timestamp,
-                    pred_type,
-                    json.dumps({pred_type: value}),
-                    confidence
-                )
+                self.writer.enqueue("predictions", {
+                    'timestamp': timestamp.isoformat(),
+                    'prediction_type': pred_type,
+                    'prediction_value': {pred_type: value},
+                    'confidence_score': confidence
+                })
                 
         except Exception as e:
             logger.error(f"Erro ao salvar predições: {e}")
@@ -4,14 +4,12 @@ Integra todas as funcionalidades de IA avançada
 """
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, TYPE_CHECKING
 import numpy as np
-import cv2
 from datetime import datetime, timedelta
-import asyncio
-import json
+import time
 from loguru import logger
-import hashlib
+from collections import OrderedDict
 from enum import Enum
 
 # Importar módulos de IA
@@ -20,6 +18,12 @@ from .behavior_analyzer import BehaviorAnalyzer
 from .customer_segmentation import CustomerSegmentation
 from .predictive_insights import PredictiveEngine
 from .privacy_config import PrivacyManager
+from .identity_cache import TrackIdentityCache
+from .face_quality import FaceCropper
+from ..config import get_settings
+
+if TYPE_CHECKING:
+    from ..pipeline_state import CameraPipelineState
 
 class PersonType(Enum):
     CUSTOMER = "customer"
@@ -72,34 +76,74 @@ class SmartAnalyticsEngine:
         self.segmentation = None
         self.predictive = None
         self.privacy = None
+        self.db = None  # Cliente compartilhado do banco (definido em initialize)
         
         # Cache e estado
-        self.person_registry = {}  # ID -> PersonData
+        self.person_registry = OrderedDict()  # "camera:track_id" -> PersonData (ordenado por last_seen)
+        self.registry_max_size = 5000
+        self.registry_ttl = timedelta(minutes=10)
+        
+        # Identidade facial por track (evita re-encoding a cada frame)
+        settings = get_settings()
+        self.identity_cache = TrackIdentityCache(
+            reverify_interval=settings.FACE_REVERIFY_INTERVAL,
+            retry_interval=settings.FACE_RETRY_INTERVAL,
+            quality_gain=settings.FACE_QUALITY_GAIN,
+            ttl=self.registry_ttl.total_seconds(),
+            max_size=self.registry_max_size
+        )
+        
+        # Pré-estágio do encoder: crop da cabeça + filtro de tamanho/nitidez/brilho
+        self.face_cropper = FaceCropper(
+            max_size=settings.FACE_CROP_SIZE,
+            min_size=settings.FACE_MIN_SIZE,
+            min_sharpness=settings.FACE_MIN_SHARPNESS,
+            min_brightness=settings.FACE_MIN_BRIGHTNESS
+        )
         self.employee_faces = {}  # employee_id -> face_encoding
         self.last_metrics = None
         
         logger.info("🧠 Smart Analytics Engine inicializado")
     
-    async def initialize(self):
-        """Inicializar todos os módulos de IA"""
+    async def initialize(self, db=None, writer=None):
+        """
+        Inicializar todos os módulos de IA
+        
+        Args:
+            db: Cliente do banco compartilhado (padrão: o de core.app_state)
+            writer: EventWriter compartilhado para as gravações em lote dos módulos
+                (padrão: o de core.app_state)
+        """
         try:
+            # Um único cliente do banco para o engine e todos os módulos
+            if db is None:
+                from core.app_state import get_database
+                db = await get_database()
+            self.db = db
+            
+            # Um único writer: behavior_analytics, predictions e customer_segments
+            # saem em requisições multi-linha junto com os eventos de câmera
+            if writer is None:
+                from core.app_state import get_event_writer
+                writer = await get_event_writer()
+            
             # Face Recognition
             if self.enable_face_recognition:
                 self.face_manager = FaceRecognitionManager()
-                await self.face_manager.initialize()
+                await self.face_manager.initialize(db=db)
                 await self.face_manager.load_employee_faces()
             
             # Behavior Analysis
             self.behavior_analyzer = BehaviorAnalyzer()
-            await self.behavior_analyzer.initialize()
+            await self.behavior_analyzer.initialize(db=db, writer=writer)
             
             # Customer Segmentation
             self.segmentation = CustomerSegmentation()
-            await self.segmentation.initialize()
+            await self.segmentation.initialize(db=db, writer=writer)
             
             # Predictive Insights
             self.predictive = PredictiveEngine()
-            await self.predictive.initialize()
+            await self.predictive.initialize(db=db, writer=writer)
             
             # Privacy Manager
             self.privacy = PrivacyManager()
@@ -114,7 +158,8 @@ class SmartAnalyticsEngine:
         self,
         frame: np.ndarray,
         detections: List[Dict],
-        timestamp: datetime
+        timestamp: datetime,
+        pipeline: Optional["CameraPipelineState"] = None
     ) -> SmartMetrics:
         """
         Processar frame com todas as análises de IA
@@ -123,20 +168,29 @@ class SmartAnalyticsEngine:
             frame: Frame de vídeo
             detections: Lista de detecções do YOLO
             timestamp: Timestamp do frame
+            pipeline: Estado da câmera (tracks, heatmap e zonas próprios)
             
         Returns:
             SmartMetrics com todas as análises
         """
+        behavior_analyzer = self.behavior_analyzer
+        if pipeline is not None and pipeline.behavior_analyzer is not None:
+            behavior_analyzer = pipeline.behavior_analyzer
+        camera_id = pipeline.camera_id if pipeline is not None else None
+        
+        # IDs estáveis do PersonTracker (sem tracker, cai no índice do frame)
+        for i, detection in enumerate(detections):
+            detection['id'] = detection.get('track_id', detection.get('id', i))
         
         # 1. Identificar pessoas (funcionários vs clientes)
-        person_types = await self._identify_people(frame, detections)
+        person_types = await self._identify_people(frame, detections, camera_id)
         
         # 2. Analisar comportamento
-        behavior_data = await self.behavior_analyzer.analyze(
+        behavior_data = await behavior_analyzer.analyze(
             detections, person_types, timestamp
         )
         
-        # 3. Segmentar clientes
+        # 3. Segmentar clientes (registro completo; a visita de cada track é contada uma vez)
         segments = await self.segmentation.segment_customers(
             self.person_registry, behavior_data
         )
@@ -177,13 +231,18 @@ class SmartAnalyticsEngine:
         )
         
         self.last_metrics = metrics
+        self._prune_person_registry()
+        self.identity_cache.prune()
+        if pipeline is not None:
+            pipeline.last_metrics = metrics
         return metrics
     
     async def _identify_people(
         self,
         frame: np.ndarray,
-        detections: List[Dict]
-    ) -> Dict[int, PersonType]:
+        detections: List[Dict],
+        camera_id: Optional[str] = None
+    ) -> Dict[str, PersonType]:
         """
         Identificar se cada pessoa é funcionário ou cliente
         """
@@ -193,27 +252,61 @@ class SmartAnalyticsEngine:
             # Sem face recognition, todos são clientes
             return {d['id']: PersonType.CUSTOMER for d in detections}
         
+        now = time.monotonic()
+        pending = []  # Tracks que precisam de encoding neste frame
+        
         for detection in detections:
-            bbox = detection['bbox']
             person_id = detection['id']
+            registry_key = f"{camera_id}:{person_id}" if camera_id else str(person_id)
+            
+            # Crop reduzido da cabeça (barato) define a qualidade da face neste frame
+            face = self.face_cropper.crop(frame, detection['bbox'])
+            
+            # Identidade já resolvida para este track
+            cached = self.identity_cache.get(registry_key, now)
+            if not self.identity_cache.needs_verification(cached, face.quality, now):
+                self.identity_cache.record_hit()
+                person_types[person_id] = cached.person_type
+                continue
+            
+            # Face pequena, borrada ou escura: pula o encoding, mas segue cliente
+            if not face.usable:
+                entry = self.identity_cache.mark_attempt(registry_key, PersonType.CUSTOMER, now)
+                person_types[person_id] = entry.person_type
+                continue
+            
+            pending.append((person_id, registry_key, face.quality, cached, face.image))
+        
+        if not pending:
+            return person_types
+        
+        # Um único lote de encodings para todas as faces do frame
+        encodings = await self.face_manager.encode_many([item[4] for item in pending])
+        
+        for (person_id, registry_key, quality, cached, _), encoding in zip(pending, encodings):
+            if encoding is None:
+                # Sem encoding não há match de funcionário: cliente, como antes do cache
+                entry = self.identity_cache.mark_attempt(registry_key, PersonType.CUSTOMER, now)
+                person_types[person_id] = entry.person_type
+                continue
             
-            # Extrair face da detecção
-            face_img = self._extract_face(frame, bbox)
+            # Verificar se é funcionário
+            is_employee, employee_id, distance = await self.face_manager.match_employee(encoding)
             
-            if face_img is not None:
-                # Verificar se é funcionário
-                is_employee, employee_id = await self.face_manager.is_employee(face_img)
-                
-                if is_employee:
-                    person_types[person_id] = PersonType.EMPLOYEE
-                    self._update_person_registry(person_id, 'employee', employee_id)
-                else:
-                    # Tentar re-identificar cliente conhecido
-                    customer_id = await self.face_manager.identify_customer(face_img)
-                    person_types[person_id] = PersonType.CUSTOMER
-                    self._update_person_registry(person_id, 'customer', customer_id)
+            if is_employee:
+                person_type, identity_id, kind = PersonType.EMPLOYEE, employee_id, 'employee'
             else:
-                person_types[person_id] = PersonType.UNKNOWN
+                # Tentar re-identificar cliente conhecido (visita contada só na 1ª identificação do track)
+                count_visit = cached is None or cached.identity_id is None
+                identity_id, distance = await self.face_manager.match_customer(encoding, count_visit=count_visit)
+                person_type, kind = PersonType.CUSTOMER, 'customer'
+            
+            self.identity_cache.store(
+                registry_key, person_type, identity_id,
+                self.face_manager.match_confidence(distance), quality, now
+            )
+            person_types[person_id] = person_type
+            self._update_person_registry(registry_key, kind, identity_id)
         
         return person_types
     
@@ -249,59 +342,49 @@ class SmartAnalyticsEngine:
         
         return success
     
-    def _extract_face(self, frame: np.ndarray, bbox: List[int]) -> Optional[np.ndarray]:
-        """
-        Extrair região da face de uma bounding box
-        """
-        try:
-            x1, y1, x2, y2 = bbox
-            
-            # Expandir bbox para pegar mais contexto da face
-            height, width = frame.shape[:2]
-            padding = 20
-            
-            x1 = max(0, x1 - padding)
-            y1 = max(0, y1 - padding)
-            x2 = min(width, x2 + padding)
-            y2 = min(height, y2 + padding)
-            
-            face_img = frame[y1:y2, x1:x2]
-            
-            if face_img.size == 0:
-                return None
-            
-            # Aplicar blur para privacidade se necessário
-            if self.privacy and self.privacy.should_blur_face():
-                face_img = cv2.GaussianBlur(face_img, (99, 99), 30)
-            
-            return face_img
-            
-        except Exception as e:
-            logger.error(f"Erro ao extrair face: {e}")
-            return None
-    
     def _update_person_registry(
         self,
-        person_id: int,
+        person_key: str,
         person_type: str,
         identity_id: Optional[str]
     ):
         """
-        Atualizar registro de pessoas
+        Atualizar registro de pessoas (uma entrada por track, uma visita por track)
         """
-        if person_id not in self.person_registry:
-            self.person_registry[person_id] = {
-                'first_seen': datetime.now(),
-                'last_seen': datetime.now(),
+        now = datetime.now()
+        entry = self.person_registry.get(person_key)
+        
+        if entry is None:
+            entry = {
+                'first_seen': now,
+                'last_seen': now,
                 'type': person_type,
                 'identity_id': identity_id,
                 'visit_count': 1,
                 'total_time': 0,
                 'behavior_profile': {}
             }
-        else:
-            self.person_registry[person_id]['last_seen'] = datetime.now()
-            self.person_registry[person_id]['visit_count'] += 1
+            self.person_registry[person_key] = entry
+            return
+        
+        entry['last_seen'] = now
+        entry['total_time'] = (now - entry['first_seen']).total_seconds()
+        self.person_registry.move_to_end(person_key)
+        
+        # Identidade resolvida/alterada (a segmentação conta a visita do novo cliente)
+        if person_type != entry['type'] or (identity_id and identity_id != entry['identity_id']):
+            entry['type'] = person_type
+            entry['identity_id'] = identity_id or entry['identity_id']
+    
+    def _prune_person_registry(self):
+        """Remover tracks não vistos há registry_ttl e limitar o tamanho do registro"""
+        cutoff = datetime.now() - self.registry_ttl
+        
+        while self.person_registry:
+            oldest_key = next(iter(self.person_registry))
+            if self.person_registry[oldest_key]['last_seen'] >= cutoff and len(self.person_registry) <= self.registry_max_size:
+                break
+            self.person_registry.popitem(last=False)
     
     async def _detect_anomalies(self, behavior_data: Dict) -> List[str]:
         """
@@ -376,33 +459,32 @@ class SmartAnalyticsEngine:
         Obter dados históricos reais do banco de dados
         """
         try:
-            from core.database import SupabaseManager
-            from core.config import settings
             from datetime import datetime, timedelta
-
-            # Usar gerenciador do banco se disponível globalmente
-            supabase = SupabaseManager(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-            await supabase.initialize()
-
+            
+            # Cliente compartilhado (sem abrir conexão a cada frame)
+            supabase = self.db
+            if supabase is None or supabase.client is None:
+                raise RuntimeError("banco indisponível")
+            
             # Buscar dados da última hora
             last_hour = datetime.now() - timedelta(hours=1)
             current_stats = await supabase.get_current_stats()
             camera_stats = await supabase.get_camera_stats(hours=1)
             conversion_data = await supabase.get_conversion_rate()
-
+            
             # Calcular métricas reais
             last_hour_visitors = camera_stats.get('total_people', 0)
             last_hour_sales = conversion_data.get('sales_count', 0)
             avg_daily_visitors = camera_stats.get('total_people', 0) * 24  # Estimativa
             avg_conversion_rate = conversion_data.get('conversion_rate', 0) / 100
-
+            
             return {
                 'last_hour_visitors': last_hour_visitors,
                 'last_hour_sales': last_hour_sales,
                 'avg_daily_visitors': avg_daily_visitors,
                 'avg_conversion_rate': avg_conversion_rate
             }
-
+        
         except Exception as e:
             logger.error(f"Erro ao buscar dados históricos: {e}")
             # Fallback para dados vazios em caso de erro
@@ -423,6 +505,8 @@ class SmartAnalyticsEngine:
         return {
             'metrics': self.last_metrics.__dict__,
             'registry_size': len(self.person_registry),
+            'identity_cache': self.identity_cache.get_stats(),
+            'face_crops': self.face_cropper.get_stats(),
             'employees_detected': len([
                 p for p in self.person_registry.values()
                 if p['type'] == 'employee'
@@ -73,6 +73,7 @@ class TemporalPurchaseAnalyzer:
     def __init__(self):
         self.journeys: Dict[str, CustomerJourney] = {}
         self.store_zones = self._initialize_store_zones()
+        self.zone_ids, self.zone_bounds = self._build_zone_bounds()
         
         # Indicadores de compra com pesos
         self.purchase_indicators = {
@@ -104,17 +105,41 @@ class TemporalPurchaseAnalyzer:
             'bathroom': StoreZone('Banheiro', ZoneType.BATHROOM, {'x1': 5, 'y1': 5, 'x2': 15, 'y2': 15}, -0.1),
         }
     
+    def configure_zones(self, zones: Dict[str, StoreZone]):
+        """Substituir as zonas da loja e recompilar os limites"""
+        self.store_zones = zones
+        self.zone_ids, self.zone_bounds = self._build_zone_bounds()
+        logger.info(f"Zonas de compra configuradas: {len(zones)}")
+    
+    def _build_zone_bounds(self) -> Tuple[List[str], np.ndarray]:
+        """Retângulos (percentual) em um array (Z x 4: x1, y1, x2, y2) na ordem das zonas"""
+        zone_ids = list(self.store_zones.keys())
+        bounds = np.array(
+            [[zone.coordinates[key] for key in ('x1', 'y1', 'x2', 'y2')] for zone in self.store_zones.values()],
+            dtype=np.float64
+        ).reshape(-1, 4)
+        return zone_ids, bounds
+    
     def get_zone(self, position: Tuple[float, float]) -> str:
         """Identifica zona baseada na posição (x, y em percentual)"""
-        x, y = position
-        
-        for zone_id, zone in self.store_zones.items():
-            coords = zone.coordinates
-            if (coords['x1'] <= x <= coords['x2'] and 
-                coords['y1'] <= y <= coords['y2']):
-                return zone_id
-        
-        return 'other'
+        return self.get_zones([position])[0]
+    
+    def get_zones(self, positions: List[Tuple[float, float]]) -> List[str]:
+        """Zonas de várias posições com comparações vetorizadas (primeira zona definida vence)"""
+        if not positions:
+            return []
+        if not self.zone_ids:
+            return ['other'] * len(positions)
+        
+        points = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        x, y = points[:, :1], points[:, 1:]
+        b = self.zone_bounds
+        # Mesmo teste do laço original: x1 <= x <= x2 e y1 <= y <= y2 (P x Z)
+        inside = (b[:, 0] <= x) & (x <= b[:, 2]) & (b[:, 1] <= y) & (y <= b[:, 3])
+        
+        first = np.argmax(inside, axis=1)
+        found = inside.any(axis=1)
+        return [self.zone_ids[zone] if hit else 'other' for zone, hit in zip(first, found)]
     
     async def start_journey(self, person_id: str, entry_position: Tuple[float, float]) -> CustomerJourney:
         """Inicia nova jornada de cliente"""
@@ -2,17 +2,122 @@
 Estado global da aplicação para compartilhar instâncias entre módulos
 """
 
-from typing import Optional
-from core.ai.smart_analytics_engine import SmartAnalyticsEngine
+from typing import TYPE_CHECKING, Optional
+from core.config import settings
+from core.database import SupabaseManager
+from core.event_writer import EventWriter
+from core.pipeline_state import CameraPipelineRegistry
+from core.tracker import DetectionCadence, PersonTracker, create_tracker
+
+if TYPE_CHECKING:
+    from core.ai.smart_analytics_engine import SmartAnalyticsEngine
 
 # Estado global da aplicação
-smart_engine: Optional[SmartAnalyticsEngine] = None
+smart_engine: Optional["SmartAnalyticsEngine"] = None
+database: Optional[SupabaseManager] = None  # Cliente único do banco (pool keep-alive compartilhado)
+event_writer: Optional[EventWriter] = None  # Write-behind de eventos sobre o cliente acima
+
+def create_database() -> SupabaseManager:
+    """Cliente do Supabase com o pool configurado"""
+    return SupabaseManager(
+        settings.SUPABASE_URL,
+        settings.SUPABASE_SERVICE_KEY,
+        max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_POOL_KEEPALIVE,
+        keepalive_expiry=settings.SUPABASE_POOL_KEEPALIVE_EXPIRY,
+        timeout=settings.SUPABASE_TIMEOUT,
+        max_concurrency=settings.SUPABASE_MAX_CONCURRENCY,
+        http2=settings.SUPABASE_HTTP2,
+        stats_cache_ttl=settings.SUPABASE_STATS_CACHE_TTL
+    )
+
+def create_event_writer(db: SupabaseManager) -> EventWriter:
+    """Event writer com os limites configurados"""
+    return EventWriter(
+        db,
+        batch_size=settings.EVENT_WRITER_BATCH_SIZE,
+        flush_interval_ms=settings.EVENT_WRITER_FLUSH_MS,
+        max_queue=settings.EVENT_WRITER_MAX_QUEUE,
+        max_retries=settings.EVENT_WRITER_MAX_RETRIES,
+        spill_path=settings.EVENT_WRITER_SPILL_PATH,
+        dead_letter_dir=settings.EVENT_WRITER_DEAD_LETTER_DIR
+    )
+
+def _create_camera_tracker() -> PersonTracker:
+    """Tracker de uma câmera com o engine configurado"""
+    return create_tracker(
+        settings.TRACKER_ENGINE,
+        max_disappeared=settings.TRACKING_MAX_DISAPPEARED,
+        max_distance=settings.TRACKING_MAX_DISTANCE,
+        high_threshold=settings.TRACKER_HIGH_THRESHOLD,
+        low_threshold=settings.TRACKER_LOW_THRESHOLD,
+        match_iou=settings.TRACKER_MATCH_IOU,
+        track_buffer=settings.TRACKER_TRACK_BUFFER,
+        max_predicted_frames=settings.TRACKER_MAX_PREDICTED_FRAMES
+    )
+
+def _create_detection_cadence(camera_id: str) -> DetectionCadence:
+    """Cadência de detecção de uma câmera (detectar a cada N frames)"""
+    return DetectionCadence(
+        interval=settings.DETECTION_INTERVAL_PER_CAMERA.get(camera_id, settings.DETECTION_INTERVAL),
+        crowded_tracks=settings.DETECTION_CROWDED_TRACKS
+    )
+
+# Estado de pipeline por câmera (compartilhado entre bridge e /api/camera)
+pipelines = CameraPipelineRegistry(
+    tracker_factory=_create_camera_tracker,
+    cadence_factory=_create_detection_cadence,
+    motion_gate_enabled=settings.MOTION_GATE_ENABLED,
+    motion_gate_kwargs={
+        'motion_threshold': settings.MOTION_GATE_THRESHOLD,
+        'force_interval': settings.MOTION_GATE_FORCE_INTERVAL
+    },
+    idle_timeout=settings.PIPELINE_IDLE_TIMEOUT
+)
 
-def set_smart_engine(engine: SmartAnalyticsEngine):
+def set_smart_engine(engine: "SmartAnalyticsEngine"):
     """Definir a instância global do Smart Analytics Engine"""
     global smart_engine
     smart_engine = engine
+    if engine.behavior_analyzer is not None:
+        pipelines.set_behavior_template(engine.behavior_analyzer)
 
-def get_smart_engine() -> Optional[SmartAnalyticsEngine]:
+def get_smart_engine() -> Optional["SmartAnalyticsEngine"]:
     """Obter a instância global do Smart Analytics Engine"""
-    return smart_engine
\ No newline at end of file
+    return smart_engine
+
+def get_pipelines() -> CameraPipelineRegistry:
+    """Obter o registro de estado de pipeline por câmera"""
+    return pipelines
+
+def set_database(db: SupabaseManager):
+    """Definir o cliente global do banco (criado no lifespan)"""
+    global database
+    database = db
+
+async def get_database() -> SupabaseManager:
+    """
+    Cliente global do banco (também usado como dependência FastAPI)
+    Criado sob demanda quando o lifespan não rodou (scripts, testes)
+    """
+    global database
+    if database is None:
+        database = create_database()
+        await database.initialize()
+    return database
+
+def set_event_writer(writer: EventWriter):
+    """Definir o event writer global (criado no lifespan)"""
+    global event_writer
+    event_writer = writer
+
+async def get_event_writer() -> EventWriter:
+    """
+    Event writer global (também usado como dependência FastAPI)
+    Criado e iniciado sob demanda quando o lifespan não rodou
+    """
+    global event_writer
+    if event_writer is None:
+        event_writer = create_event_writer(await get_database())
+        await event_writer.start()
+    return event_writer
@@ -3,7 +3,7 @@ Configurações do backend
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 
 class Settings(BaseSettings):
@@ -11,6 +11,21 @@ class Settings(BaseSettings):
     SUPABASE_URL: str = "https://orzzycayjzgcuvcsrxsi.supabase.co"
     SUPABASE_ANON_KEY: str = ""
     SUPABASE_SERVICE_KEY: str = ""
+    SUPABASE_POOL_MAX_CONNECTIONS: int = 20  # Conexões HTTP simultâneas do cliente compartilhado
+    SUPABASE_POOL_KEEPALIVE: int = 10  # Conexões mantidas abertas entre requisições
+    SUPABASE_POOL_KEEPALIVE_EXPIRY: float = 30.0  # Segundos até fechar uma conexão ociosa
+    SUPABASE_TIMEOUT: float = 10.0  # Timeout das requisições ao PostgREST (s)
+    SUPABASE_MAX_CONCURRENCY: int = 10  # Queries simultâneas (o excedente aguarda sem bloquear o event loop)
+    SUPABASE_HTTP2: bool = True  # HTTP/2 quando o pacote h2 estiver instalado
+    SUPABASE_STATS_CACHE_TTL: float = 5.0  # Segundos em cache de get_camera_stats (0 = sem cache)
+    
+    # Event writer (write-behind de camera_events/people_events)
+    EVENT_WRITER_BATCH_SIZE: int = 200  # Linhas por insert multi-linha (e gatilho de flush antecipado)
+    EVENT_WRITER_FLUSH_MS: float = 500.0  # Intervalo máximo entre flushes
+    EVENT_WRITER_MAX_QUEUE: int = 20000  # Linhas em memória; o excedente vai para o spill
+    EVENT_WRITER_MAX_RETRIES: int = 3
+    EVENT_WRITER_SPILL_PATH: str = "logs/event_spill.jsonl"  # Linhas não gravadas (reenviadas quando o banco volta)
+    EVENT_WRITER_DEAD_LETTER_DIR: str = "logs/event_dead_letter"  # Lotes rejeitados pelo banco, um JSONL por tabela (sem replay)
     
     # API
     API_HOST: str = "0.0.0.0"
@@ -26,12 +41,52 @@ class Settings(BaseSettings):
     YOLO_CONFIDENCE: float = 0.6
     YOLO_IOU: float = 0.45
     DETECTION_CLASSES: List[int] = [0]  # 0 = person
+    YOLO_BATCH_SIZE: int = 8  # Frames por inferência (1 = sem batching)
+    YOLO_BATCH_TIMEOUT_MS: float = 20.0  # Espera máxima para completar um batch
+    YOLO_INFERENCE_WORKERS: int = 1  # Threads de inferência (cada uma com seu modelo)
+    YOLO_TORCH_THREADS: int = 0  # Total de threads intra-op do torch no processo, compartilhado pelos workers (0 = padrão do torch)
+    YOLO_ENGINE: str = "torch"  # torch, onnx, onnx_int8 ou openvino
+    YOLO_INT8_CALIBRATION_DIR: str = ""  # JPEGs das câmeras para calibrar o INT8
+    YOLO_EXPORT_DIR: str = "./models_cache"  # Cache dos modelos exportados
+    YOLO_IMGSZ: int = 640
+    
+    # Motion gate (pula detecção em frames estáticos)
+    MOTION_GATE_ENABLED: bool = True
+    MOTION_GATE_THRESHOLD: float = 0.002  # Fração de pixels alterados para considerar movimento
+    MOTION_GATE_FORCE_INTERVAL: float = 5.0  # Segundos entre detecções forçadas
     
     # Tracking
     TRACKING_MAX_DISAPPEARED: int = 30
     TRACKING_MAX_DISTANCE: float = 50.0
+    TRACKER_ENGINE: str = "centroid"  # centroid (distância entre centros) ou bytetrack (IoU em dois estágios)
+    TRACKER_HIGH_THRESHOLD: float = 0.5  # bytetrack: confiança das detecções do 1º estágio / novos tracks
+    TRACKER_LOW_THRESHOLD: float = 0.1  # bytetrack: confiança mínima aceita no 2º estágio
+    TRACKER_MATCH_IOU: float = 0.2  # bytetrack: IoU mínimo para associar no 1º estágio
+    TRACKER_TRACK_BUFFER: int = 30  # bytetrack: frames que um track perdido é mantido
+    TRACKER_MAX_PREDICTED_FRAMES: int = 10  # Frames seguidos que um track é extrapolado pelo Kalman sem detecção
+    DETECTION_INTERVAL: int = 1  # Rodar o detector a cada N frames (1 = todo frame); demais frames usam Kalman
+    DETECTION_INTERVAL_PER_CAMERA: Dict[str, int] = {}  # Sobrescrita por câmera, ex: {"cam1": 3}
+    DETECTION_CROWDED_TRACKS: int = 8  # A partir deste nº de tracks ativos volta a detectar todo frame
+    PIPELINE_IDLE_TIMEOUT: float = 300.0  # Segundos sem frames até descartar o estado de uma câmera
+    HEATMAP_CELL_SIZE: int = 8  # Pixels por célula da grade do heatmap
+    HEATMAP_HALF_LIFE: float = 300.0  # Segundos para o calor de um ponto cair pela metade
     LINE_POSITION: int = 50  # Percentage from top
     
+    # Face recognition (identidade cacheada por track)
+    FACE_REVERIFY_INTERVAL: float = 10.0  # Segundos até re-verificar a identidade de um track
+    FACE_RETRY_INTERVAL: float = 1.0  # Segundos entre tentativas quando o track ainda não tem face utilizável
+    FACE_QUALITY_GAIN: float = 0.2  # Face 20% melhor que a usada antes força re-verificação
+    FACE_CROP_SIZE: int = 160  # Lado maior do crop da cabeça entregue ao encoder (px)
+    FACE_MIN_SIZE: int = 32  # Cabeças menores que isso (px no frame) não são codificadas
+    FACE_MIN_SHARPNESS: float = 30.0  # Variância do Laplaciano mínima (abaixo = borrado)
+    FACE_MIN_BRIGHTNESS: float = 40.0  # Brilho médio mínimo (0-255) do crop da cabeça
+    FACE_INDEX_TYPE: str = "auto"  # auto (hnsw se hnswlib instalado, senão ivf), hnsw, ivf ou brute
+    FACE_INDEX_NPROBE: int = 8  # Células visitadas por busca no índice IVF
+    FACE_CUSTOMER_CACHE_SIZE: int = 100000  # Máximo de clientes recorrentes mantidos na galeria
+    FACE_CUSTOMER_TTL_DAYS: int = 30  # Clientes não vistos há mais dias saem da galeria
+    FACE_STORE_DTYPE: str = "float16"  # Precisão dos embeddings persistidos (float16 ou float32)
+    FACE_ENCODER_WORKERS: int = 0  # Processos de encoding facial (0 = thread única, sem pool de processos)
+    
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_PASSWORD: str = ""
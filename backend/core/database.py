@@ -2,23 +2,84 @@
 Gerenciador do Supabase para operações no banco
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, date
-from supabase import create_client, Client
+from cachetools import TTLCache
+from postgrest import AsyncPostgrestClient
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
 from loguru import logger
-import json
+import asyncio
+import uuid
+import httpx
+
+try:
+    import h2  # noqa: F401 - necessário para HTTP/2 no httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 class SupabaseManager:
-    def __init__(self, url: str, key: str):
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 10.0,
+        max_concurrency: int = 10,
+        http2: bool = True,
+        stats_cache_ttl: float = 5.0
+    ):
         self.url = url
         self.key = key
-        self.client: Optional[Client] = None
+        self.client: Optional[AsyncPostgrestClient] = None  # PostgREST assíncrono (httpx.AsyncClient)
+        
+        # Pool HTTP keep-alive do PostgREST (uma instância por processo, ver core.app_state)
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout  # Orçamento total de uma query (fila + requisição), em segundos
+        self.http2 = http2 and HTTP2_AVAILABLE
+        
+        # Limite de queries simultâneas (o excedente espera sem bloquear o event loop)
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        
+        # Cache curto de get_camera_stats (chamado a cada frame pelo engine)
+        self._camera_stats_cache: Optional[TTLCache] = TTLCache(maxsize=64, ttl=stats_cache_ttl) if stats_cache_ttl > 0 else None
+        self._camera_stats_pending: Dict[Tuple[Optional[str], int], asyncio.Future] = {}  # Uma query por chave em voo
+        self._camera_stats_rpc = True  # False quando a função get_camera_stats não existe no banco
+        
+        # Estatísticas
+        self.stats = {
+            'queries': 0,
+            'timeouts': 0,
+            'errors': 0,
+            'stats_cache_hits': 0
+        }
         
     async def initialize(self):
-        """Inicializar conexão com Supabase"""
+        """Inicializar conexão com Supabase (idempotente)"""
+        if self.client is not None:
+            return True
+        
         try:
-            # CORREÇÃO: Remover qualquer parâmetro proxy
-            self.client = create_client(self.url, self.key)
+            if not self.url or not self.key:
+                raise ValueError("SUPABASE_URL/SUPABASE_SERVICE_KEY não configurados")
+            
+            client = AsyncPostgrestClient(
+                f"{self.url.rstrip('/')}/rest/v1",
+                headers={
+                    "apiKey": self.key,
+                    "Authorization": f"Bearer {self.key}"
+                },
+                timeout=self.timeout
+            )
+            await self._configure_pool(client)
+            self.client = client
             
             # Testar conexão básica
             logger.info("✅ Conexão com Supabase estabelecida")
@@ -30,10 +91,68 @@ class SupabaseManager:
             logger.warning("⚠️ Sistema funcionando em modo offline (sem banco)")
             return False
     
+    async def _configure_pool(self, client: AsyncPostgrestClient):
+        """Trocar a sessão httpx do PostgREST por uma com pool keep-alive (e HTTP/2) explícitos"""
+        try:
+            session = client.session
+            client.session = type(session)(
+                base_url=session.base_url,
+                headers=session.headers,
+                timeout=session.timeout,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+            await session.aclose()
+            logger.info(f"🔌 Pool HTTP do Supabase: {self.max_connections} conexões, "
+                        f"{self.max_keepalive_connections} keep-alive, "
+                        f"{'HTTP/2' if self.http2 else 'HTTP/1.1'}, até {self.max_concurrency} queries simultâneas")
+        except Exception as e:
+            # Sessão padrão do cliente continua válida (também é keep-alive)
+            logger.warning(f"⚠️ Não foi possível configurar o pool HTTP do Supabase: {e}")
+    
+    async def _execute(self, query):
+        """
+        Executar uma query PostgREST sem bloquear o event loop
+        Respeita o limite de concorrência; o timeout cobre a espera na fila e a requisição
+        """
+        async def run():
+            async with self._semaphore:
+                self._in_flight += 1
+                try:
+                    return await query.execute()
+                finally:
+                    self._in_flight -= 1
+        
+        self.stats['queries'] += 1
+        try:
+            return await asyncio.wait_for(run(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise TimeoutError(f"Query ao Supabase excedeu {self.timeout}s")
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de queries e ocupação do limite de concorrência"""
+        return {
+            **self.stats,
+            'in_flight': self._in_flight,
+            'max_concurrency': self.max_concurrency,
+            'http2': self.http2
+        }
+    
     async def close(self):
         """Fechar conexão"""
         if self.client:
-            # Supabase client não precisa de close explícito
+            try:
+                await self.client.aclose()
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao fechar sessão HTTP do Supabase: {e}")
             self.client = None
             logger.info("Conexão Supabase fechada")
     
@@ -41,8 +160,8 @@ class SupabaseManager:
     # CAMERA EVENTS - MULTI-CAMERA SUPPORT
     # ========================================================================
     
-    async def insert_camera_event(
-        self, 
+    @staticmethod
+    def camera_event_row(
         camera_id: str,
         timestamp: str,
         people_count: int,
@@ -53,27 +172,31 @@ class SupabaseManager:
         frame_width: int = 0,
         frame_height: int = 0,
         metadata: Dict = None
-    ):
+    ) -> Dict[str, Any]:
+        """Linha de camera_events (usada pelo insert direto e pelo EventWriter)"""
+        return {
+            "camera_id": camera_id,
+            "timestamp": timestamp,
+            "people_count": people_count,
+            "customers_count": customers_count,
+            "employees_count": employees_count,
+            "groups_count": groups_count,
+            "processing_time_ms": processing_time_ms,
+            "frame_width": frame_width,
+            "frame_height": frame_height,
+            "metadata": metadata or {}
+        }
+    
+    async def insert_camera_event(self, camera_id: str, timestamp: str, people_count: int, **fields):
         """Inserir evento de processamento de câmera - suporte a múltiplas câmeras"""
         if not self.client:
             logger.warning("Cliente Supabase não disponível")
             return None
             
         try:
-            event_data = {
-                "camera_id": camera_id,
-                "timestamp": timestamp,
-                "people_count": people_count,
-                "customers_count": customers_count,
-                "employees_count": employees_count,
-                "groups_count": groups_count,
-                "processing_time_ms": processing_time_ms,
-                "frame_width": frame_width,
-                "frame_height": frame_height,
-                "metadata": metadata or {}
-            }
+            event_data = self.camera_event_row(camera_id, timestamp, people_count, **fields)
             
-            result = self.client.table("camera_events").insert(event_data).execute()
+            result = await self._execute(self.client.table("camera_events").insert(event_data))
             
             if result.data:
                 logger.debug(f"Evento de câmera inserido: {camera_id} - {people_count} pessoas")
@@ -86,96 +209,170 @@ class SupabaseManager:
             return None
     
     async def get_camera_stats(self, camera_id: str = None, hours: int = 24) -> Dict:
-        """Obter estatísticas de câmera(s)"""
+        """
+        Obter estatísticas de câmera(s)
+        Agregadas no banco (rpc get_camera_stats) e mantidas em cache por alguns segundos;
+        chamadas simultâneas com os mesmos argumentos compartilham a mesma query
+        """
         if not self.client:
             return {}
-            
+        
+        key = (camera_id, hours)
+        if self._camera_stats_cache is not None and key in self._camera_stats_cache:
+            self.stats['stats_cache_hits'] += 1
+            return self._camera_stats_cache[key]
+        
+        pending = self._camera_stats_pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fetch_camera_stats(camera_id, hours))
+            self._camera_stats_pending[key] = pending
+            pending.add_done_callback(lambda _: self._camera_stats_pending.pop(key, None))
+        
+        stats = await asyncio.shield(pending)
+        if stats and self._camera_stats_cache is not None:
+            self._camera_stats_cache[key] = stats
+        return stats
+    
+    async def _fetch_camera_stats(self, camera_id: Optional[str], hours: int) -> Dict:
+        """Somas por câmera (rpc ou fallback) resumidas no formato de get_camera_stats"""
         try:
-            from datetime import datetime, timedelta
+            from datetime import timedelta
             start_time = (datetime.now() - timedelta(hours=hours)).isoformat()
             
-            query = self.client.table("camera_events")\
-                .select("*")\
-                .gte("timestamp", start_time)
-                
-            if camera_id:
-                query = query.eq("camera_id", camera_id)
-                
-            result = query.execute()
-            
-            events = result.data or []
+            rows = None
+            if self._camera_stats_rpc:
+                try:
+                    params = {"p_since": start_time}
+                    if camera_id:
+                        params["p_camera_id"] = camera_id
+                    result = await self._execute(self.client.rpc("get_camera_stats", params))
+                    rows = result.data or []
+                except APIError as e:
+                    if e.code == "PGRST202":  # Função não encontrada no schema cache
+                        self._camera_stats_rpc = False
+                        logger.warning("Função get_camera_stats não encontrada - execute scripts/create_camera_stats_function.sql")
+                    else:
+                        logger.warning(f"Erro no rpc get_camera_stats, usando fallback: {e}")
+            
+            if rows is None:
+                rows = await self._camera_stats_fallback(start_time, camera_id)
             
             # Agregar estatísticas
+            total_events = sum(row["events"] for row in rows)
             stats = {
-                "total_events": len(events),
-                "total_people": sum(e.get("people_count", 0) for e in events),
-                "total_customers": sum(e.get("customers_count", 0) for e in events),
-                "total_employees": sum(e.get("employees_count", 0) for e in events),
-                "avg_processing_time": sum(e.get("processing_time_ms", 0) for e in events) / len(events) if events else 0,
-                "cameras_active": len(set(e.get("camera_id") for e in events)),
+                "total_events": total_events,
+                "total_people": sum(row["people"] for row in rows),
+                "total_customers": sum(row["customers"] for row in rows),
+                "total_employees": sum(row["employees"] for row in rows),
+                "avg_processing_time": sum(row["processing_time_ms_sum"] for row in rows) / total_events if total_events else 0,
+                "cameras_active": len(rows),
                 "period_hours": hours
             }
             
             # Estatísticas por câmera
             if not camera_id:
-                camera_breakdown = {}
-                for event in events:
-                    cam_id = event.get("camera_id", "unknown")
-                    if cam_id not in camera_breakdown:
-                        camera_breakdown[cam_id] = {
-                            "events": 0,
-                            "people": 0,
-                            "customers": 0,
-                            "employees": 0
-                        }
-                    
-                    camera_breakdown[cam_id]["events"] += 1
-                    camera_breakdown[cam_id]["people"] += event.get("people_count", 0)
-                    camera_breakdown[cam_id]["customers"] += event.get("customers_count", 0)
-                    camera_breakdown[cam_id]["employees"] += event.get("employees_count", 0)
-                
-                stats["by_camera"] = camera_breakdown
+                stats["by_camera"] = {
+                    row["camera_id"] or "unknown": {
+                        "events": row["events"],
+                        "people": row["people"],
+                        "customers": row["customers"],
+                        "employees": row["employees"]
+                    }
+                    for row in rows
+                }
             
             return stats
             
         except Exception as e:
             logger.error(f"Erro ao obter stats de câmera: {e}")
             return {}
-
+    
+    async def _camera_stats_fallback(self, start_time: str, camera_id: Optional[str]) -> List[Dict]:
+        """Fallback sem a função SQL: baixar as colunas somadas e agrupar por câmera em Python"""
+        query = self.client.table("camera_events")\
+            .select("camera_id,people_count,customers_count,employees_count,processing_time_ms")\
+            .gte("timestamp", start_time)
+        
+        if camera_id:
+            query = query.eq("camera_id", camera_id)
+        
+        result = await self._execute(query)
+        
+        by_camera: Dict[str, Dict[str, Any]] = {}
+        for event in result.data or []:
+            cam_id = event.get("camera_id")
+            row = by_camera.setdefault(cam_id, {
+                "camera_id": cam_id,
+                "events": 0,
+                "people": 0,
+                "customers": 0,
+                "employees": 0,
+                "processing_time_ms_sum": 0
+            })
+            row["events"] += 1
+            row["people"] += event.get("people_count") or 0
+            row["customers"] += event.get("customers_count") or 0
+            row["employees"] += event.get("employees_count") or 0
+            row["processing_time_ms_sum"] += event.get("processing_time_ms") or 0
+        
+        return list(by_camera.values())
+    
     # ========================================================================
     # PEOPLE EVENTS
     # ========================================================================
     
-    async def insert_people_event(
-        self, 
-        action: str, 
+    @staticmethod
+    def people_event_row(
+        action: str,
         person_tracking_id: str = None,
         confidence: float = 0.0,
         snapshot_url: str = None,
         timestamp: str = None,
-        metadata: Dict = None
-    ):
+        metadata: Dict = None,
+        camera_id: str = None
+    ) -> Dict[str, Any]:
+        """
+        Linha de people_events (usada pelo insert direto e pelo EventWriter)
+        A coluna camera_id referencia cameras(id) (UUID); IDs de bridge ("bridge",
+        bridge_id) ficam só em metadata para a linha não ser rejeitada
+        """
+        event_data = {
+            "action": action,
+            "person_tracking_id": person_tracking_id,
+            "confidence": confidence,
+            "snapshot_url": snapshot_url,
+            "metadata": metadata or {},
+        }
+        
+        if timestamp:
+            event_data["timestamp"] = timestamp
+        if camera_id:
+            event_data["metadata"] = {**event_data["metadata"], "camera_id": camera_id}
+            if SupabaseManager._is_uuid(camera_id):
+                event_data["camera_id"] = camera_id
+        return event_data
+    
+    @staticmethod
+    def _is_uuid(value: str) -> bool:
+        try:
+            uuid.UUID(str(value))
+            return True
+        except ValueError:
+            return False
+    
+    async def insert_people_event(self, action: str, **fields):
         """Inserir evento de pessoa (entrada/saída)"""
         if not self.client:
             logger.warning("Cliente Supabase não disponível")
             return None
             
         try:
-            event_data = {
-                "action": action,
-                "person_tracking_id": person_tracking_id,
-                "confidence": confidence,
-                "snapshot_url": snapshot_url,
-                "metadata": metadata or {},
-            }
-            
-            if timestamp:
-                event_data["timestamp"] = timestamp
+            event_data = self.people_event_row(action, **fields)
             
-            result = self.client.table("people_events").insert(event_data).execute()
+            result = await self._execute(self.client.table("people_events").insert(event_data))
             
             if result.data:
-                logger.debug(f"Evento inserido: {action} - {person_tracking_id}")
+                logger.debug(f"Evento inserido: {action} - {event_data['person_tracking_id']}")
                 return result.data[0]
             else:
                 raise Exception("Falha ao inserir evento")
@@ -184,17 +381,50 @@ class SupabaseManager:
             logger.error(f"Erro ao inserir evento: {e}")
             return None
     
+    # ========================================================================
+    # BULK WRITES (EventWriter)
+    # ========================================================================
+    
+    async def insert_rows(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert multi-linha em uma única requisição (sem retornar as linhas)
+        Todas as linhas devem ter as mesmas colunas. Levanta exceção em caso de falha
+        para que o chamador possa tentar de novo.
+        """
+        if not self.client:
+            raise ConnectionError("Cliente Supabase não disponível")
+        if not rows:
+            return 0
+        
+        await self._execute(self.client.table(table).insert(rows, returning=ReturnMethod.minimal))
+        return len(rows)
+    
+    async def upsert_rows(self, table: str, rows: List[Dict[str, Any]], on_conflict: str) -> int:
+        """
+        Upsert multi-linha em uma única requisição (INSERT ... ON CONFLICT DO UPDATE)
+        As linhas não podem repetir a chave on_conflict. Levanta exceção em caso de falha.
+        """
+        if not self.client:
+            raise ConnectionError("Cliente Supabase não disponível")
+        if not rows:
+            return 0
+        
+        await self._execute(
+            self.client.table(table).upsert(rows, returning=ReturnMethod.minimal, on_conflict=on_conflict)
+        )
+        return len(rows)
+    
     async def get_recent_events(self, limit: int = 50) -> List[Dict]:
         """Buscar eventos recentes"""
         if not self.client:
             return []
             
         try:
-            result = self.client.table("people_events")\
+            query = self.client.table("people_events")\
                 .select("*")\
                 .order("timestamp", desc=True)\
-                .limit(limit)\
-                .execute()
+                .limit(limit)
+            result = await self._execute(query)
             
             return result.data or []
             
@@ -220,11 +450,11 @@ class SupabaseManager:
             if target_date is None:
                 target_date = date.today()
             
-            result = self.client.table("current_stats")\
+            query = self.client.table("current_stats")\
                 .select("*")\
                 .eq("date", target_date.isoformat())\
-                .single()\
-                .execute()
+                .single()
+            result = await self._execute(query)
             
             return result.data or {
                 "people_count": 0,
@@ -266,10 +496,10 @@ class SupabaseManager:
             if total_exits is not None:
                 update_data["total_exits"] = total_exits
             
-            result = self.client.table("current_stats")\
+            query = self.client.table("current_stats")\
                 .update(update_data)\
-                .eq("date", target_date.isoformat())\
-                .execute()
+                .eq("date", target_date.isoformat())
+            result = await self._execute(query)
             
             return result.data
             
@@ -290,11 +520,11 @@ class SupabaseManager:
             if target_date is None:
                 target_date = date.today()
             
-            result = self.client.table("hourly_stats")\
+            query = self.client.table("hourly_stats")\
                 .select("*")\
                 .eq("date", target_date.isoformat())\
-                .order("hour")\
-                .execute()
+                .order("hour")
+            result = await self._execute(query)
             
             return result.data or []
             
@@ -312,9 +542,10 @@ class SupabaseManager:
                 target_date = date.today()
             
             # Usar a função SQL criada anteriormente
-            result = self.client.rpc("get_hourly_heatmap", {
+            query = self.client.rpc("get_hourly_heatmap", {
                 "p_date": target_date.isoformat()
-            }).execute()
+            })
+            result = await self._execute(query)
             
             return result.data or []
             
@@ -390,7 +621,7 @@ class SupabaseManager:
             if timestamp:
                 sale_data["timestamp"] = timestamp
             
-            result = self.client.table("sales").insert(sale_data).execute()
+            result = await self._execute(self.client.table("sales").insert(sale_data))
             
             if result.data:
                 logger.debug(f"Venda inserida: R$ {amount}")
@@ -414,12 +645,12 @@ class SupabaseManager:
             start_datetime = f"{target_date.isoformat()}T00:00:00"
             end_datetime = f"{target_date.isoformat()}T23:59:59"
             
-            result = self.client.table("sales")\
+            query = self.client.table("sales")\
                 .select("*")\
                 .gte("timestamp", start_datetime)\
                 .lte("timestamp", end_datetime)\
-                .order("timestamp", desc=True)\
-                .execute()
+                .order("timestamp", desc=True)
+            result = await self._execute(query)
             
             return result.data or []
             
@@ -447,9 +678,10 @@ class SupabaseManager:
             
             # Usar função SQL se disponível
             try:
-                result = self.client.rpc("get_conversion_rate", {
+                query = self.client.rpc("get_conversion_rate", {
                     "p_date": target_date.isoformat()
-                }).execute()
+                })
+                result = await self._execute(query)
                 
                 if result.data and len(result.data) > 0:
                     return result.data[0]
@@ -499,9 +731,10 @@ class SupabaseManager:
             
             # Tentar usar função SQL
             try:
-                result = self.client.rpc("get_dashboard_metrics", {
+                query = self.client.rpc("get_dashboard_metrics", {
                     "p_date": target_date.isoformat()
-                }).execute()
+                })
+                result = await self._execute(query)
                 
                 if result.data:
                     return result.data
@@ -568,11 +801,11 @@ class SupabaseManager:
             return {}
             
         try:
-            result = self.client.table("camera_config")\
+            query = self.client.table("camera_config")\
                 .select("*")\
                 .eq("is_active", True)\
-                .single()\
-                .execute()
+                .single()
+            result = await self._execute(query)
             
             return result.data or {}
             
@@ -591,15 +824,15 @@ class SupabaseManager:
             
             if current_config.get("id"):
                 # Atualizar existente
-                result = self.client.table("camera_config")\
+                query = self.client.table("camera_config")\
                     .update(config_data)\
-                    .eq("id", current_config["id"])\
-                    .execute()
+                    .eq("id", current_config["id"])
+                result = await self._execute(query)
             else:
                 # Inserir nova
-                result = self.client.table("camera_config")\
-                    .insert(config_data)\
-                    .execute()
+                query = self.client.table("camera_config")\
+                    .insert(config_data)
+                result = await self._execute(query)
             
             logger.info("Configuração da câmera atualizada")
             return result.data
@@ -633,7 +866,7 @@ class SupabaseManager:
                 "metadata": metadata or {}
             }
             
-            result = self.client.table("system_logs").insert(log_data).execute()
+            result = await self._execute(self.client.table("system_logs").insert(log_data))
             return result.data
             
         except Exception as e:
@@ -652,18 +885,18 @@ class SupabaseManager:
         try:
             # Parse simple SELECT queries for compatibility
             if "FROM employees" in query:
-                result = self.client.table("employees").select("*").execute()
+                result = await self._execute(self.client.table("employees").select("*"))
                 return result.data or []
             elif "FROM behavior_analytics" in query:
                 try:
-                    result = self.client.table("behavior_analytics").select("*").execute()
+                    result = await self._execute(self.client.table("behavior_analytics").select("*"))
                     return result.data or []
                 except Exception:
                     logger.warning("Tabela behavior_analytics não encontrada - execute a migration 005")
                     return []
             elif "FROM customer_segments" in query:
                 try:
-                    result = self.client.table("customer_segments").select("*").execute()
+                    result = await self._execute(self.client.table("customer_segments").select("*"))
                     return result.data or []
                 except Exception:
                     logger.warning("Tabela customer_segments não encontrada - execute a migration 006")
@@ -671,35 +904,35 @@ class SupabaseManager:
             elif "FROM customer_profiles" in query:
                 # Redirect to customer_segments table
                 try:
-                    result = self.client.table("customer_segments").select("*").execute()
+                    result = await self._execute(self.client.table("customer_segments").select("*"))
                     return result.data or []
                 except Exception:
                     logger.warning("Tabela customer_segments não encontrada - execute a migration 006")
                     return []
             elif "FROM store_zones" in query:
                 try:
-                    result = self.client.table("store_zones").select("*").execute()
+                    result = await self._execute(self.client.table("store_zones").select("*"))
                     return result.data or []
                 except Exception:
                     logger.warning("Tabela store_zones não encontrada - execute a migration 007")
                     return []
             elif "FROM analytics_events" in query:
                 try:
-                    result = self.client.table("analytics_events").select("*").execute()
+                    result = await self._execute(self.client.table("analytics_events").select("*"))
                     return result.data or []
                 except Exception:
                     logger.warning("Tabela analytics_events não encontrada - execute a migration 008")
                     return []
             elif "FROM flow_patterns" in query:
                 try:
-                    result = self.client.table("flow_patterns").select("*").execute()
+                    result = await self._execute(self.client.table("flow_patterns").select("*"))
                     return result.data or []
                 except Exception:
                     logger.warning("Tabela flow_patterns não encontrada - execute a migration 009")
                     return []
             elif "FROM analytics_summary" in query:
                 try:
-                    result = self.client.table("analytics_summary").select("*").execute()
+                    result = await self._execute(self.client.table("analytics_summary").select("*"))
                     return result.data or []
                 except Exception:
                     logger.warning("Tabela analytics_summary não encontrada - execute a migration 010")
@@ -762,7 +995,7 @@ class SupabaseManager:
                 "metadata": metadata or {}
             }
             
-            result = self.client.table("alerts").insert(alert_data).execute()
+            result = await self._execute(self.client.table("alerts").insert(alert_data))
             logger.info(f"Alerta criado: {title}")
             return result.data
             
@@ -780,10 +1013,10 @@ class SupabaseManager:
             return []
             
         try:
-            result = self.client.table("cameras")\
+            query = self.client.table("cameras")\
                 .select("*")\
-                .order("created_at", desc=False)\
-                .execute()
+                .order("created_at", desc=False)
+            result = await self._execute(query)
             
             return result.data or []
             
@@ -797,11 +1030,11 @@ class SupabaseManager:
             return None
             
         try:
-            result = self.client.table("cameras")\
+            query = self.client.table("cameras")\
                 .select("*")\
                 .eq("id", camera_id)\
-                .single()\
-                .execute()
+                .single()
+            result = await self._execute(query)
             
             return result.data
             
@@ -822,9 +1055,9 @@ class SupabaseManager:
                 "status": "offline"  # Status inicial
             })
             
-            result = self.client.table("cameras")\
-                .insert(camera_data)\
-                .execute()
+            query = self.client.table("cameras")\
+                .insert(camera_data)
+            result = await self._execute(query)
             
             if result.data:
                 return result.data[0]["id"]
@@ -843,10 +1076,10 @@ class SupabaseManager:
             # Adicionar timestamp de atualização
             camera_data["updated_at"] = datetime.now().isoformat()
             
-            result = self.client.table("cameras")\
+            query = self.client.table("cameras")\
                 .update(camera_data)\
-                .eq("id", camera_id)\
-                .execute()
+                .eq("id", camera_id)
+            result = await self._execute(query)
             
             return len(result.data) > 0
             
@@ -860,10 +1093,10 @@ class SupabaseManager:
             return False
             
         try:
-            result = self.client.table("cameras")\
+            query = self.client.table("cameras")\
                 .delete()\
-                .eq("id", camera_id)\
-                .execute()
+                .eq("id", camera_id)
+            result = await self._execute(query)
             
             return len(result.data) > 0
             
@@ -877,14 +1110,14 @@ class SupabaseManager:
             return False
             
         try:
-            result = self.client.table("cameras")\
+            query = self.client.table("cameras")\
                 .update({
                     "status": status,
                     "last_seen": datetime.now().isoformat(),
                     "updated_at": datetime.now().isoformat()
                 })\
-                .eq("id", camera_id)\
-                .execute()
+                .eq("id", camera_id)
+            result = await self._execute(query)
             
             return len(result.data) > 0
             
@@ -915,7 +1148,7 @@ class SupabaseManager:
             if end_date:
                 query = query.lte("timestamp", end_date)
             
-            result = query.execute()
+            result = await self._execute(query)
             return result.data or []
             
         except Exception as e:
@@ -933,7 +1166,7 @@ class SupabaseManager:
             return None
             
         try:
-            result = self.client.table("behavior_analytics").insert(data).execute()
+            result = await self._execute(self.client.table("behavior_analytics").insert(data))
             if result.data:
                 logger.debug(f"Dados comportamentais inseridos: {data.get('person_id', 'unknown')}")
                 return result.data[0]
@@ -949,7 +1182,7 @@ class SupabaseManager:
             return None
             
         try:
-            result = self.client.table("analytics_events").insert(data).execute()
+            result = await self._execute(self.client.table("analytics_events").insert(data))
             if result.data:
                 logger.debug(f"Evento analytics inserido: {data.get('event_type', 'unknown')}")
                 return result.data[0]
@@ -970,28 +1203,28 @@ class SupabaseManager:
             
         try:
             # Buscar eventos recentes
-            events_result = self.client.table("analytics_events")\
+            query = self.client.table("analytics_events")\
                 .select("*")\
                 .eq("is_active", True)\
                 .order("timestamp", desc=True)\
-                .limit(10)\
-                .execute()
+                .limit(10)
+            events_result = await self._execute(query)
             
             # Buscar alertas ativos
-            alerts_result = self.client.table("analytics_events")\
+            query = self.client.table("analytics_events")\
                 .select("*")\
                 .in_("severity", ["warning", "critical"])\
                 .eq("is_active", True)\
                 .order("timestamp", desc=True)\
-                .limit(5)\
-                .execute()
+                .limit(5)
+            alerts_result = await self._execute(query)
             
             # Buscar estatísticas do dia atual
-            today_stats = self.client.table("analytics_summary")\
+            query = self.client.table("analytics_summary")\
                 .select("*")\
                 .eq("date", "today()")\
-                .eq("period_type", "daily")\
-                .execute()
+                .eq("period_type", "daily")
+            today_stats = await self._execute(query)
             
             return {
                 "current_metrics": {
@@ -1042,13 +1275,13 @@ class SupabaseManager:
             # Buscar dados recentes de detecções reais (últimas N horas)
             current_time = datetime.now()
             start_time = current_time - timedelta(hours=hours)
-
-            detections_result = self.client.table("detections")\
+            
+            query = self.client.table("detections")\
                 .select("*")\
                 .gte("timestamp", start_time.isoformat())\
-                .lte("timestamp", current_time.isoformat())\
-                .execute()
-
+                .lte("timestamp", current_time.isoformat())
+            detections_result = await self._execute(query)
+            
             real_detections = detections_result.data or []
 
             # Se não há detecções reais recentes, retornar dados vazios
@@ -1094,16 +1327,16 @@ class SupabaseManager:
             
         try:
             # Buscar dados de flow_patterns relacionados a grupos
-            patterns_result = self.client.table("flow_patterns")\
+            query = self.client.table("flow_patterns")\
                 .select("*")\
-                .order("frequency", desc=True)\
-                .execute()
+                .order("frequency", desc=True)
+            patterns_result = await self._execute(query)
                 
             # Buscar dados de analytics_summary para estatísticas
-            summary_result = self.client.table("analytics_summary")\
+            query = self.client.table("analytics_summary")\
                 .select("*")\
-                .gte("date", f"now() - interval '{days} days'")\
-                .execute()
+                .gte("date", f"now() - interval '{days} days'")
+            summary_result = await self._execute(query)
             
             patterns = patterns_result.data or []
             summaries = summary_result.data or []
@@ -1175,18 +1408,18 @@ class SupabaseManager:
             comparison_dates = comparison_period.replace(" to ", "to").split("to")
             
             # Buscar dados do período atual
-            current_result = self.client.table("analytics_summary")\
+            query = self.client.table("analytics_summary")\
                 .select("*")\
                 .gte("date", current_dates[0].strip())\
-                .lte("date", current_dates[1].strip() if len(current_dates) > 1 else current_dates[0].strip())\
-                .execute()
+                .lte("date", current_dates[1].strip() if len(current_dates) > 1 else current_dates[0].strip())
+            current_result = await self._execute(query)
                 
             # Buscar dados do período de comparação  
-            comparison_result = self.client.table("analytics_summary")\
+            query = self.client.table("analytics_summary")\
                 .select("*")\
                 .gte("date", comparison_dates[0].strip())\
-                .lte("date", comparison_dates[1].strip() if len(comparison_dates) > 1 else comparison_dates[0].strip())\
-                .execute()
+                .lte("date", comparison_dates[1].strip() if len(comparison_dates) > 1 else comparison_dates[0].strip())
+            comparison_result = await self._execute(query)
             
             current_data = current_result.data or []
             comparison_data = comparison_result.data or []
@@ -1266,10 +1499,10 @@ class SupabaseManager:
             
         try:
             # Buscar dados da loja atual
-            store_result = self.client.table("analytics_summary")\
+            query = self.client.table("analytics_summary")\
                 .select("*")\
-                .gte("date", "now() - interval '30 days'")\
-                .execute()
+                .gte("date", "now() - interval '30 days'")
+            store_result = await self._execute(query)
                 
             store_data = store_result.data or []
             
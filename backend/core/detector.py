@@ -2,92 +2,390 @@
 Detector de pessoas usando YOLO11
 """
 
-import cv2
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from ultralytics import YOLO
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional
 from loguru import logger
 import torch
+import shutil
 from pathlib import Path
 
+# Engines de inferência suportados -> formato de export do ultralytics
+SUPPORTED_ENGINES = {
+    'torch': None,
+    'onnx': 'onnx',
+    'onnx_int8': 'onnx',  # ONNX quantizado (calibrado com frames das câmeras)
+    'openvino': 'openvino'
+}
+
+class DetectionBatcher:
+    """
+    Fila de micro-batching para o detector
+    Agrupa frames de várias câmeras e executa uma única chamada ao modelo
+    """
+    
+    def __init__(self, detector: "YOLOPersonDetector", max_batch_size: int = 8, max_wait_ms: float = 20.0):
+        self.detector = detector
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        
+        # Estatísticas
+        self.stats = {
+            'batches_processed': 0,
+            'frames_processed': 0,
+            'largest_batch': 0
+        }
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """Iniciar loop de batching (precisa de event loop ativo)"""
+        if self.running:
+            return
+        self.queue = asyncio.Queue()
+        # Um batch em execução por worker de inferência
+        self._in_flight = asyncio.Semaphore(self.detector.inference_workers)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Batching do detector ativo: até {self.max_batch_size} frames ou {self.max_wait * 1000:.0f}ms")
+    
+    async def stop(self):
+        """Parar loop de batching e liberar chamadas pendentes"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        self._fail_pending([])
+    
+    def _fail_pending(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        """Liberar quem aguarda detect: frames já retirados da fila (batch) e os ainda enfileirados"""
+        pending = list(batch)
+        if self.queue is not None:
+            while not self.queue.empty():
+                pending.append(self.queue.get_nowait())
+        
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Fila de batching do detector finalizada"))
+    
+    async def submit(self, frame: np.ndarray) -> List[Dict[str, Any]]:
+        """Enfileirar frame e aguardar o resultado da sua detecção"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((frame, future))
+        return await future
+    
+    async def _collect_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        """
+        Agrupar frames em batch até atingir o tamanho máximo ou o deadline
+        A lista é do chamador: se a coleta for cancelada, os frames já retirados da fila não se perdem
+        """
+        loop = asyncio.get_running_loop()
+        batch.append(await self.queue.get())
+        deadline = loop.time() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+    
+    async def _run(self):
+        """Loop principal: coleta batches e despacha para o executor de inferência"""
+        while True:
+            await self._in_flight.acquire()
+            batch = []
+            try:
+                await self._collect_batch(batch)
+            except BaseException:
+                self._in_flight.release()
+                self._fail_pending(batch)
+                raise
+            batch = [(frame, future) for frame, future in batch if not future.cancelled()]
+            if not batch:
+                self._in_flight.release()
+                continue
+            asyncio.create_task(self._dispatch(batch))
+    
+    async def _dispatch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        """Executar inferência de um batch e devolver cada resultado ao seu chamador"""
+        try:
+            results = await self.detector._infer_batch_async([frame for frame, _ in batch])
+        except Exception as e:
+            logger.error(f"Erro na inferência em batch: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._in_flight.release()
+        
+        for (_, future), detections in zip(batch, results):
+            if not future.done():
+                future.set_result(detections)
+        
+        self.stats['batches_processed'] += 1
+        self.stats['frames_processed'] += len(batch)
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Obter estatísticas do batching"""
+        batches = self.stats['batches_processed']
+        return {
+            **self.stats,
+            'avg_batch_size': round(self.stats['frames_processed'] / batches, 2) if batches else 0,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000
+        }
+
 class YOLOPersonDetector:
-    def __init__(self, model_path: str = "yolo11n.pt", confidence: float = 0.6, iou: float = 0.45):
+    def __init__(self, model_path: str = "yolo11n.pt", confidence: float = 0.6, iou: float = 0.45,
+                 max_batch_size: int = 1, max_batch_wait_ms: float = 20.0,
+                 inference_workers: int = 1, torch_threads: int = 0,
+                 engine: str = "torch", export_dir: str = "./models_cache", imgsz: int = 640,
+                 calibration_dir: Optional[str] = None):
         self.model_path = model_path
         self.confidence = confidence
         self.iou = iou
         self.model = None
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         
+        # Engine de inferência (torch, onnx, openvino) e artefato exportado em cache
+        self.engine = engine.lower()
+        if self.engine not in SUPPORTED_ENGINES:
+            raise ValueError(f"Engine YOLO não suportado: {engine} (opções: {', '.join(SUPPORTED_ENGINES)})")
+        self.export_dir = Path(export_dir)
+        self.imgsz = imgsz
+        self.calibration_dir = calibration_dir
+        self.model_source = model_path
+        
+        # Executor dedicado: a inferência roda fora do event loop do uvicorn.
+        # Cada worker mantém sua própria instância do modelo (YOLO não é thread-safe)
+        self.inference_workers = max(1, inference_workers)
+        self._local = threading.local()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.inference_workers,
+            thread_name_prefix="yolo-inference"
+        )
+        
+        # torch.set_num_threads é global do processo: é o total de threads intra-op
+        # dividido entre todos os workers acima, não um valor por worker
+        self.torch_threads = torch_threads
+        if torch_threads > 0:
+            torch.set_num_threads(torch_threads)
+        
+        # Micro-batching entre câmeras (desabilitado com max_batch_size=1)
+        self.batcher = DetectionBatcher(self, max_batch_size, max_batch_wait_ms) if max_batch_size > 1 else None
+        
     async def load_model(self):
         """Carregar modelo YOLO11"""
         try:
-            logger.info(f"Carregando YOLO11: {self.model_path} no {self.device}")
+            logger.info(f"Carregando YOLO11: {self.model_path} no {self.device} (engine: {self.engine})")
             
             # Verificar se o modelo existe localmente
             model_file = Path(self.model_path)
             if not model_file.exists():
-                logger.info(f"Modelo não encontrado localmente, fazendo download...")
+                logger.info("Modelo não encontrado localmente, fazendo download...")
+            
+            loop = asyncio.get_running_loop()
             
-            # Carregar modelo
-            self.model = YOLO(self.model_path)
-            self.model.to(self.device)
+            # Exportar uma única vez para o runtime escolhido (reaproveita o cache)
+            if self.engine != 'torch':
+                self.model_source = await loop.run_in_executor(self.executor, self._resolve_engine_artifact)
             
-            # Fazer uma predição de teste para "aquecer" o modelo
-            test_frame = np.zeros((640, 640, 3), dtype=np.uint8)
-            _ = self.model(test_frame, verbose=False)
+            # Carregar e aquecer o modelo em um worker do executor
+            self.model = await loop.run_in_executor(self.executor, self._get_model)
+            
+            logger.success(
+                f"YOLO11 carregado com sucesso no {self.device} "
+                f"({self.engine}, {self.inference_workers} worker(s) de inferência)"
+            )
             
-            logger.success(f"YOLO11 carregado com sucesso no {self.device}")
+            if self.batcher is not None:
+                self.batcher.start()
             
         except Exception as e:
             logger.error(f"Erro ao carregar YOLO11: {e}")
             raise
     
+    def _engine_artifact_path(self, engine: Optional[str] = None) -> Path:
+        """Caminho do artefato exportado em cache para o engine"""
+        engine = engine or self.engine
+        stem = Path(self.model_path).stem
+        if engine == 'openvino':
+            return self.export_dir / f"{stem}_openvino_model"
+        if engine == 'onnx_int8':
+            return self.export_dir / f"{stem}_int8.onnx"
+        return self.export_dir / f"{stem}.{engine}"
+    
+    def _resolve_engine_artifact(self) -> str:
+        """Exportar YOLO_MODEL para o engine escolhido, se ainda não estiver em cache"""
+        if self.engine == 'onnx_int8':
+            return self._resolve_int8_artifact()
+        return self._export_artifact(self.engine)
+    
+    def _export_artifact(self, engine: str) -> str:
+        """Exportar o modelo para o formato do engine (apenas se não houver cache)"""
+        artifact = self._engine_artifact_path(engine)
+        if artifact.exists():
+            logger.info(f"Usando modelo {engine} em cache: {artifact}")
+            return str(artifact)
+        
+        logger.info(f"Exportando {self.model_path} para {engine} (apenas na primeira execução)...")
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        
+        exported = YOLO(self.model_path).export(
+            format=SUPPORTED_ENGINES[engine],
+            imgsz=self.imgsz,
+            dynamic=True,  # Batch dinâmico para o micro-batching
+            half=False,
+            verbose=False
+        )
+        
+        shutil.move(str(exported), str(artifact))
+        logger.success(f"Modelo exportado para {artifact}")
+        return str(artifact)
+    
+    def _resolve_int8_artifact(self) -> str:
+        """Usar modelo INT8 calibrado; sem calibração disponível, cair para o ONNX FP32"""
+        artifact = self._engine_artifact_path('onnx_int8')
+        if artifact.exists():
+            logger.info(f"Usando modelo INT8 em cache: {artifact}")
+            return str(artifact)
+        
+        fp32_artifact = self._export_artifact('onnx')
+        
+        if self.calibration_dir and Path(self.calibration_dir).is_dir():
+            from core.detector_quantization import quantize_detector_int8
+            return quantize_detector_int8(fp32_artifact, self.calibration_dir, str(artifact), self.imgsz)
+        
+        logger.warning(
+            "Modelo INT8 não calibrado - usando ONNX FP32. "
+            "Gere com: python scripts/calibrate_int8_detector.py --images <pasta de JPEGs>"
+        )
+        return fp32_artifact
+    
+    def _create_model(self):
+        """Criar instância do modelo e fazer predição de teste para aquecê-lo"""
+        model = YOLO(self.model_source, task='detect')
+        if self.engine == 'torch':
+            model.to(self.device)
+        
+        test_frame = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        _ = model(test_frame, verbose=False)
+        
+        return model
+    
+    def _get_model(self):
+        """Obter modelo do worker atual (carregado na primeira chamada da thread)"""
+        model = getattr(self._local, 'model', None)
+        if model is None:
+            model = self._create_model()
+            self._local.model = model
+        return model
+    
     async def detect_persons(self, frame: np.ndarray) -> List[Dict[str, Any]]:
         """Detectar pessoas no frame"""
         try:
             if self.model is None:
                 raise Exception("Modelo não foi carregado")
             
-            # Executar inferência
-            results = self.model(
-                frame,
-                conf=self.confidence,
-                iou=self.iou,
-                classes=[0],  # Apenas classe "person"
-                verbose=False
-            )
+            # Com batching ativo, o frame entra na fila compartilhada entre câmeras
+            if self.batcher is not None and self.batcher.running:
+                return await self.batcher.submit(frame)
             
-            detections = []
+            return (await self._infer_batch_async([frame]))[0]
             
-            # Processar resultados
-            for result in results:
-                if result.boxes is not None:
-                    boxes = result.boxes.xyxy.cpu().numpy()  # x1, y1, x2, y2
-                    confidences = result.boxes.conf.cpu().numpy()
-                    
-                    for i, (box, conf) in enumerate(zip(boxes, confidences)):
-                        x1, y1, x2, y2 = box
-                        
-                        # Calcular centro e dimensões
-                        center_x = int((x1 + x2) / 2)
-                        center_y = int((y1 + y2) / 2)
-                        width = int(x2 - x1)
-                        height = int(y2 - y1)
-                        
-                        detection = {
-                            'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                            'center': [center_x, center_y],
-                            'confidence': float(conf),
-                            'width': width,
-                            'height': height,
-                            'area': width * height,
-                            'class': 'person'
-                        }
-                        
-                        detections.append(detection)
+        except Exception as e:
+            logger.error(f"Erro na detecção: {e}")
+            return []
+    
+    async def detect_persons_batch(self, frames: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """Detectar pessoas em vários frames com uma única chamada ao modelo"""
+        try:
+            if self.model is None:
+                raise Exception("Modelo não foi carregado")
+            
+            if not frames:
+                return []
             
-            return detections
+            return await self._infer_batch_async(frames)
             
         except Exception as e:
-            logger.error(f"Erro na detecção: {e}")
-            return []
\ No newline at end of file
+            logger.error(f"Erro na detecção em batch: {e}")
+            return [[] for _ in frames]
+    
+    async def _infer_batch_async(self, frames: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """Executar inferência no executor dedicado sem bloquear o event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._infer_batch, frames)
+    
+    def _infer_batch(self, frames: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """Executar inferência em lista de frames (uma detecção por frame)"""
+        results = self._get_model()(
+            frames,
+            imgsz=self.imgsz,
+            conf=self.confidence,
+            iou=self.iou,
+            classes=[0],  # Apenas classe "person"
+            verbose=False
+        )
+        
+        return [self._parse_result(result) for result in results]
+    
+    def _parse_result(self, result) -> List[Dict[str, Any]]:
+        """Converter resultado do YOLO em lista de detecções"""
+        detections = []
+        
+        if result.boxes is not None:
+            boxes = result.boxes.xyxy.cpu().numpy()  # x1, y1, x2, y2
+            confidences = result.boxes.conf.cpu().numpy()
+            
+            for box, conf in zip(boxes, confidences):
+                x1, y1, x2, y2 = box
+                
+                # Calcular centro e dimensões
+                center_x = int((x1 + x2) / 2)
+                center_y = int((y1 + y2) / 2)
+                width = int(x2 - x1)
+                height = int(y2 - y1)
+                
+                detection = {
+                    'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                    'center': [center_x, center_y],
+                    'confidence': float(conf),
+                    'width': width,
+                    'height': height,
+                    'area': width * height,
+                    'class': 'person'
+                }
+                
+                detections.append(detection)
+        
+        return detections
+    
+    def get_batching_stats(self) -> Dict[str, Any]:
+        """Estatísticas do micro-batching (vazio se desabilitado)"""
+        if self.batcher is None:
+            return {'enabled': False}
+        return {'enabled': self.batcher.running, **self.batcher.get_stats()}
+    
+    async def close(self):
+        """Encerrar fila de batching e executor de inferência"""
+        if self.batcher is not None:
+            await self.batcher.stop()
+        self.executor.shutdown(wait=False, cancel_futures=True)
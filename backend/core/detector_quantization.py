@@ -0,0 +1,169 @@
+"""
+Quantização INT8 estática do detector de pessoas
+Calibração com frames das próprias câmeras e relatório de concordância com o FP32
+"""
+
+import numpy as np
+import cv2
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterator
+from loguru import logger
+
+try:
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static
+    )
+    ONNX_QUANTIZATION_AVAILABLE = True
+except ImportError:
+    CalibrationDataReader = object
+    ONNX_QUANTIZATION_AVAILABLE = False
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+def list_calibration_images(images_dir: str, max_images: Optional[int] = None) -> List[Path]:
+    """Listar imagens de calibração (JPEG/PNG) de uma pasta, em ordem estável"""
+    folder = Path(images_dir)
+    if not folder.is_dir():
+        raise FileNotFoundError(f"Pasta de calibração não encontrada: {images_dir}")
+    
+    images = sorted(p for p in folder.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+    
+    if max_images and len(images) > max_images:
+        # Amostragem uniforme para cobrir o dia inteiro de gravação
+        indices = np.linspace(0, len(images) - 1, max_images).astype(int)
+        images = [images[i] for i in indices]
+    
+    return images
+
+def letterbox(frame: np.ndarray, imgsz: int = 640) -> np.ndarray:
+    """Redimensionar mantendo proporção e completar com cinza (igual ao pré-processamento do YOLO)"""
+    h, w = frame.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - new_h) // 2
+    left = (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    
+    return canvas
+
+def preprocess_frame(frame: np.ndarray, imgsz: int = 640) -> np.ndarray:
+    """Frame BGR -> tensor NCHW float32 RGB normalizado em [0, 1]"""
+    image = letterbox(frame, imgsz)
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    tensor = image.transpose(2, 0, 1).astype(np.float32) / 255.0
+    return tensor[np.newaxis, ...]
+
+class JPEGCalibrationReader(CalibrationDataReader):
+    """Fornece frames das câmeras para a calibração do ONNX Runtime"""
+    
+    def __init__(self, image_paths: List[Path], input_name: str, imgsz: int = 640):
+        self.image_paths = image_paths
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._iterator: Optional[Iterator[Path]] = None
+    
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        if self._iterator is None:
+            self._iterator = iter(self.image_paths)
+        
+        for path in self._iterator:
+            frame = cv2.imread(str(path))
+            if frame is None:
+                logger.warning(f"Imagem ignorada na calibração: {path}")
+                continue
+            return {self.input_name: preprocess_frame(frame, self.imgsz)}
+        
+        return None
+    
+    def rewind(self):
+        self._iterator = None
+
+def quantize_detector_int8(
+    fp32_model_path: str,
+    calibration_dir: str,
+    output_path: str,
+    imgsz: int = 640,
+    max_images: int = 300
+) -> str:
+    """
+    Quantizar modelo ONNX FP32 para INT8 estático calibrado com frames reais
+    
+    Args:
+        fp32_model_path: Modelo ONNX exportado pelo detector
+        calibration_dir: Pasta com JPEGs amostrados das câmeras
+        output_path: Caminho do modelo INT8
+        imgsz: Tamanho de entrada do modelo
+        max_images: Máximo de imagens usadas na calibração
+        
+    Returns:
+        Caminho do modelo INT8 gerado
+    """
+    if not ONNX_QUANTIZATION_AVAILABLE:
+        raise RuntimeError("onnx/onnxruntime não instalados - quantização INT8 indisponível")
+    
+    images = list_calibration_images(calibration_dir, max_images)
+    if not images:
+        raise ValueError(f"Nenhuma imagem de calibração em {calibration_dir}")
+    
+    fp32_model = onnx.load(fp32_model_path)
+    input_name = fp32_model.graph.input[0].name
+    
+    logger.info(f"Calibrando INT8 com {len(images)} imagens de {calibration_dir}...")
+    
+    quantize_static(
+        model_input=fp32_model_path,
+        model_output=output_path,
+        calibration_data_reader=JPEGCalibrationReader(images, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax
+    )
+    
+    # Preservar metadados do export (classes, stride, imgsz) usados pelo ultralytics
+    int8_model = onnx.load(output_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, output_path)
+    
+    logger.success(f"Modelo INT8 salvo em {output_path}")
+    return output_path
+
+def compare_detection_counts(
+    reference: List[List[Dict[str, Any]]],
+    candidate: List[List[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    Concordância de contagem de pessoas por frame entre FP32 (referência) e INT8
+    """
+    if len(reference) != len(candidate):
+        raise ValueError("Listas de detecções com tamanhos diferentes")
+    
+    if not reference:
+        return {'frames': 0}
+    
+    ref_counts = np.array([len(d) for d in reference])
+    cand_counts = np.array([len(d) for d in candidate])
+    diff = cand_counts - ref_counts
+    
+    return {
+        'frames': len(reference),
+        'exact_agreement': round(float(np.mean(diff == 0)), 4),
+        'within_one': round(float(np.mean(np.abs(diff) <= 1)), 4),
+        'mean_abs_diff': round(float(np.mean(np.abs(diff))), 4),
+        'max_abs_diff': int(np.max(np.abs(diff))),
+        'reference_total': int(ref_counts.sum()),
+        'candidate_total': int(cand_counts.sum()),
+        'missed_frames': int(np.sum(diff < 0)),
+        'extra_frames': int(np.sum(diff > 0))
+    }
@@ -0,0 +1,364 @@
+"""
+Event Writer - Persistência write-behind de eventos (camera_events, people_events)
+e das gravações dos módulos de IA (behavior_analytics, predictions, customer_segments)
+- Fila limitada em memória: o caminho do frame só enfileira (sem round trip)
+- Flush a cada batch_size linhas ou flush_interval_ms, em inserts/upserts multi-linha
+- Upserts da mesma chave no mesmo flush são coalescidos (vale a última linha)
+- Retry com backoff exponencial só para timeout/erro de conexão
+- Spill em JSONL quando o banco está inacessível (reenviado quando ele volta)
+- Dead letter por tabela para lotes rejeitados pelo PostgREST (sem retry nem replay)
+- Métricas: profundidade da fila e latência de flush
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import httpx
+from postgrest.exceptions import APIError
+from loguru import logger
+
+from core.database import SupabaseManager
+
+# (tabela, colunas de conflito do upsert ou None para insert, linha)
+Item = Tuple[str, Optional[str], Dict[str, Any]]
+
+# Resultado de _write_batch
+WRITTEN = 'written'
+UNREACHABLE = 'unreachable'  # Timeout/conexão esgotou as tentativas: lote no spill
+REJECTED = 'rejected'  # Erro permanente do PostgREST: lote no dead letter
+
+class EventWriter:
+    """
+    Buffer write-behind sobre o SupabaseManager compartilhado
+    """
+    
+    def __init__(
+        self,
+        db: SupabaseManager,
+        batch_size: int = 200,
+        flush_interval_ms: float = 500.0,
+        max_queue: int = 20000,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        spill_path: str = "logs/event_spill.jsonl",
+        dead_letter_dir: str = "logs/event_dead_letter",
+        replay_interval: float = 30.0
+    ):
+        self.db = db
+        self.batch_size = batch_size  # Linhas que disparam um flush antecipado
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff  # Segundos (dobra a cada tentativa)
+        self.spill_path = spill_path
+        self.dead_letter_dir = dead_letter_dir  # Um JSONL por tabela ({tabela}.jsonl)
+        self.replay_interval = replay_interval  # Segundos entre tentativas de reenviar o spill
+        
+        self.queue: Deque[Item] = deque()  # (tabela, on_conflict, linha)
+        self._spill_buffer: List[Item] = []  # Gravado em lote, fora do loop, por _write_spill
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False  # close() pede a saída do loop sem cancelar um flush em andamento
+        self._flush_lock = asyncio.Lock()
+        self._last_replay = 0.0
+        
+        # Métricas
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'retries': 0,
+            'failed_batches': 0,
+            'spilled': 0,
+            'dead_lettered': 0,
+            'replayed': 0,
+            'dropped': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0
+        }
+        self._flush_time_total = 0.0
+        self._flushes = 0
+    
+    # ------------------------------------------------------------------
+    # Enfileiramento (chamado no caminho do frame, nunca bloqueia)
+    # ------------------------------------------------------------------
+    
+    def enqueue(self, table: str, row: Dict[str, Any], on_conflict: Optional[str] = None):
+        """
+        Enfileirar uma linha; com a fila cheia a linha vai para o buffer de spill
+        
+        Args:
+            on_conflict: Colunas da chave única ("customer_id") para gravar como upsert
+        """
+        if len(self.queue) >= self.max_queue:
+            self._spill([(table, on_conflict, row)])
+            return
+        
+        self.queue.append((table, on_conflict, row))
+        self.stats['enqueued'] += 1
+        if len(self.queue) >= self.batch_size:
+            self._wakeup.set()
+    
+    def add_camera_event(self, camera_id: str, timestamp: str, people_count: int, **fields):
+        """Mesmos argumentos de SupabaseManager.insert_camera_event"""
+        self.enqueue("camera_events", SupabaseManager.camera_event_row(camera_id, timestamp, people_count, **fields))
+    
+    def add_people_event(self, action: str, **fields):
+        """Mesmos argumentos de SupabaseManager.insert_people_event"""
+        self.enqueue("people_events", SupabaseManager.people_event_row(action, **fields))
+    
+    def upsert(self, table: str, row: Dict[str, Any], on_conflict: str):
+        """Enfileirar um upsert pela chave on_conflict"""
+        self.enqueue(table, row, on_conflict=on_conflict)
+    
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    
+    async def start(self):
+        """Iniciar o loop de flush (e reenviar spill pendente de execuções anteriores)"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"📝 Event writer iniciado (lote {self.batch_size}, {self.flush_interval * 1000:.0f} ms)")
+    
+    async def close(self):
+        """Parar o loop e gravar tudo que estiver na fila (falhas vão para o spill)"""
+        if self._task is not None:
+            # Sem cancel(): um flush em andamento já tirou as linhas da fila e precisa terminar
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        
+        await self.flush()
+        logger.info(f"📝 Event writer finalizado ({self.stats['written']} linhas gravadas, "
+                    f"{self.stats['spilled']} em spill)")
+    
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                await self.flush()
+                if not self._stopping and time.monotonic() - self._last_replay >= self.replay_interval:
+                    await self.replay_spill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro no loop do event writer: {e}")
+    
+    # ------------------------------------------------------------------
+    # Flush
+    # ------------------------------------------------------------------
+    
+    async def flush(self):
+        """Gravar as linhas enfileiradas agrupadas por tabela/colunas"""
+        async with self._flush_lock:
+            if not self.queue:
+                await self._write_spill()
+                return
+            
+            start = time.perf_counter()
+            pending = list(self.queue)
+            self.queue.clear()
+            
+            if self.db.client is None:
+                # Modo offline (banco não configurado): não há para onde reenviar
+                self.stats['dropped'] += len(pending)
+                return
+            
+            await self._write_groups(pending)
+            await self._write_spill()
+            
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._flushes += 1
+            self._flush_time_total += elapsed_ms
+            self.stats['last_flush_ms'] = round(elapsed_ms, 2)
+            self.stats['max_flush_ms'] = round(max(self.stats['max_flush_ms'], elapsed_ms), 2)
+    
+    @staticmethod
+    def _group(items: List[Item]) -> List[Tuple[str, Optional[str], List[Dict[str, Any]]]]:
+        """
+        Agrupar por tabela + modo + conjunto de colunas (requisição multi-linha exige colunas iguais)
+        Em upserts só a última linha de cada chave é mantida: o Postgres rejeita um
+        ON CONFLICT que atualiza a mesma linha duas vezes no mesmo comando
+        """
+        groups: Dict[Tuple[str, Optional[str], Tuple[str, ...]], Dict[Any, Dict[str, Any]]] = {}
+        for i, (table, on_conflict, row) in enumerate(items):
+            group = groups.setdefault((table, on_conflict, tuple(sorted(row))), {})
+            if on_conflict:
+                key = tuple(str(row.get(column)) for column in on_conflict.split(','))
+                group.pop(key, None)  # Reinserir preserva a ordem da última ocorrência
+                group[key] = row
+            else:
+                group[i] = row
+        return [(table, on_conflict, list(rows.values())) for (table, on_conflict, _), rows in groups.items()]
+    
+    async def _write_groups(self, items: List[Item]) -> int:
+        """
+        Gravar linhas em lotes de até batch_size
+        Lotes rejeitados vão para o dead letter e os demais grupos seguem; depois do
+        primeiro lote que esgota as tentativas por timeout/conexão, o resto vai para o spill
+        """
+        written = 0
+        reachable = True
+        for table, on_conflict, rows in self._group(items):
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i:i + self.batch_size]
+                if not reachable:
+                    self._spill([(table, on_conflict, row) for row in batch])
+                    continue
+                
+                result = await self._write_batch(table, batch, on_conflict)
+                if result == WRITTEN:
+                    written += len(batch)
+                elif result == UNREACHABLE:
+                    reachable = False
+        return written
+    
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        """Timeout/erro de conexão (vale tentar de novo); o resto é rejeição permanente"""
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError, httpx.TransportError)):
+            return True
+        if isinstance(error, APIError):
+            code = str(error.code or '')
+            if code.isdigit():  # Resposta sem JSON (gateway): só 5xx/429 são transitórios
+                return int(code) >= 500 or int(code) == 429
+            # PGRST0xx: PostgREST sem conexão com o Postgres; 08/53/57/40: conexão, recursos, cancelamento, deadlock
+            return code.startswith('PGRST0') or code[:2] in ('08', '53', '57', '40')
+        return False
+    
+    async def _write_batch(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str] = None) -> str:
+        """
+        Insert/upsert multi-linha
+        Timeout/conexão: retry com backoff e, esgotadas as tentativas, spill.
+        Rejeição (4xx, violação de constraint, tabela inexistente): dead letter sem retry.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                if on_conflict:
+                    await self.db.upsert_rows(table, rows, on_conflict)
+                else:
+                    await self.db.insert_rows(table, rows)
+                self.stats['written'] += len(rows)
+                self.stats['batches'] += 1
+                return WRITTEN
+            except Exception as e:
+                if not self._is_transient(e):
+                    logger.error(f"❌ {len(rows)} linhas rejeitadas por {table}: {e} - enviando para dead letter")
+                    self.stats['failed_batches'] += 1
+                    await self._dead_letter(table, on_conflict, rows, e)
+                    return REJECTED
+                if attempt < self.max_retries:
+                    self.stats['retries'] += 1
+                    await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                else:
+                    logger.warning(f"⚠️ Falha ao gravar {len(rows)} linhas em {table}: {e} - enviando para spill")
+        
+        self.stats['failed_batches'] += 1
+        self._spill([(table, on_conflict, row) for row in rows])
+        return UNREACHABLE
+    
+    # ------------------------------------------------------------------
+    # Spill e dead letter em disco
+    # ------------------------------------------------------------------
+    
+    def _spill(self, items: List[Item]):
+        """Guardar linhas para o spill (gravadas em lote pelo próximo flush)"""
+        self._spill_buffer.extend(items)
+        if len(self._spill_buffer) >= self.batch_size:
+            self._wakeup.set()
+    
+    async def _write_spill(self):
+        """Acrescentar o buffer ao arquivo de spill em uma escrita, fora do event loop"""
+        if not self._spill_buffer:
+            return
+        
+        items, self._spill_buffer = self._spill_buffer, []
+        entries = [{'table': table, 'on_conflict': on_conflict, 'row': row} for table, on_conflict, row in items]
+        try:
+            await asyncio.to_thread(self._append_jsonl, self.spill_path, entries)
+            self.stats['spilled'] += len(items)
+        except Exception as e:
+            logger.error(f"Erro ao gravar spill de eventos ({len(items)} linhas perdidas): {e}")
+    
+    async def _dead_letter(self, table: str, on_conflict: Optional[str], rows: List[Dict[str, Any]], error: Exception):
+        """Guardar lote rejeitado em {dead_letter_dir}/{tabela}.jsonl (inspeção manual, sem replay)"""
+        path = os.path.join(self.dead_letter_dir, f"{table}.jsonl")
+        entries = [{'table': table, 'on_conflict': on_conflict, 'row': row, 'error': str(error)} for row in rows]
+        try:
+            await asyncio.to_thread(self._append_jsonl, path, entries)
+            self.stats['dead_lettered'] += len(rows)
+        except Exception as e:
+            logger.error(f"Erro ao gravar dead letter de {table} ({len(rows)} linhas perdidas): {e}")
+    
+    @staticmethod
+    def _append_jsonl(path: str, entries: List[Dict[str, Any]]):
+        lines = ''.join(json.dumps(entry, default=str) + '\n' for entry in entries)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(lines)
+    
+    async def replay_spill(self) -> int:
+        """
+        Reenviar as linhas do spill
+        Falhas de conexão voltam para o arquivo; rejeições vão para o dead letter
+        (uma linha envenenada não é reenviada para sempre)
+        """
+        self._last_replay = time.monotonic()
+        replay_path = f"{self.spill_path}.replay"
+        if self.db.client is None or not (os.path.exists(self.spill_path) or os.path.exists(replay_path)):
+            return 0
+        
+        async with self._flush_lock:
+            try:
+                # Um .replay que sobrou de uma execução interrompida é reenviado primeiro
+                if not os.path.exists(replay_path):
+                    os.replace(self.spill_path, replay_path)
+                items = await asyncio.to_thread(self._read_spill, replay_path)
+            except Exception as e:
+                logger.error(f"Erro ao ler spill de eventos: {e}")
+                return 0
+            
+            written = await self._write_groups(items)
+            await self._write_spill()
+            os.remove(replay_path)
+            
+            self.stats['replayed'] += written
+            if written:
+                logger.info(f"📝 {written} eventos do spill gravados no banco")
+            return written
+    
+    @staticmethod
+    def _read_spill(path: str) -> List[Item]:
+        items = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    items.append((entry['table'], entry.get('on_conflict'), entry['row']))
+        return items
+    
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'queue_depth': len(self.queue),
+            'max_queue': self.max_queue,
+            'spill_buffered': len(self._spill_buffer),
+            'avg_flush_ms': round(self._flush_time_total / self._flushes, 2) if self._flushes else 0.0,
+            'spill_pending': os.path.exists(self.spill_path)
+        }
@@ -0,0 +1,97 @@
+"""
+Gate de movimento por câmera
+Evita rodar o detector e o Smart Analytics em frames estáticos (corredor vazio)
+"""
+
+import cv2
+import numpy as np
+import time
+from typing import Dict, List, Any, Optional
+
+class MotionGate:
+    """
+    Diferença de frame contra um fundo de média móvel em baixa resolução.
+    
+    O frame só é pulado quando o movimento está abaixo do limiar E a última
+    detecção não tinha ninguém; uma detecção completa é forçada a cada
+    force_interval segundos.
+    """
+    
+    def __init__(
+        self,
+        motion_threshold: float = 0.002,
+        force_interval: float = 5.0,
+        pixel_delta: int = 25,
+        downscale_width: int = 160,
+        learning_rate: float = 0.05
+    ):
+        self.motion_threshold = motion_threshold  # Fração de pixels alterados
+        self.force_interval = force_interval  # Segundos entre detecções forçadas
+        self.pixel_delta = pixel_delta  # Diferença de intensidade para contar pixel como alterado
+        self.downscale_width = downscale_width
+        self.learning_rate = learning_rate
+        
+        # Estado
+        self.background: Optional[np.ndarray] = None
+        self.last_detections: List[Dict[str, Any]] = []
+        self.last_result: Any = None  # Resultado reaproveitado quando o frame é pulado
+        self.last_inference_time: Optional[float] = None
+        self.last_motion_ratio = 0.0
+        
+        # Contadores
+        self.frames_gated = 0
+        self.frames_inferred = 0
+    
+    def measure_motion(self, frame: np.ndarray) -> float:
+        """Fração de pixels que mudaram em relação ao fundo (0 a 1)"""
+        h, w = frame.shape[:2]
+        scale = self.downscale_width / w
+        small = cv2.resize(frame, (self.downscale_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            return 1.0
+        
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        ratio = float(np.count_nonzero(diff > self.pixel_delta)) / diff.size
+        
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+        
+        return ratio
+    
+    def should_infer(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """Decidir se o frame precisa passar pelo detector"""
+        now = now if now is not None else time.time()
+        self.last_motion_ratio = self.measure_motion(frame)
+        
+        needs_inference = (
+            self.last_result is None
+            or self.last_detections
+            or self.last_motion_ratio >= self.motion_threshold
+            or self.last_inference_time is None
+            or now - self.last_inference_time >= self.force_interval
+        )
+        
+        if not needs_inference:
+            self.frames_gated += 1
+        
+        return needs_inference
+    
+    def record_inference(self, detections: List[Dict[str, Any]], result: Any = None, now: Optional[float] = None):
+        """Registrar resultado de uma detecção completa"""
+        self.frames_inferred += 1
+        self.last_detections = detections
+        self.last_result = result
+        self.last_inference_time = now if now is not None else time.time()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores do gate"""
+        total = self.frames_gated + self.frames_inferred
+        return {
+            'frames_gated': self.frames_gated,
+            'frames_inferred': self.frames_inferred,
+            'gated_ratio': round(self.frames_gated / total, 3) if total else 0.0,
+            'last_motion_ratio': round(self.last_motion_ratio, 5)
+        }
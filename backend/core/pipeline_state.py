@@ -0,0 +1,205 @@
+"""
+Estado do pipeline por câmera
+Cada câmera tem seu próprio tracker, analisador comportamental (tracks, heatmap,
+zonas), gate de movimento e cadência de detecção. Frames de câmeras diferentes
+nunca são associados entre si e podem ser processados em paralelo.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Callable, Tuple, TYPE_CHECKING
+from loguru import logger
+
+from core.motion_gate import MotionGate
+from core.tracker import PersonTracker, DetectionCadence
+
+if TYPE_CHECKING:
+    from core.ai.behavior_analyzer import BehaviorAnalyzer
+    from core.detector import YOLOPersonDetector
+
+# Origem das detecções de um frame (CameraPipelineState.detect)
+DETECTED = 'detected'  # Detector rodou no frame
+PREDICTED = 'predicted'  # Frame intermediário da cadência: tracks propagados com Kalman
+GATED = 'gated'  # Cena estática e vazia: último resultado do gate de movimento
+
+class CameraPipelineState:
+    """Estado de processamento de uma câmera"""
+    
+    def __init__(
+        self,
+        camera_id: str,
+        tracker: PersonTracker,
+        cadence: DetectionCadence,
+        motion_gate: Optional[MotionGate] = None,
+        behavior_analyzer: Optional["BehaviorAnalyzer"] = None
+    ):
+        self.camera_id = camera_id
+        self.tracker = tracker
+        self.cadence = cadence
+        self.motion_gate = motion_gate
+        self.behavior_analyzer = behavior_analyzer
+        
+        # Frames da mesma câmera são processados em ordem; câmeras diferentes em paralelo
+        self.lock = asyncio.Lock()
+        
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+        self.frames_processed = 0
+        self.last_metrics = None
+    
+    def touch(self):
+        """Registrar atividade da câmera"""
+        self.last_seen = time.time()
+        self.frames_processed += 1
+    
+    def should_infer(self, frame) -> bool:
+        """Consultar o gate de movimento (sem gate, todo frame é inferido)"""
+        if self.motion_gate is None:
+            return True
+        return self.motion_gate.should_infer(frame)
+    
+    async def detect(self, frame, detector: "YOLOPersonDetector") -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Detecções do frame com tracker atualizado (chamar com self.lock adquirido)
+        Mesma etapa para /api/camera/process e /api/bridge/frames:
+        cadência (detectar a cada N frames) -> gate de movimento -> detector
+        
+        Returns:
+            (detecções com track_id, origem: DETECTED, PREDICTED ou GATED)
+        """
+        if not self.cadence.should_detect(len(self.tracker.active_persons())):
+            self.tracker.predict()
+            return self.tracker.get_track_detections(), PREDICTED
+        
+        if not self.should_infer(frame):
+            detections = self.motion_gate.last_detections
+            self.tracker.update(detections)
+            return detections, GATED
+        
+        detections = await detector.detect_persons(frame)
+        
+        # Atualizar tracker antes da IA: detecções recebem track_id estável
+        self.tracker.update(detections)
+        return [d for d in detections if 'track_id' in d], DETECTED
+    
+    @property
+    def heatmap(self):
+        return self.behavior_analyzer.heatmap if self.behavior_analyzer else None
+    
+    @property
+    def zones(self) -> Dict[str, Any]:
+        return self.behavior_analyzer.zones if self.behavior_analyzer else {}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Resumo do estado da câmera"""
+        return {
+            'frames_processed': self.frames_processed,
+            'idle_seconds': round(time.time() - self.last_seen, 1),
+            'active_tracks': len(self.tracker.active_persons()),
+            'behavior_tracks': len(self.behavior_analyzer.person_tracks) if self.behavior_analyzer else 0,
+            'cadence': self.cadence.get_stats(),
+            'motion_gate': self.motion_gate.get_stats() if self.motion_gate else None
+        }
+
+class CameraPipelineRegistry:
+    """
+    Estados de pipeline indexados por camera_id.
+    Criados na primeira chamada e descartados quando a câmera fica ociosa.
+    """
+    
+    def __init__(
+        self,
+        tracker_factory: Callable[[], PersonTracker],
+        cadence_factory: Callable[[str], DetectionCadence],
+        motion_gate_enabled: bool = True,
+        motion_gate_kwargs: Optional[Dict[str, Any]] = None,
+        idle_timeout: float = 300.0,
+        eviction_interval: float = 30.0
+    ):
+        self.tracker_factory = tracker_factory
+        self.cadence_factory = cadence_factory
+        self.motion_gate_enabled = motion_gate_enabled
+        self.motion_gate_kwargs = motion_gate_kwargs or {}
+        self.idle_timeout = idle_timeout
+        self.eviction_interval = eviction_interval
+        
+        self.states: Dict[str, CameraPipelineState] = {}
+        self.behavior_template: Optional["BehaviorAnalyzer"] = None
+        self._generation = 0  # Trackers criados (IDs não se repetem entre câmeras nem após descarte)
+        self._last_eviction = time.time()
+    
+    def set_behavior_template(self, analyzer: "BehaviorAnalyzer"):
+        """Analisador base do qual cada câmera herda banco e zonas"""
+        self.behavior_template = analyzer
+    
+    def get(self, camera_id: str) -> CameraPipelineState:
+        """Obter estado da câmera (cria na primeira chamada)"""
+        state = self.states.get(camera_id)
+        
+        if state is None:
+            self._generation += 1
+            tracker = self.tracker_factory()
+            tracker.id_prefix = f"person_{camera_id}.{self._generation}"
+            
+            state = CameraPipelineState(
+                camera_id=camera_id,
+                tracker=tracker,
+                cadence=self.cadence_factory(camera_id),
+                motion_gate=MotionGate(**self.motion_gate_kwargs) if self.motion_gate_enabled else None
+            )
+            self.states[camera_id] = state
+            logger.info(f"📷 Pipeline criado para câmera {camera_id}")
+        
+        # Analisador criado assim que o template estiver disponível (engine inicializado)
+        if state.behavior_analyzer is None and self.behavior_template is not None:
+            state.behavior_analyzer = self.behavior_template.spawn(camera_id)
+        
+        return state
+    
+    async def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Descartar câmeras sem frames há mais de idle_timeout segundos"""
+        now = now or time.time()
+        if now - self._last_eviction < self.eviction_interval:
+            return []
+        self._last_eviction = now
+        
+        evicted = []
+        for camera_id, state in list(self.states.items()):
+            if now - state.last_seen < self.idle_timeout or state.lock.locked():
+                continue
+            
+            if state.behavior_analyzer:
+                await state.behavior_analyzer.finalize_all_tracks()
+            
+            del self.states[camera_id]
+            evicted.append(camera_id)
+            logger.info(f"💤 Pipeline da câmera {camera_id} descartado (ociosa)")
+        
+        return evicted
+    
+    async def get_heatmaps(self, hour: Optional[datetime] = None) -> Dict[str, Any]:
+        """Heatmap de cada câmera ativa (atual ou de uma hora específica)"""
+        heatmaps = {}
+        for camera_id, state in self.states.items():
+            if state.behavior_analyzer is not None:
+                heatmap = await state.behavior_analyzer.get_heatmap_data(hour)
+                if heatmap is not None:
+                    heatmaps[camera_id] = heatmap
+        return heatmaps
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores agregados e por câmera"""
+        cameras = {camera_id: state.get_stats() for camera_id, state in self.states.items()}
+        gates = [s['motion_gate'] for s in cameras.values() if s['motion_gate']]
+        gated = sum(g['frames_gated'] for g in gates)
+        inferred = sum(g['frames_inferred'] for g in gates)
+        
+        return {
+            'active_cameras': len(self.states),
+            'idle_timeout': self.idle_timeout,
+            'motion_gate_enabled': self.motion_gate_enabled,
+            'frames_gated': gated,
+            'frames_inferred': inferred,
+            'cameras': cameras
+        }
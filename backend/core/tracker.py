@@ -2,13 +2,51 @@
 Sistema de tracking de pessoas para contagem de entrada/saída
 """
 
+import cv2
 import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial.distance import cdist
 from typing import Dict, List, Any, Tuple, Optional
-from collections import defaultdict, deque
+from collections import deque
 from dataclasses import dataclass
 from loguru import logger
 import time
-import uuid
+
+class ConstantVelocityKalman:
+    """Filtro de Kalman 2D de velocidade constante: estado (x, y, vx, vy), passo = 1 frame"""
+    
+    # Transição e observação (apenas posição é medida)
+    F = np.array([[1, 0, 1, 0],
+                  [0, 1, 0, 1],
+                  [0, 0, 1, 0],
+                  [0, 0, 0, 1]], dtype=np.float64)
+    H = np.array([[1, 0, 0, 0],
+                  [0, 1, 0, 0]], dtype=np.float64)
+    
+    def __init__(self, center: Tuple[float, float], process_noise: float = 1.0, measurement_noise: float = 10.0):
+        self.x = np.array([center[0], center[1], 0.0, 0.0], dtype=np.float64)
+        self.P = np.diag([measurement_noise, measurement_noise, 1000.0, 1000.0])
+        self.Q = np.eye(4) * process_noise
+        self.Q[2:, 2:] *= 0.01  # Velocidade varia devagar entre frames
+        self.R = np.eye(2) * measurement_noise
+    
+    def predict(self) -> Tuple[float, float]:
+        """Avançar um frame"""
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return float(self.x[0]), float(self.x[1])
+    
+    def update(self, center: Tuple[float, float]):
+        """Corrigir com a posição medida pelo detector"""
+        y = np.asarray(center, dtype=np.float64) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(4) - K @ self.H) @ self.P
+    
+    @property
+    def position(self) -> Tuple[float, float]:
+        return float(self.x[0]), float(self.x[1])
 
 @dataclass
 class TrackedPerson:
@@ -18,38 +56,128 @@ class TrackedPerson:
     confidence_history: deque
     crossed_line: bool = False
     direction: Optional[str] = None  # 'up' or 'down'
+    kalman: Optional[ConstantVelocityKalman] = None
+    size: Tuple[int, int] = (0, 0)  # largura, altura da última bbox
+    predicted_frames: int = 0  # Frames seguidos sem detecção associada
+    missed_detections: int = 0  # Frames com detector rodando em que o track não foi associado
+    last_measured: Optional[Tuple[int, int]] = None  # Últimas duas posições medidas pelo detector
+    previous_measured: Optional[Tuple[int, int]] = None
+    
+    def __post_init__(self):
+        if self.kalman is None and self.positions:
+            self.kalman = ConstantVelocityKalman(self.positions[-1])
+        if self.last_measured is None and self.positions:
+            self.last_measured = tuple(self.positions[-1])
     
-    def update_position(self, center: Tuple[int, int], confidence: float):
+    def update_position(self, center: Tuple[int, int], confidence: float, size: Optional[Tuple[int, int]] = None):
         self.positions.append(center)
         self.confidence_history.append(confidence)
         self.last_seen = time.time()
+        self.predicted_frames = 0
+        self.missed_detections = 0
+        self.previous_measured, self.last_measured = self.last_measured, tuple(center)
+        if size is not None:
+            self.size = size
+        if self.kalman is not None:
+            self.kalman.update(center)
         
         # Manter apenas últimas N posições
         if len(self.positions) > 10:
             self.positions.popleft()
             self.confidence_history.popleft()
+    
+    def predict_position(self) -> Tuple[int, int]:
+        """Avançar o filtro um frame e registrar a posição prevista"""
+        x, y = self.kalman.predict()
+        center = (int(round(x)), int(round(y)))
+        self.positions.append(center)
+        self.predicted_frames += 1
+        return center
+    
+    @property
+    def expected_position(self) -> Tuple[float, float]:
+        """Posição esperada para associação (estado do Kalman ou última posição)"""
+        if self.kalman is not None:
+            return self.kalman.position
+        return self.positions[-1]
+
+class DetectionCadence:
+    """
+    Decide em quais frames rodar o detector (detectar a cada N frames).
+    Nos demais frames o PersonTracker propaga as posições com Kalman.
+    O intervalo encolhe conforme o número de tracks ativos: cenas cheias
+    acumulam mais erro de predição e trocas de ID.
+    """
+    
+    def __init__(self, interval: int = 1, crowded_tracks: int = 8):
+        self.interval = max(1, interval)
+        self.crowded_tracks = max(1, crowded_tracks)
+        self._frames_since_detection = self.interval  # Primeiro frame sempre detecta
+        
+        # Contadores
+        self.frames_detected = 0
+        self.frames_predicted = 0
+    
+    def current_interval(self, active_tracks: int) -> int:
+        """Intervalo efetivo: N com poucos tracks, 1 a partir de crowded_tracks"""
+        if self.interval == 1 or active_tracks >= self.crowded_tracks:
+            return 1
+        load = active_tracks / self.crowded_tracks
+        return max(1, int(round(self.interval - (self.interval - 1) * load)))
+    
+    def should_detect(self, active_tracks: int) -> bool:
+        """Registrar um frame e dizer se ele deve passar pelo detector"""
+        self._frames_since_detection += 1
+        
+        if active_tracks == 0 or self._frames_since_detection >= self.current_interval(active_tracks):
+            self._frames_since_detection = 0
+            self.frames_detected += 1
+            return True
+        
+        self.frames_predicted += 1
+        return False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores da cadência"""
+        total = self.frames_detected + self.frames_predicted
+        return {
+            'interval': self.interval,
+            'frames_detected': self.frames_detected,
+            'frames_predicted': self.frames_predicted,
+            'predicted_ratio': round(self.frames_predicted / total, 3) if total else 0.0
+        }
 
 class PersonTracker:
-    def __init__(self, max_disappeared: int = 30, max_distance: float = 50.0):
+    def __init__(self, max_disappeared: int = 30, max_distance: float = 50.0, max_predicted_frames: int = 10):
         self.max_disappeared = max_disappeared
         self.max_distance = max_distance
+        self.max_predicted_frames = max_predicted_frames  # Frames seguidos que um track é extrapolado pelo Kalman
         self.tracked_persons: Dict[str, TrackedPerson] = {}
         self.next_id = 0
+        self.id_prefix = "person"  # CameraPipelineRegistry inclui câmera e geração do tracker
         self.crossings_buffer = []
         
     def update(self, detections: List[Dict[str, Any]]) -> Dict[str, TrackedPerson]:
-        """Atualizar tracker com novas detecções"""
+        """Atualizar tracker com novas detecções (cada detecção associada recebe 'track_id')"""
         try:
             current_time = time.time()
             
+            # Avançar o Kalman de todos os tracks para o frame atual
+            for person in self.tracked_persons.values():
+                if person.kalman is not None:
+                    person.kalman.predict()
+            
             # Se não há detecções, apenas atualizar disappeared timer
             if not detections:
+                for person in self.tracked_persons.values():
+                    person.missed_detections += 1
                 self._cleanup_disappeared_persons(current_time)
                 return self.tracked_persons.copy()
             
             # Extrair centros das detecções
             detection_centers = [det['center'] for det in detections]
             detection_confidences = [det['confidence'] for det in detections]
+            detection_sizes = [(det.get('width', 0), det.get('height', 0)) for det in detections]
             
             # Associar detecções com pessoas já tracked
             matched_persons, unmatched_detections = self._associate_detections(
@@ -60,22 +188,20 @@ class PersonTracker:
             for person_id, (detection_idx, distance) in matched_persons.items():
                 center = detection_centers[detection_idx]
                 confidence = detection_confidences[detection_idx]
-                self.tracked_persons[person_id].update_position(center, confidence)
+                self.tracked_persons[person_id].update_position(center, confidence, detection_sizes[detection_idx])
+                detections[detection_idx]['track_id'] = person_id
+            
+            # Tracks sem detecção neste frame deixam de ser propagados/emitidos até reaparecer
+            for person_id, person in self.tracked_persons.items():
+                if person_id not in matched_persons:
+                    person.missed_detections += 1
             
             # Criar novas pessoas para detecções não matched
             for det_idx in unmatched_detections:
-                person_id = self._generate_person_id()
-                center = detection_centers[det_idx]
-                confidence = detection_confidences[det_idx]
-                
-                self.tracked_persons[person_id] = TrackedPerson(
-                    id=person_id,
-                    positions=deque([center], maxlen=10),
-                    last_seen=current_time,
-                    confidence_history=deque([confidence], maxlen=10)
+                detections[det_idx]['track_id'] = self._create_person(
+                    detection_centers[det_idx], detection_confidences[det_idx],
+                    detection_sizes[det_idx], current_time
                 )
-                
-                logger.debug(f"Nova pessoa tracked: {person_id}")
             
             # Limpar pessoas que desapareceram
             self._cleanup_disappeared_persons(current_time)
@@ -86,42 +212,104 @@ class PersonTracker:
             logger.error(f"Erro no tracking: {e}")
             return self.tracked_persons.copy()
     
-    def _associate_detections(self, centers: List[Tuple[int, int]], 
-                            confidences: List[float]) -> Tuple[Dict[str, Tuple[int, float]], List[int]]:
-        """Associar detecções com pessoas já tracked"""
-        if not self.tracked_persons:
-            return {}, list(range(len(centers)))
+    def is_active(self, person: TrackedPerson) -> bool:
+        """Track associado na última detecção e ainda dentro do limite de extrapolação"""
+        return person.missed_detections == 0 and person.predicted_frames <= self.max_predicted_frames
+    
+    def active_persons(self) -> Dict[str, TrackedPerson]:
+        """Tracks ativos (os perdidos seguem guardados só para reassociação)"""
+        return {pid: person for pid, person in self.tracked_persons.items() if self.is_active(person)}
+    
+    def predict(self) -> Dict[str, TrackedPerson]:
+        """Propagar os tracks ativos um frame sem detecção (modo detectar a cada N frames)"""
+        try:
+            for person in self.active_persons().values():
+                if person.kalman is None:
+                    continue
+                if person.predicted_frames < self.max_predicted_frames:
+                    person.predict_position()
+                else:
+                    # Limite atingido: para de extrapolar e sai dos tracks ativos
+                    person.predicted_frames += 1
+            
+            self._cleanup_disappeared_persons(time.time())
+            return self.tracked_persons.copy()
+            
+        except Exception as e:
+            logger.error(f"Erro na predição do tracking: {e}")
+            return self.tracked_persons.copy()
+    
+    def get_track_detections(self) -> List[Dict[str, Any]]:
+        """Converter posições atuais dos tracks ativos em detecções (mesmo formato do detector)"""
+        detections = []
         
-        # Calcular distâncias entre todas as detecções e pessoas tracked
-        distances = {}
-        for person_id, person in self.tracked_persons.items():
+        for person_id, person in self.active_persons().items():
             if not person.positions:
                 continue
-                
-            last_pos = person.positions[-1]
             
-            for det_idx, center in enumerate(centers):
-                dist = self._calculate_distance(last_pos, center)
-                if dist <= self.max_distance:
-                    distances[(person_id, det_idx)] = dist
+            center_x, center_y = person.positions[-1]
+            width, height = person.size
+            
+            detections.append({
+                'bbox': [int(center_x - width / 2), int(center_y - height / 2),
+                         int(center_x + width / 2), int(center_y + height / 2)],
+                'center': [int(center_x), int(center_y)],
+                'confidence': float(person.confidence_history[-1]) if person.confidence_history else 0.0,
+                'width': int(width),
+                'height': int(height),
+                'area': int(width * height),
+                'class': 'person',
+                'track_id': person_id,
+                'predicted': person.predicted_frames > 0
+            })
         
-        # Resolver associações usando algoritmo greedy simples
-        matched = {}
-        used_detections = set()
+        return detections
+    
+    def _associate_detections(self, centers: List[Tuple[int, int]], 
+                            confidences: List[float]) -> Tuple[Dict[str, Tuple[int, float]], List[int]]:
+        """Associar detecções com pessoas já tracked (atribuição ótima - algoritmo húngaro)"""
+        person_ids = [pid for pid, person in self.tracked_persons.items() if person.positions]
+        if not person_ids or not centers:
+            return {}, list(range(len(centers)))
+        
+        # Matriz de custo (tracks x detecções) com distâncias euclidianas
+        track_positions = np.array([self.tracked_persons[pid].expected_position for pid in person_ids], dtype=np.float64)
+        detection_positions = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        cost = cdist(track_positions, detection_positions)
         
-        # Ordenar por distância
-        sorted_distances = sorted(distances.items(), key=lambda x: x[1])
+        # Gating: pares além de max_distance nunca podem ser associados
+        gated = cost > self.max_distance
+        cost[gated] = self.max_distance * 1e3
         
-        for (person_id, det_idx), distance in sorted_distances:
-            if person_id not in matched and det_idx not in used_detections:
-                matched[person_id] = (det_idx, distance)
-                used_detections.add(det_idx)
+        rows, cols = linear_sum_assignment(cost)
+        
+        matched = {}
+        for row, col in zip(rows, cols):
+            if not gated[row, col]:
+                matched[person_ids[row]] = (int(col), float(cost[row, col]))
         
         # Detecções não matched
+        used_detections = {det_idx for det_idx, _ in matched.values()}
         unmatched = [i for i in range(len(centers)) if i not in used_detections]
         
         return matched, unmatched
     
+    def _create_person(self, center: Tuple[int, int], confidence: float,
+                       size: Tuple[int, int], current_time: float) -> str:
+        """Iniciar um novo track"""
+        person_id = self._generate_person_id()
+        
+        self.tracked_persons[person_id] = TrackedPerson(
+            id=person_id,
+            positions=deque([center], maxlen=10),
+            last_seen=current_time,
+            confidence_history=deque([confidence], maxlen=10),
+            size=size
+        )
+        
+        logger.debug(f"Nova pessoa tracked: {person_id}")
+        return person_id
+    
     def _calculate_distance(self, pos1: Tuple[int, int], pos2: Tuple[int, int]) -> float:
         """Calcular distância euclidiana entre duas posições"""
         return np.sqrt((pos1[0] - pos2[0])**2 + (pos1[1] - pos2[1])**2)
@@ -142,7 +330,7 @@ class PersonTracker:
     def _generate_person_id(self) -> str:
         """Gerar ID único para nova pessoa"""
         self.next_id += 1
-        return f"person_{self.next_id:04d}"
+        return f"{self.id_prefix}_{self.next_id:04d}"
     
     def check_line_crossings(self, line_position: float, frame_height: int = None) -> List[Dict[str, Any]]:
         """Verificar cruzamentos da linha de contagem"""
@@ -156,12 +344,13 @@ class PersonTracker:
             line_y = int(frame_height * line_position)
             
             for person_id, person in self.tracked_persons.items():
-                if len(person.positions) < 2:
+                # Só posições medidas contam: posição extrapolada pelo Kalman não gera cruzamento
+                if person.predicted_frames or person.missed_detections or person.previous_measured is None:
                     continue
                 
                 # Verificar se a pessoa cruzou a linha
-                prev_pos = person.positions[-2]
-                curr_pos = person.positions[-1]
+                prev_pos = person.previous_measured
+                curr_pos = person.last_measured
                 
                 crossed, direction = self._check_line_crossing(
                     prev_pos, curr_pos, line_y
@@ -295,4 +484,162 @@ class PersonTracker:
             
         except Exception as e:
             logger.error(f"Erro ao desenhar tracks: {e}")
-            return frame
\ No newline at end of file
+            return frame
+
+
+class ByteTracker(PersonTracker):
+    """
+    Tracker no estilo ByteTrack: associação por IoU em dois estágios
+    (detecções de alta confiança primeiro, depois as de baixa confiança
+    contra os tracks que sobraram) sobre a bbox prevista pelo Kalman.
+    IoU não depende da resolução da câmera, ao contrário da distância em pixels.
+    Mesma API do PersonTracker (update, predict, check_line_crossings...).
+    """
+    
+    def __init__(self, max_disappeared: int = 30, max_distance: float = 50.0,
+                 high_threshold: float = 0.5, low_threshold: float = 0.1,
+                 match_iou: float = 0.2, low_match_iou: float = 0.5, track_buffer: int = 30,
+                 max_predicted_frames: int = 10):
+        super().__init__(max_disappeared=max_disappeared, max_distance=max_distance,
+                         max_predicted_frames=max_predicted_frames)
+        self.high_threshold = high_threshold
+        self.low_threshold = low_threshold
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.track_buffer = track_buffer
+    
+    def update(self, detections: List[Dict[str, Any]]) -> Dict[str, TrackedPerson]:
+        """Atualizar tracker com novas detecções (associação em dois estágios, anota 'track_id')"""
+        try:
+            current_time = time.time()
+            
+            # Avançar o Kalman de todos os tracks para o frame atual
+            for person in self.tracked_persons.values():
+                if person.kalman is not None:
+                    person.kalman.predict()
+            
+            detections = [det for det in detections if det['confidence'] >= self.low_threshold]
+            high = [i for i, det in enumerate(detections) if det['confidence'] >= self.high_threshold]
+            low = [i for i, det in enumerate(detections) if det['confidence'] < self.high_threshold]
+            
+            person_ids = [pid for pid, person in self.tracked_persons.items() if person.positions]
+            
+            # Estágio 1: detecções de alta confiança contra todos os tracks
+            matched, remaining_tracks, unmatched_high = self._match_iou(
+                person_ids, detections, high, self.match_iou
+            )
+            
+            # Estágio 2: detecções de baixa confiança (oclusões) contra os tracks restantes
+            matched_low, remaining_tracks, _ = self._match_iou(
+                remaining_tracks, detections, low, self.low_match_iou
+            )
+            matched.update(matched_low)
+            
+            for person_id, det_idx in matched.items():
+                det = detections[det_idx]
+                self.tracked_persons[person_id].update_position(
+                    tuple(det['center']), det['confidence'], (det.get('width', 0), det.get('height', 0))
+                )
+                det['track_id'] = person_id
+            
+            for person_id in remaining_tracks:
+                self.tracked_persons[person_id].predicted_frames += 1
+                self.tracked_persons[person_id].missed_detections += 1
+            
+            # Novos tracks apenas a partir de detecções de alta confiança
+            for det_idx in unmatched_high:
+                det = detections[det_idx]
+                det['track_id'] = self._create_person(
+                    tuple(det['center']), det['confidence'],
+                    (det.get('width', 0), det.get('height', 0)), current_time
+                )
+            
+            self._cleanup_disappeared_persons(current_time)
+            
+            return self.tracked_persons.copy()
+            
+        except Exception as e:
+            logger.error(f"Erro no tracking (bytetrack): {e}")
+            return self.tracked_persons.copy()
+    
+    def _match_iou(self, person_ids: List[str], detections: List[Dict[str, Any]],
+                   det_indices: List[int], min_iou: float) -> Tuple[Dict[str, int], List[str], List[int]]:
+        """Atribuição ótima por IoU entre tracks e um subconjunto de detecções"""
+        if not person_ids or not det_indices:
+            return {}, list(person_ids), list(det_indices)
+        
+        track_boxes = np.array([self._predicted_box(self.tracked_persons[pid]) for pid in person_ids], dtype=np.float64)
+        det_boxes = np.array([detections[i]['bbox'] for i in det_indices], dtype=np.float64)
+        iou = self._iou_matrix(track_boxes, det_boxes)
+        
+        rows, cols = linear_sum_assignment(1.0 - iou)
+        
+        matched = {}
+        for row, col in zip(rows, cols):
+            if iou[row, col] >= min_iou:
+                matched[person_ids[row]] = det_indices[col]
+        
+        used = set(matched.values())
+        remaining_tracks = [pid for pid in person_ids if pid not in matched]
+        unmatched_dets = [i for i in det_indices if i not in used]
+        return matched, remaining_tracks, unmatched_dets
+    
+    @staticmethod
+    def _predicted_box(person: TrackedPerson) -> List[float]:
+        """Bbox do track centrada na posição prevista pelo Kalman"""
+        center_x, center_y = person.expected_position
+        width, height = person.size
+        return [center_x - width / 2, center_y - height / 2, center_x + width / 2, center_y + height / 2]
+    
+    @staticmethod
+    def _iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+        """IoU entre todos os pares de caixas (x1, y1, x2, y2)"""
+        x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+        y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+        x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+        y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+        
+        intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+        area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+        union = area_a[:, None] + area_b[None, :] - intersection
+        
+        return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+    
+    def _cleanup_disappeared_persons(self, current_time: float):
+        """Remover tracks perdidos há mais de track_buffer frames (ou max_disappeared segundos)"""
+        for person_id in [pid for pid, person in self.tracked_persons.items()
+                          if person.predicted_frames > self.track_buffer]:
+            logger.debug(f"Removendo pessoa perdida: {person_id}")
+            del self.tracked_persons[person_id]
+        
+        super()._cleanup_disappeared_persons(current_time)
+
+# Engines de tracking disponíveis (TRACKER_ENGINE)
+TRACKER_ENGINES = {
+    'centroid': PersonTracker,
+    'bytetrack': ByteTracker
+}
+
+def create_tracker(engine: str = "centroid", **kwargs) -> PersonTracker:
+    """Criar o tracker do engine configurado"""
+    if engine not in TRACKER_ENGINES:
+        logger.warning(f"⚠️ Engine de tracking desconhecido '{engine}', usando centroid")
+        engine = 'centroid'
+    
+    tracker_class = TRACKER_ENGINES[engine]
+    if tracker_class is PersonTracker:
+        kwargs = {k: v for k, v in kwargs.items() if k in ('max_disappeared', 'max_distance', 'max_predicted_frames')}
+    
+    return tracker_class(**kwargs)
+
+def detector_confidence(engine: str, confidence: float, low_threshold: float) -> float:
+    """
+    Limiar de confiança do detector para o engine de tracking
+    O bytetrack associa as detecções de baixa confiança no 2º estágio, então o detector
+    precisa emiti-las: o limiar desce até low_threshold. Detecções que não casam com
+    nenhum track ficam sem track_id e são descartadas pelo pipeline.
+    """
+    if engine == 'bytetrack':
+        return min(confidence, low_threshold)
+    return confidence
@@ -25,10 +25,10 @@ from dotenv import load_dotenv
 
 # Importar módulos locais
 from core.config import settings
-from core.database import SupabaseManager
 from core.detector import YOLOPersonDetector
-from core.tracker import PersonTracker
+from core.tracker import detector_confidence
 from core.websocket_manager import WebSocketManager
+from core.pipeline_state import DETECTED, GATED
 from models.api_models import *
 from utils.helpers import *
 
@@ -41,50 +41,62 @@ load_dotenv()
 
 # Managers globais
 supabase_manager = None
+event_writer = None
 detector = None
-tracker = None
+pipelines = None
 websocket_manager = WebSocketManager()
 smart_engine = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle management para inicializar/limpar recursos"""
-    global supabase_manager, detector, tracker, smart_engine
+    global supabase_manager, event_writer, detector, pipelines, smart_engine
     
     logger.info("🚀 Iniciando Shop Flow Backend com Smart Analytics...")
     
     try:
-        # Inicializar Supabase
-        supabase_manager = SupabaseManager(
-            url=settings.SUPABASE_URL,
-            key=settings.SUPABASE_SERVICE_KEY
-        )
+        # Inicializar Supabase (cliente único com pool keep-alive, compartilhado via core.app_state)
+        from core.app_state import create_database, set_database
+        supabase_manager = create_database()
         await supabase_manager.initialize()
+        set_database(supabase_manager)
         logger.success("✅ Supabase conectado")
         
+        # Write-behind de eventos (inserts em lote, spill em disco se o banco cair)
+        from core.app_state import create_event_writer, set_event_writer
+        event_writer = create_event_writer(supabase_manager)
+        await event_writer.start()
+        set_event_writer(event_writer)
+        
         # Inicializar detector YOLO
         detector = YOLOPersonDetector(
             model_path=settings.YOLO_MODEL,
-            confidence=settings.YOLO_CONFIDENCE
+            confidence=detector_confidence(settings.TRACKER_ENGINE, settings.YOLO_CONFIDENCE, settings.TRACKER_LOW_THRESHOLD),
+            iou=settings.YOLO_IOU,
+            max_batch_size=settings.YOLO_BATCH_SIZE,
+            max_batch_wait_ms=settings.YOLO_BATCH_TIMEOUT_MS,
+            inference_workers=settings.YOLO_INFERENCE_WORKERS,
+            torch_threads=settings.YOLO_TORCH_THREADS,
+            engine=settings.YOLO_ENGINE,
+            export_dir=settings.YOLO_EXPORT_DIR,
+            imgsz=settings.YOLO_IMGSZ,
+            calibration_dir=settings.YOLO_INT8_CALIBRATION_DIR or None
         )
         await detector.load_model()
         logger.success("✅ YOLOv8 carregado")
         
-        # Inicializar tracker
-        tracker = PersonTracker(
-            max_disappeared=settings.TRACKING_MAX_DISAPPEARED,
-            max_distance=settings.TRACKING_MAX_DISTANCE
-        )
-        logger.success("✅ Tracker inicializado")
-        
         # Inicializar Smart Analytics Engine
         smart_engine = SmartAnalyticsEngine(enable_face_recognition=True)
-        await smart_engine.initialize()
+        await smart_engine.initialize(db=supabase_manager, writer=event_writer)
         
         # Definir no estado global
-        from core.app_state import set_smart_engine
+        from core.app_state import set_smart_engine, get_pipelines
         set_smart_engine(smart_engine)
         
+        # Tracker, tracks comportamentais, heatmap e zonas por câmera (criados sob demanda)
+        pipelines = get_pipelines()
+        logger.success(f"✅ Pipelines por câmera prontos (tracker {settings.TRACKER_ENGINE})")
+        
         logger.success("✅ Smart Analytics Engine inicializado e registrado globalmente")
         
         # Criar diretórios necessários
@@ -102,6 +114,12 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("🔄 Finalizando backend...")
+    if detector:
+        await detector.close()
+    if smart_engine and smart_engine.face_manager:
+        smart_engine.face_manager.close()
+    if event_writer:
+        await event_writer.close()
     if supabase_manager:
         await supabase_manager.close()
     logger.info("✅ Backend finalizado")
@@ -153,7 +171,9 @@ async def receive_frame(frame_data: FrameData, background_tasks: BackgroundTasks
             raise HTTPException(status_code=400, detail="Frame inválido")
         
         # Processar frame com Smart Analytics em background
-        background_tasks.add_task(process_smart_frame, frame_array, frame_data.timestamp)
+        # Estado de pipeline por câmera (bridges antigos sem camera_id usam o bridge_id)
+        camera_id = frame_data.camera_id or frame_data.bridge_id
+        background_tasks.add_task(process_smart_frame, frame_array, frame_data.timestamp, camera_id)
         
         return {"status": "received", "timestamp": frame_data.timestamp}
         
@@ -214,10 +234,16 @@ async def health_check():
         if detector:
             health_status["services"]["detector"] = True
         
-        # Check tracker
-        if tracker:
+        # Check tracker (pipelines por câmera)
+        if pipelines:
             health_status["services"]["tracker"] = True
         
+        # Métricas do banco e do write-behind (fila, latência de flush, spill)
+        if supabase_manager:
+            health_status["database"] = supabase_manager.get_stats()
+        if event_writer:
+            health_status["event_writer"] = event_writer.get_stats()
+        
         # Overall status
         all_healthy = all(health_status["services"].values())
         health_status["status"] = "healthy" if all_healthy else "degraded"
@@ -473,7 +499,7 @@ async def health_check():
         "components": {
             "database": supabase_manager is not None,
             "detector": detector is not None and detector.model is not None,
-            "tracker": tracker is not None,
+            "tracker": pipelines is not None,
             "smart_engine": smart_engine is not None,
             "privacy_manager": privacy_manager is not None,
             "face_recognition": smart_engine.face_manager is not None if smart_engine else False,
@@ -512,40 +538,51 @@ async def get_today_stats():
 # FUNÇÕES DE PROCESSAMENTO INTELIGENTE
 # ============================================================================
 
-async def process_smart_frame(frame_array, timestamp: str):
+async def process_smart_frame(frame_array, timestamp: str, camera_id: str = "bridge"):
     """Processa frame com Smart Analytics Engine"""
     try:
-        # Detectar pessoas no frame
-        detections = await detector.detect_persons(frame_array)
-        
-        # Atualizar tracker
-        tracked_objects = tracker.update(detections)
+        state = pipelines.get(camera_id)
         
-        # Processar com Smart Analytics
-        if smart_engine:
-            timestamp_dt = datetime.fromisoformat(timestamp)
-            smart_metrics = await smart_engine.process_frame(frame_array, detections, timestamp_dt)
-        
-        # Verificar cruzamentos da linha
-        line_position = settings.LINE_POSITION / 100.0
-        crossings = tracker.check_line_crossings(line_position)
+        # Frames da mesma câmera em ordem; câmeras diferentes seguem em paralelo
+        async with state.lock:
+            state.touch()
+            
+            # Cadência + gate de movimento + detector (mesma etapa de /api/camera/process)
+            detections, source = await state.detect(frame_array, detector)
+            
+            if source == GATED:
+                # Cena estática e vazia: reaproveitar o último resultado
+                smart_metrics = state.motion_gate.last_result
+            else:
+                smart_metrics = None
+                if smart_engine:
+                    timestamp_dt = datetime.fromisoformat(timestamp)
+                    smart_metrics = await smart_engine.process_frame(frame_array, detections, timestamp_dt, pipeline=state)
+                
+                if source == DETECTED and state.motion_gate:
+                    state.motion_gate.record_inference(detections, smart_metrics)
+            
+            # Verificar cruzamentos da linha
+            line_position = settings.LINE_POSITION / 100.0
+            crossings = state.tracker.check_line_crossings(line_position)
         
         # Processar cada cruzamento
         for crossing in crossings:
+            crossing['camera_id'] = camera_id
             await handle_smart_crossing(crossing, timestamp, frame_array, smart_metrics if smart_engine else None)
             
         # Broadcast métricas via WebSocket
-        if smart_engine and smart_engine.last_metrics:
+        if smart_engine and state.last_metrics:
             metrics_message = {
                 'type': 'smart_metrics_update',
-                'data': smart_engine.last_metrics.__dict__,
+                'camera_id': camera_id,
+                'data': state.last_metrics.__dict__,
                 'timestamp': datetime.now().isoformat()
             }
             await websocket_manager.broadcast(json.dumps(metrics_message))
         
         # Cleanup periódico
-        if smart_engine:
-            pass  # Smart engine doesn't have cleanup_old_data method
+        await pipelines.evict_idle()
         privacy_manager.cleanup_old_audit_logs()
         
     except Exception as e:
@@ -582,14 +619,15 @@ async def handle_smart_crossing(crossing: Dict[str, Any], timestamp: str, frame_
         if settings.SAVE_SNAPSHOTS:
             snapshot_url = await save_snapshot(frame_array, person_id)
         
-        # Inserir evento no banco
-        await supabase_manager.insert_people_event(
+        # Enfileirar evento (gravado em lote pelo event writer)
+        event_writer.add_people_event(
             action=crossing['action'],
             person_tracking_id=person_id,
             confidence=crossing['confidence'],
             snapshot_url=snapshot_url,
             timestamp=timestamp,
-            metadata=metadata
+            metadata=metadata,
+            camera_id=crossing.get('camera_id')
         )
         
         # Log específico baseado em métricas inteligentes
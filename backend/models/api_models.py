@@ -27,6 +27,7 @@ class FrameData(BaseModel):
     frame_size: int = Field(..., description="Tamanho do frame em bytes")
     resolution: str = Field(..., description="Resolução do frame (e.g., '1920x1080')")
     bridge_id: str = Field(..., description="ID do bridge")
+    camera_id: Optional[str] = Field(None, description="ID da câmera (padrão: bridge_id)")
     metadata: Optional[Dict[str, Any]] = Field(default={}, description="Metadados adicionais")
 
 class HeartbeatData(BaseModel):
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Benchmark da camada de banco (core.database.SupabaseManager)
+
+Compara N inserts concorrentes em camera_events:
+- sync: cliente PostgREST síncrono chamado dentro de corrotinas (caminho antigo,
+  cada round trip bloqueia o event loop)
+- async: SupabaseManager (PostgREST assíncrono com pool keep-alive, limite de
+  concorrência e timeout)
+
+Além da vazão, mede o atraso do event loop com uma tarefa que dorme 5 ms em
+loop: é o atraso que frames e WebSockets sofreriam durante as queries.
+
+Sem --url, sobe um stand-in local do PostgREST (HTTP/1.1 keep-alive) que responde
+após --latency-ms. Com --url, usa um Supabase/PostgREST local de verdade
+(ex.: `supabase start` -> http://localhost:54321).
+
+Uso:
+    python scripts/benchmark_database.py
+    python scripts/benchmark_database.py --requests 400 --concurrency 32 --latency-ms 20
+    python scripts/benchmark_database.py --url http://localhost:54321 --key <service_key> --json db.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loguru import logger
+from postgrest import SyncPostgrestClient
+
+from core.database import SupabaseManager
+
+
+def start_stand_in(latency_ms: float) -> ThreadingHTTPServer:
+    """PostgREST mínimo: responde a qualquer tabela ecoando o corpo após a latência"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive
+        disable_nagle_algorithm = True
+
+        def _reply(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b'[]'
+            time.sleep(latency_ms / 1000)
+            rows = json.loads(body or b'[]')
+            payload = json.dumps(rows if isinstance(rows, list) else [rows]).encode()
+            self.send_response(201 if self.command == 'POST' else 200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = do_PATCH = _reply
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class LoopLagProbe:
+    """Tarefa que dorme `interval` em loop e registra o atraso de cada despertar"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+        self._last = 0.0
+
+    async def _run(self):
+        while True:
+            self._last = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append((time.perf_counter() - self._last - self.interval) * 1000)
+
+    def start(self):
+        self._last = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Despertar pendente (com o loop bloqueado o probe pode nem ter rodado)
+        self.lags.append(max(0.0, (time.perf_counter() - self._last - self.interval) * 1000))
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def summary(self):
+        lags = sorted(self.lags) or [0.0]
+        return {
+            'loop_lag_p50_ms': round(lags[len(lags) // 2], 2),
+            'loop_lag_max_ms': round(lags[-1], 2)
+        }
+
+
+def camera_event(i: int) -> dict:
+    return {
+        "camera_id": f"cam_{i % 8}",
+        "timestamp": datetime.now().isoformat(),
+        "people_count": i % 5,
+        "customers_count": i % 4,
+        "employees_count": 1,
+        "groups_count": 0,
+        "processing_time_ms": 12,
+        "frame_width": 1280,
+        "frame_height": 720,
+        "metadata": {}
+    }
+
+
+async def run_sync(url: str, key: str, requests: int, concurrency: int) -> dict:
+    """Caminho antigo: .execute() síncrono dentro de async def"""
+    client = SyncPostgrestClient(f"{url.rstrip('/')}/rest/v1",
+                                 headers={"apiKey": key, "Authorization": f"Bearer {key}"})
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def insert(i):
+        async with semaphore:
+            client.table("camera_events").insert(camera_event(i)).execute()
+
+    probe = LoopLagProbe()
+    probe.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(insert(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    await probe.stop()
+    client.aclose()
+    return {'seconds': round(elapsed, 3), 'rows_per_s': round(requests / elapsed, 1), **probe.summary()}
+
+
+async def run_async(url: str, key: str, requests: int, concurrency: int, timeout: float) -> dict:
+    """SupabaseManager assíncrono"""
+    db = SupabaseManager(url, key, max_connections=concurrency, max_keepalive_connections=concurrency,
+                         timeout=timeout, max_concurrency=concurrency)
+    if not await db.initialize():
+        raise RuntimeError("Falha ao inicializar SupabaseManager")
+
+    probe = LoopLagProbe()
+    probe.start()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        db.insert_camera_event(**camera_event(i)) for i in range(requests)
+    ))
+    elapsed = time.perf_counter() - start
+    await probe.stop()
+    stats = db.get_stats()
+    await db.close()
+    return {
+        'seconds': round(elapsed, 3),
+        'rows_per_s': round(requests / elapsed, 1),
+        'failed': sum(1 for r in results if not r),
+        'timeouts': stats['timeouts'],
+        **probe.summary()
+    }
+
+
+async def main_async(args) -> dict:
+    server = None
+    url, key = args.url, args.key
+    if not url:
+        server = start_stand_in(args.latency_ms)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        key = "stand-in"
+
+    results = {'requests': args.requests, 'concurrency': args.concurrency,
+               'target': args.url or f"stand-in ({args.latency_ms} ms)"}
+    try:
+        results['sync'] = await run_sync(url, key, args.requests, args.concurrency)
+        results['async'] = await run_async(url, key, args.requests, args.concurrency, args.timeout)
+    finally:
+        if server:
+            server.shutdown()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark da camada de banco (sync vs async)")
+    parser.add_argument('--url', help="URL do Supabase/PostgREST local (padrão: stand-in embutido)")
+    parser.add_argument('--key', default="", help="Service key (com --url)")
+    parser.add_argument('--requests', type=int, default=200, help="Inserts por caminho")
+    parser.add_argument('--concurrency', type=int, default=16, help="Inserts simultâneos")
+    parser.add_argument('--latency-ms', type=float, default=10.0, help="Latência do stand-in")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Timeout por query (async)")
+    parser.add_argument('--json', help="Salvar resultados em JSON")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = asyncio.run(main_async(args))
+
+    print(f"{args.requests} inserts, concorrência {args.concurrency}, alvo: {results['target']}\n")
+    print(f"{'caminho':>8} {'tempo (s)':>10} {'linhas/s':>10} {'lag p50 (ms)':>13} {'lag máx (ms)':>13}")
+    for path in ('sync', 'async'):
+        r = results[path]
+        print(f"{path:>8} {r['seconds']:>10.3f} {r['rows_per_s']:>10.1f} "
+              f"{r['loop_lag_p50_ms']:>13.2f} {r['loop_lag_max_ms']:>13.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados salvos em {args.json}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark do embedding DeepFace do PrivacyFirstFaceRegistry
+
+Compara, por face:
+- antes: crop gravado em arquivo temporário (cv2.imwrite) e relido pelo DeepFace
+- depois: array em memória com modelo/detector em cache (DeepFaceEmbedder)
+- depois em lote: todas as faces em um único predict
+
+Uso:
+    python scripts/benchmark_deepface_embedding.py --images faces/*.jpg
+    python scripts/benchmark_deepface_embedding.py --images faces/*.jpg --batch 8 --repeats 5 --json deepface.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def load_registry_module():
+    """Carregar o módulo pelo caminho (core/ai/face_recognition.py oculta o diretório homônimo)"""
+    path = BACKEND_DIR / "core" / "ai" / "face_recognition" / "privacy_first_face_registry.py"
+    spec = importlib.util.spec_from_file_location("privacy_first_face_registry", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_embedding(DeepFace, face_region: np.ndarray, model_name: str) -> Optional[np.ndarray]:
+    """Caminho anterior: arquivo temporário + DeepFace.represent"""
+    with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
+        cv2.imwrite(tmp_file.name, face_region)
+        tmp_path = tmp_file.name
+    try:
+        result = DeepFace.represent(img_path=tmp_path, model_name=model_name,
+                                    enforce_detection=False, detector_backend='mtcnn')
+        return np.array(result[0]['embedding']) if result else None
+    finally:
+        os.unlink(tmp_path)
+
+
+def time_per_face(fn, faces: List[np.ndarray], repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(faces)
+    return (time.perf_counter() - start) * 1000 / (repeats * len(faces))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do embedding DeepFace (arquivo temporário vs memória)")
+    parser.add_argument('--images', nargs='+', required=True, help="Crops de faces (jpg/png)")
+    parser.add_argument('--batch', type=int, default=8, help="Faces por lote")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--json', help="Salvar resultados em JSON")
+    args = parser.parse_args()
+
+    registry_module = load_registry_module()
+    DeepFace = registry_module.DeepFace
+    if DeepFace is None:
+        print("DeepFace não instalado")
+        return 1
+
+    faces = [img for img in (cv2.imread(path) for path in args.images) if img is not None]
+    if not faces:
+        print("Nenhuma imagem válida")
+        return 1
+    faces = (faces * (args.batch // len(faces) + 1))[:args.batch]
+
+    embedder = registry_module.DeepFaceEmbedder()
+    embedder.warmup()
+    legacy_embedding(DeepFace, faces[0], embedder.model_name)  # Aquecer o caminho antigo também
+
+    results = {
+        'faces': len(faces),
+        'legacy_tempfile_ms': time_per_face(
+            lambda batch: [legacy_embedding(DeepFace, face, embedder.model_name) for face in batch], faces, args.repeats),
+        'in_memory_ms': time_per_face(
+            lambda batch: [embedder.represent_batch([face], enforce_detection=False) for face in batch], faces, args.repeats),
+        'in_memory_batch_ms': time_per_face(
+            lambda batch: embedder.represent_batch(batch, enforce_detection=False), faces, args.repeats)
+    }
+
+    print(f"Faces por lote: {len(faces)} ({args.repeats} repetições)\n")
+    print(f"{'caminho':>20} {'ms/face':>9}")
+    for key in ('legacy_tempfile_ms', 'in_memory_ms', 'in_memory_batch_ms'):
+        results[key] = round(results[key], 2)
+        print(f"{key[:-3]:>20} {results[key]:>9.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados salvos em {args.json}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
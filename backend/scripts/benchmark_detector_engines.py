@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos engines de detecção (torch, onnx, openvino)
+
+Executa o YOLOPersonDetector com cada engine sobre um clipe gravado e compara:
+- FPS (inferência frame a frame)
+- mAP@0.5 e mAP@0.5:0.95 contra uma referência
+
+Sem anotações manuais, a referência é a saída do engine torch (FP32) - o mAP
+mede então o quanto cada engine reproduz o modelo original.
+
+Uso:
+    python scripts/benchmark_detector_engines.py --clip gravacao.mp4
+    python scripts/benchmark_detector_engines.py --clip gravacao.mp4 --engines torch,onnx --max-frames 200
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Any
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.config import settings
+from core.detector import YOLOPersonDetector, SUPPORTED_ENGINES
+
+
+def read_clip(clip_path: str, max_frames: int, stride: int) -> List[np.ndarray]:
+    """Ler frames do clipe (com salto opcional entre frames)"""
+    cap = cv2.VideoCapture(clip_path)
+    frames = []
+    index = 0
+    
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % stride == 0:
+            frames.append(frame)
+        index += 1
+    
+    cap.release()
+    return frames
+
+
+def box_iou(box: List[int], boxes: np.ndarray) -> np.ndarray:
+    """IoU entre uma caixa e um conjunto de caixas (x1, y1, x2, y2)"""
+    if len(boxes) == 0:
+        return np.zeros(0)
+    
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+
+def average_precision(predictions: List[List[Dict]], references: List[List[Dict]], iou_threshold: float) -> float:
+    """AP (interpolação em todos os pontos) da classe pessoa"""
+    total_references = sum(len(refs) for refs in references)
+    if total_references == 0:
+        return 1.0 if sum(len(p) for p in predictions) == 0 else 0.0
+    
+    scored = []
+    for frame_idx, preds in enumerate(predictions):
+        for pred in preds:
+            scored.append((pred['confidence'], frame_idx, pred['bbox']))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    
+    reference_boxes = [np.array([r['bbox'] for r in refs], dtype=np.float32).reshape(-1, 4) for refs in references]
+    matched = [np.zeros(len(refs), dtype=bool) for refs in references]
+    
+    true_positives = np.zeros(len(scored))
+    for i, (_, frame_idx, bbox) in enumerate(scored):
+        ious = box_iou(bbox, reference_boxes[frame_idx])
+        if len(ious) == 0:
+            continue
+        best = int(np.argmax(ious))
+        if ious[best] >= iou_threshold and not matched[frame_idx][best]:
+            matched[frame_idx][best] = True
+            true_positives[i] = 1
+    
+    cumulative_tp = np.cumsum(true_positives)
+    recall = cumulative_tp / total_references
+    precision = cumulative_tp / np.arange(1, len(scored) + 1)
+    
+    # Envelope da precisão e integração na recall
+    recall = np.concatenate(([0.0], recall, [1.0]))
+    precision = np.concatenate(([1.0], precision, [0.0]))
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    
+    return float(np.sum((recall[1:] - recall[:-1]) * precision[1:]))
+
+
+async def run_engine(engine: str, frames: List[np.ndarray], args) -> Dict[str, Any]:
+    """Carregar detector com o engine e medir FPS sobre os frames"""
+    detector = YOLOPersonDetector(
+        model_path=args.model,
+        confidence=args.confidence,
+        iou=settings.YOLO_IOU,
+        engine=engine,
+        export_dir=settings.YOLO_EXPORT_DIR,
+        imgsz=args.imgsz
+    )
+    
+    load_start = time.perf_counter()
+    await detector.load_model()
+    load_time = time.perf_counter() - load_start
+    
+    # Aquecimento fora da medição
+    for frame in frames[:args.warmup]:
+        await detector.detect_persons(frame)
+    
+    detections = []
+    start = time.perf_counter()
+    for frame in frames:
+        detections.append(await detector.detect_persons(frame))
+    elapsed = time.perf_counter() - start
+    
+    await detector.close()
+    
+    return {
+        'engine': engine,
+        'load_time_s': round(load_time, 2),
+        'fps': round(len(frames) / elapsed, 2) if elapsed > 0 else 0.0,
+        'ms_per_frame': round(elapsed / len(frames) * 1000, 2),
+        'detections': detections
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Benchmark de engines do detector de pessoas')
+    parser.add_argument('--clip', required=True, help='Vídeo gravado da câmera')
+    parser.add_argument('--engines', default=','.join(SUPPORTED_ENGINES), help='Engines separados por vírgula')
+    parser.add_argument('--reference', default='torch', help='Engine usado como referência para o mAP')
+    parser.add_argument('--model', default=settings.YOLO_MODEL, help='Modelo YOLO (.pt)')
+    parser.add_argument('--confidence', type=float, default=0.25, help='Confiança mínima (baixa para curva PR completa)')
+    parser.add_argument('--imgsz', type=int, default=settings.YOLO_IMGSZ)
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--stride', type=int, default=1, help='Usar 1 a cada N frames do clipe')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--json', help='Salvar resultados em arquivo JSON')
+    args = parser.parse_args()
+    
+    frames = read_clip(args.clip, args.max_frames, args.stride)
+    if not frames:
+        print(f"Nenhum frame lido de {args.clip}")
+        return 1
+    
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()]
+    if args.reference not in engines:
+        engines.insert(0, args.reference)
+    
+    print(f"Clipe: {args.clip} ({len(frames)} frames, {frames[0].shape[1]}x{frames[0].shape[0]})")
+    
+    results = {}
+    for engine in engines:
+        print(f"→ {engine}...")
+        results[engine] = await run_engine(engine, frames, args)
+    
+    reference = results[args.reference]['detections']
+    iou_thresholds = np.arange(0.5, 0.96, 0.05)
+    
+    print()
+    print(f"{'engine':<10} {'fps':>8} {'ms/frame':>10} {'load (s)':>9} {'mAP@.5':>8} {'mAP@.5:.95':>11} {'dets':>7}")
+    summary = []
+    for engine, result in results.items():
+        ap50 = average_precision(result['detections'], reference, 0.5)
+        ap = float(np.mean([average_precision(result['detections'], reference, t) for t in iou_thresholds]))
+        total_dets = sum(len(d) for d in result['detections'])
+        
+        print(f"{engine:<10} {result['fps']:>8.2f} {result['ms_per_frame']:>10.2f} {result['load_time_s']:>9.2f} "
+              f"{ap50:>8.3f} {ap:>11.3f} {total_dets:>7}")
+        
+        summary.append({
+            'engine': engine,
+            'fps': result['fps'],
+            'ms_per_frame': result['ms_per_frame'],
+            'load_time_s': result['load_time_s'],
+            'map50': round(ap50, 4),
+            'map50_95': round(ap, 4),
+            'total_detections': total_dets
+        })
+    
+    print(f"\nReferência do mAP: {args.reference}")
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'clip': args.clip, 'frames': len(frames), 'reference': args.reference, 'results': summary}, f, indent=2)
+        print(f"Resultados salvos em {args.json}")
+    
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark da associação detecção -> track do PersonTracker
+
+Compara a associação atual (matriz de custo + algoritmo húngaro) com a
+versão greedy anterior (dict de distâncias + ordenação) em cenas sintéticas
+com muitas pessoas simultâneas. Mede:
+- Latência média por chamada de _associate_detections
+- Associações erradas (track ligado à detecção de outra pessoa)
+
+Uso:
+    python scripts/benchmark_tracker_association.py
+    python scripts/benchmark_tracker_association.py --people 50,100,200 --repeats 200
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.tracker import PersonTracker, TrackedPerson
+
+
+def greedy_associate(tracker: PersonTracker, centers: List[Tuple[int, int]]) -> Dict[str, Tuple[int, float]]:
+    """Implementação anterior (greedy) usada como baseline"""
+    distances = {}
+    for person_id, person in tracker.tracked_persons.items():
+        last_pos = person.expected_position
+        for det_idx, center in enumerate(centers):
+            dist = np.sqrt((last_pos[0] - center[0])**2 + (last_pos[1] - center[1])**2)
+            if dist <= tracker.max_distance:
+                distances[(person_id, det_idx)] = dist
+
+    matched = {}
+    used_detections = set()
+    for (person_id, det_idx), distance in sorted(distances.items(), key=lambda x: x[1]):
+        if person_id not in matched and det_idx not in used_detections:
+            matched[person_id] = (det_idx, distance)
+            used_detections.add(det_idx)
+
+    return matched
+
+
+def build_scene(people: int, width: int, height: int, jitter: float, rng: np.random.Generator):
+    """Criar tracker com N pessoas e as detecções do frame seguinte (embaralhadas)"""
+    tracker = PersonTracker(max_distance=50.0)
+    positions = rng.uniform([0, 0], [width, height], size=(people, 2))
+
+    for i, (x, y) in enumerate(positions):
+        person_id = f"person_{i:04d}"
+        tracker.tracked_persons[person_id] = TrackedPerson(
+            id=person_id,
+            positions=deque([(int(x), int(y))], maxlen=10),
+            last_seen=time.time(),
+            confidence_history=deque([0.9], maxlen=10)
+        )
+
+    moved = positions + rng.normal(0, jitter, size=positions.shape)
+    order = rng.permutation(people)
+    centers = [(int(x), int(y)) for x, y in moved[order]]
+
+    # Ground truth: detecção -> track de origem
+    truth = {f"person_{src:04d}": det_idx for det_idx, src in enumerate(order)}
+    return tracker, centers, truth
+
+
+def count_errors(matched: Dict[str, Tuple[int, float]], truth: Dict[str, int]) -> int:
+    """Associações que ligam um track à detecção de outra pessoa"""
+    return sum(1 for person_id, (det_idx, _) in matched.items() if truth[person_id] != det_idx)
+
+
+def time_call(func, repeats: int) -> float:
+    """Latência média em ms"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da associação do PersonTracker')
+    parser.add_argument('--people', default='10,50,100,200', help='Números de pessoas simultâneas (separados por vírgula)')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--jitter', type=float, default=12.0, help='Desvio padrão do deslocamento entre frames (px)')
+    parser.add_argument('--repeats', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Salvar resultados em arquivo JSON')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    summary = []
+
+    print(f"{'pessoas':>8} {'greedy ms':>10} {'húngaro ms':>11} {'speedup':>8} {'erros greedy':>13} {'erros húngaro':>14}")
+    for people in [int(p) for p in args.people.split(',')]:
+        tracker, centers, truth = build_scene(people, args.width, args.height, args.jitter, rng)
+        confidences = [0.9] * len(centers)
+
+        greedy_ms = time_call(lambda: greedy_associate(tracker, centers), args.repeats)
+        hungarian_ms = time_call(lambda: tracker._associate_detections(centers, confidences), args.repeats)
+
+        greedy_errors = count_errors(greedy_associate(tracker, centers), truth)
+        hungarian_errors = count_errors(tracker._associate_detections(centers, confidences)[0], truth)
+
+        row = {
+            'people': people,
+            'greedy_ms': round(greedy_ms, 3),
+            'hungarian_ms': round(hungarian_ms, 3),
+            'speedup': round(greedy_ms / hungarian_ms, 2) if hungarian_ms else None,
+            'greedy_errors': greedy_errors,
+            'hungarian_errors': hungarian_errors
+        }
+        summary.append(row)
+        print(f"{people:>8} {row['greedy_ms']:>10.3f} {row['hungarian_ms']:>11.3f} {row['speedup']:>7.1f}x "
+              f"{greedy_errors:>13} {hungarian_errors:>14}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'jitter': args.jitter, 'repeats': args.repeats, 'results': summary}, f, indent=2)
+        print(f"Resultados salvos em {args.json}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Benchmark de replay dos engines de tracking (centroid, bytetrack)
+
+Reproduz uma sequência de detecções frame a frame em cada engine e mede:
+- Trocas de ID (ID switches): quantas vezes a mesma pessoa real muda de track
+- Tracks criados (fragmentação: ideal = número de pessoas reais)
+- Custo por frame de update() em ms
+
+Fontes de detecções:
+- Sintética (padrão): pessoas andando em linha reta com ruído, cruzamentos,
+  oclusões (confiança baixa) e falhas de detecção. --scale simula câmeras
+  de resolução maior (o centroid usa distância fixa em pixels).
+- Replay (--replay): arquivo JSONL, uma linha por frame:
+  {"detections": [{"bbox": [x1, y1, x2, y2], "confidence": 0.9, "gt_id": 3}, ...]}
+  gt_id é opcional; sem ele as trocas de ID não são calculadas.
+
+Uso:
+    python scripts/benchmark_tracker_replay.py
+    python scripts/benchmark_tracker_replay.py --people 40 --frames 600 --scale 2
+    python scripts/benchmark_tracker_replay.py --replay deteccoes.jsonl
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loguru import logger
+
+from core.config import settings
+from core.tracker import TRACKER_ENGINES, create_tracker
+
+
+def make_detection(bbox: List[float], confidence: float, gt_id: Optional[int] = None) -> Dict[str, Any]:
+    """Montar detecção no formato do YOLOPersonDetector"""
+    x1, y1, x2, y2 = [int(v) for v in bbox]
+    detection = {
+        'bbox': [x1, y1, x2, y2],
+        'center': [(x1 + x2) // 2, (y1 + y2) // 2],
+        'confidence': float(confidence),
+        'width': x2 - x1,
+        'height': y2 - y1,
+        'area': (x2 - x1) * (y2 - y1),
+        'class': 'person'
+    }
+    if gt_id is not None:
+        detection['gt_id'] = gt_id
+    return detection
+
+
+def synthetic_sequence(people: int, frames: int, scale: float, seed: int) -> List[List[Dict[str, Any]]]:
+    """Gerar sequência sintética com ground truth (gt_id)"""
+    rng = np.random.default_rng(seed)
+    width, height = 1280 * scale, 720 * scale
+
+    starts = rng.integers(0, frames, size=people)
+    durations = rng.integers(frames // 4, frames // 2 + 1, size=people)
+    origins = rng.uniform([0, 0], [width, height], size=(people, 2))
+    velocities = rng.normal(0, 4 * scale, size=(people, 2))
+    sizes = np.column_stack([rng.uniform(40, 70, people), rng.uniform(110, 180, people)]) * scale
+
+    sequence = []
+    for frame in range(frames):
+        detections = []
+        for pid in range(people):
+            age = frame - starts[pid]
+            if age < 0 or age >= durations[pid]:
+                continue
+
+            # Falha de detecção
+            if rng.random() < 0.05:
+                continue
+
+            center = origins[pid] + velocities[pid] * age + rng.normal(0, 2 * scale, size=2)
+            if not (0 <= center[0] <= width and 0 <= center[1] <= height):
+                continue
+
+            # Oclusão parcial: confiança baixa
+            confidence = rng.uniform(0.15, 0.45) if rng.random() < 0.15 else rng.uniform(0.6, 0.95)
+            w, h = sizes[pid]
+            bbox = [center[0] - w / 2, center[1] - h / 2, center[0] + w / 2, center[1] + h / 2]
+            detections.append(make_detection(bbox, confidence, pid))
+
+        sequence.append(detections)
+
+    return sequence
+
+
+def load_replay(path: str) -> List[List[Dict[str, Any]]]:
+    """Ler detecções gravadas (JSONL, uma linha por frame)"""
+    sequence = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                frame = json.loads(line)
+                sequence.append([
+                    make_detection(det['bbox'], det['confidence'], det.get('gt_id'))
+                    for det in frame.get('detections', [])
+                ])
+    return sequence
+
+
+def assign_tracks(tracker, detections: List[Dict[str, Any]], max_gap: float) -> Dict[int, str]:
+    """Ligar cada pessoa real (gt_id) ao track mais próximo após o update"""
+    gt = [det for det in detections if 'gt_id' in det]
+    tracks = [(pid, person.positions[-1]) for pid, person in tracker.tracked_persons.items()
+              if person.positions and person.predicted_frames == 0]
+    if not gt or not tracks:
+        return {}
+
+    gt_centers = np.array([det['center'] for det in gt], dtype=np.float64)
+    track_centers = np.array([pos for _, pos in tracks], dtype=np.float64)
+    cost = np.linalg.norm(gt_centers[:, None, :] - track_centers[None, :, :], axis=2)
+    rows, cols = linear_sum_assignment(cost)
+
+    return {gt[r]['gt_id']: tracks[c][0] for r, c in zip(rows, cols) if cost[r, c] <= max_gap}
+
+
+def run_engine(engine: str, sequence: List[List[Dict[str, Any]]], args) -> Dict[str, Any]:
+    """Reproduzir a sequência em um engine"""
+    tracker = create_tracker(
+        engine,
+        max_disappeared=settings.TRACKING_MAX_DISAPPEARED,
+        max_distance=args.max_distance,
+        high_threshold=settings.TRACKER_HIGH_THRESHOLD,
+        low_threshold=settings.TRACKER_LOW_THRESHOLD,
+        match_iou=settings.TRACKER_MATCH_IOU,
+        track_buffer=settings.TRACKER_TRACK_BUFFER,
+        max_predicted_frames=settings.TRACKER_MAX_PREDICTED_FRAMES
+    )
+
+    # O centroid não tem 2º estágio: recebe só o que passaria no YOLO_CONFIDENCE
+    min_confidence = settings.TRACKER_LOW_THRESHOLD if engine == 'bytetrack' else args.detector_confidence
+
+    last_track: Dict[int, str] = {}
+    id_switches = 0
+    frame_times = []
+    track_ids = set()
+
+    for detections in sequence:
+        visible = [det for det in detections if det['confidence'] >= min_confidence]
+
+        start = time.perf_counter()
+        tracker.update(visible)
+        frame_times.append((time.perf_counter() - start) * 1000)
+
+        track_ids.update(tracker.tracked_persons.keys())
+
+        for gt_id, track_id in assign_tracks(tracker, visible, args.max_gap).items():
+            if gt_id in last_track and last_track[gt_id] != track_id:
+                id_switches += 1
+            last_track[gt_id] = track_id
+
+    times = np.array(frame_times) if frame_times else np.zeros(1)
+    return {
+        'engine': engine,
+        'frames': len(sequence),
+        'gt_people': len(last_track),
+        'tracks_created': len(track_ids),
+        'id_switches': id_switches,
+        'mean_ms': round(float(times.mean()), 3),
+        'p95_ms': round(float(np.percentile(times, 95)), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de replay dos engines de tracking')
+    parser.add_argument('--engines', default=','.join(TRACKER_ENGINES), help='Engines separados por vírgula')
+    parser.add_argument('--replay', help='Arquivo JSONL com detecções gravadas')
+    parser.add_argument('--people', type=int, default=30, help='Pessoas na sequência sintética')
+    parser.add_argument('--frames', type=int, default=500, help='Frames na sequência sintética')
+    parser.add_argument('--scale', type=float, default=1.0, help='Escala da resolução sintética (1 = 1280x720)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-distance', type=float, default=settings.TRACKING_MAX_DISTANCE)
+    parser.add_argument('--detector-confidence', type=float, default=settings.YOLO_CONFIDENCE,
+                        help='Confiança mínima das detecções entregues ao centroid')
+    parser.add_argument('--max-gap', type=float, default=30.0, help='Distância máxima (px) entre pessoa real e track')
+    parser.add_argument('--json', help='Salvar resultados em arquivo JSON')
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+
+    if args.replay:
+        sequence = load_replay(args.replay)
+        source = args.replay
+    else:
+        sequence = synthetic_sequence(args.people, args.frames, args.scale, args.seed)
+        source = f"sintético ({args.people} pessoas, {args.frames} frames, escala {args.scale})"
+        args.max_gap *= args.scale
+
+    print(f"Fonte: {source}")
+    print(f"{'engine':>10} {'pessoas':>8} {'tracks':>7} {'ID switches':>12} {'ms/frame':>9} {'p95 ms':>8}")
+
+    summary = []
+    for engine in args.engines.split(','):
+        result = run_engine(engine, sequence, args)
+        summary.append(result)
+        print(f"{engine:>10} {result['gt_people']:>8} {result['tracks_created']:>7} {result['id_switches']:>12} "
+              f"{result['mean_ms']:>9.3f} {result['p95_ms']:>8.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'source': source, 'results': summary}, f, indent=2)
+        print(f"Resultados salvos em {args.json}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Calibração INT8 do detector de pessoas
+
+Lê uma pasta de JPEGs amostrados das câmeras da loja, gera o modelo INT8
+estático em YOLO_EXPORT_DIR (usado com YOLO_ENGINE=onnx_int8) e emite um
+relatório de concordância de contagem de pessoas e velocidade contra o FP32.
+
+Uso:
+    python scripts/calibrate_int8_detector.py --images frames_calibracao/
+    python scripts/calibrate_int8_detector.py --images frames/ --max-images 500 --report int8_report.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.config import settings
+from core.detector import YOLOPersonDetector
+from core.detector_quantization import (
+    list_calibration_images,
+    quantize_detector_int8,
+    compare_detection_counts
+)
+
+
+async def detect_all(detector: YOLOPersonDetector, frames: List[np.ndarray]):
+    """Detectar em todos os frames e medir o tempo médio por frame"""
+    for frame in frames[:3]:
+        await detector.detect_persons(frame)
+    
+    detections = []
+    start = time.perf_counter()
+    for frame in frames:
+        detections.append(await detector.detect_persons(frame))
+    elapsed = time.perf_counter() - start
+    
+    return detections, elapsed / max(len(frames), 1) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Calibração INT8 do detector YOLO')
+    parser.add_argument('--images', required=True, help='Pasta com JPEGs das câmeras')
+    parser.add_argument('--max-images', type=int, default=300, help='Imagens usadas na calibração')
+    parser.add_argument('--eval-count', type=int, default=200, help='Imagens usadas no relatório')
+    parser.add_argument('--model', default=settings.YOLO_MODEL)
+    parser.add_argument('--imgsz', type=int, default=settings.YOLO_IMGSZ)
+    parser.add_argument('--force', action='store_true', help='Recalibrar mesmo com modelo INT8 em cache')
+    parser.add_argument('--report', help='Salvar relatório em arquivo JSON')
+    args = parser.parse_args()
+    
+    all_images = list_calibration_images(args.images)
+    calibration_images = set(list_calibration_images(args.images, args.max_images))
+    
+    # Avaliar preferencialmente em imagens fora do conjunto de calibração
+    eval_images = [p for p in all_images if p not in calibration_images] or all_images
+    eval_images = eval_images[:args.eval_count]
+    
+    fp32 = YOLOPersonDetector(
+        model_path=args.model,
+        confidence=settings.YOLO_CONFIDENCE,
+        iou=settings.YOLO_IOU,
+        engine='onnx',
+        export_dir=settings.YOLO_EXPORT_DIR,
+        imgsz=args.imgsz
+    )
+    await fp32.load_model()
+    
+    int8_path = fp32._engine_artifact_path('onnx_int8')
+    if args.force or not int8_path.exists():
+        quantize_detector_int8(fp32.model_source, args.images, str(int8_path), args.imgsz, args.max_images)
+    else:
+        print(f"Modelo INT8 já existe em {int8_path} (use --force para recalibrar)")
+    
+    int8 = YOLOPersonDetector(
+        model_path=args.model,
+        confidence=settings.YOLO_CONFIDENCE,
+        iou=settings.YOLO_IOU,
+        engine='onnx_int8',
+        export_dir=settings.YOLO_EXPORT_DIR,
+        imgsz=args.imgsz
+    )
+    await int8.load_model()
+    
+    frames = [f for f in (cv2.imread(str(p)) for p in eval_images) if f is not None]
+    fp32_detections, fp32_ms = await detect_all(fp32, frames)
+    int8_detections, int8_ms = await detect_all(int8, frames)
+    
+    await fp32.close()
+    await int8.close()
+    
+    agreement = compare_detection_counts(fp32_detections, int8_detections)
+    report = {
+        'model': args.model,
+        'int8_model': str(int8_path),
+        'calibration_images': len(calibration_images),
+        'evaluation_images': len(frames),
+        'fp32_ms_per_frame': round(fp32_ms, 2),
+        'int8_ms_per_frame': round(int8_ms, 2),
+        'speedup': round(fp32_ms / int8_ms, 2) if int8_ms > 0 else 0.0,
+        'count_agreement': agreement
+    }
+    
+    print()
+    print("Relatório INT8 vs FP32")
+    print(f"  Imagens de calibração:     {report['calibration_images']}")
+    print(f"  Imagens avaliadas:         {report['evaluation_images']}")
+    print(f"  FP32 (ms/frame):           {report['fp32_ms_per_frame']}")
+    print(f"  INT8 (ms/frame):           {report['int8_ms_per_frame']}")
+    print(f"  Speedup:                   {report['speedup']}x")
+    print(f"  Contagem idêntica:         {agreement.get('exact_agreement', 0) * 100:.1f}% dos frames")
+    print(f"  Diferença de até 1 pessoa: {agreement.get('within_one', 0) * 100:.1f}% dos frames")
+    print(f"  Erro absoluto médio:       {agreement.get('mean_abs_diff', 0)} pessoas/frame")
+    print(f"  Total FP32 / INT8:         {agreement.get('reference_total', 0)} / {agreement.get('candidate_total', 0)}")
+    print("\nAtive com YOLO_ENGINE=onnx_int8")
+    
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Relatório salvo em {args.report}")
+    
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
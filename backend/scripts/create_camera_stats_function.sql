@@ -0,0 +1,44 @@
+-- Agregação de camera_events no banco para o ShopFlow
+-- Execute este SQL no dashboard do Supabase (depois da tabela camera_events)
+--
+-- get_camera_stats devolve uma linha por câmera com as somas da janela pedida,
+-- em vez de o backend baixar todos os eventos e somar em Python.
+-- Usada por SupabaseManager.get_camera_stats (com fallback se a função não existir).
+
+CREATE OR REPLACE FUNCTION public.get_camera_stats(
+    p_since TIMESTAMPTZ,
+    p_camera_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    camera_id UUID,
+    events BIGINT,
+    people BIGINT,
+    customers BIGINT,
+    employees BIGINT,
+    processing_time_ms_sum BIGINT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        e.camera_id,
+        COUNT(*) AS events,
+        COALESCE(SUM(e.people_count), 0) AS people,
+        COALESCE(SUM(e.customers_count), 0) AS customers,
+        COALESCE(SUM(e.employees_count), 0) AS employees,
+        COALESCE(SUM(e.processing_time_ms), 0) AS processing_time_ms_sum
+    FROM public.camera_events e
+    WHERE e.timestamp >= p_since
+      AND (p_camera_id IS NULL OR e.camera_id = p_camera_id)
+    GROUP BY e.camera_id;
+$$;
+
+-- Índice usado pela janela de tempo (já criado pela migration de camera_events)
+CREATE INDEX IF NOT EXISTS idx_camera_events_timestamp ON public.camera_events(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_camera_events_camera_timestamp ON public.camera_events(camera_id, timestamp DESC);
+
+-- Permissões para chamada via PostgREST (rpc)
+GRANT EXECUTE ON FUNCTION public.get_camera_stats(TIMESTAMPTZ, UUID) TO anon, authenticated, service_role;
+
+-- Comentários para documentação
+COMMENT ON FUNCTION public.get_camera_stats(TIMESTAMPTZ, UUID) IS 'Somas de camera_events por câmera desde p_since (opcionalmente de uma câmera)';
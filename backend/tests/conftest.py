@@ -0,0 +1,8 @@
+"""
+Configuração do pytest: testes importam os módulos a partir de backend/
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
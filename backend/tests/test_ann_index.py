@@ -0,0 +1,150 @@
+"""
+Testes da EmbeddingGallery e dos índices ANN (recall do IVF, treino em segundo plano)
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from core.ai.ann_index import ANNIndex, BruteForceIndex, IVFFlatIndex, create_ann_index
+from core.ai.embedding_gallery import EmbeddingGallery
+
+
+def random_vectors(count, dim=64, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def test_gallery_matches_brute_force_distances():
+    vectors = random_vectors(50)
+    gallery = EmbeddingGallery()
+    for i, vector in enumerate(vectors):
+        gallery.add(f"id{i}", vector)
+
+    query = vectors[7] + 0.01
+    expected = np.linalg.norm(vectors - query, axis=1)
+
+    np.testing.assert_allclose(gallery.distances(query), expected, rtol=1e-4, atol=1e-4)
+    assert gallery.match(query, threshold=1.0)[0] == "id7"
+    assert gallery.match(query + 100, threshold=1.0)[0] is None
+
+
+def test_gallery_remove_swaps_last_row():
+    vectors = random_vectors(3)
+    gallery = EmbeddingGallery()
+    for i, vector in enumerate(vectors):
+        gallery.add(f"id{i}", vector)
+
+    assert gallery.remove("id0")
+    assert not gallery.remove("id0")
+    assert len(gallery) == 2
+    assert set(gallery.ids) == {"id1", "id2"}
+    np.testing.assert_array_equal(gallery.get("id2"), vectors[2])
+
+
+def test_gallery_cosine_normalizes():
+    gallery = EmbeddingGallery(metric="cosine")
+    gallery.add("a", np.array([3.0, 0.0]))
+
+    assert gallery.distances(np.array([10.0, 0.0]))[0] == pytest.approx(0.0, abs=1e-6)
+    assert gallery.distances(np.array([0.0, 1.0]))[0] == pytest.approx(1.0, abs=1e-6)
+
+
+def test_ann_index_is_abstract():
+    with pytest.raises(TypeError):
+        ANNIndex()
+
+
+def test_ivf_recall_against_brute_force():
+    vectors = random_vectors(3000)
+    ivf = IVFFlatIndex(min_train_size=1000, nprobe=8)
+    brute = BruteForceIndex()
+    for i, vector in enumerate(vectors):
+        ivf.add(f"id{i}", vector)
+        brute.add(f"id{i}", vector)
+
+    assert ivf.is_trained
+    queries = vectors[::30] + np.random.default_rng(1).normal(scale=0.05, size=vectors[::30].shape).astype(np.float32)
+    hits = sum(ivf.search(q, k=1)[0][0] == brute.search(q, k=1)[0][0] for q in queries)
+
+    assert hits / len(queries) >= 0.95
+
+
+def test_ivf_trains_in_background_inside_event_loop():
+    vectors = random_vectors(600)
+
+    async def run():
+        index = IVFFlatIndex(min_train_size=500)
+        for i, vector in enumerate(vectors[:500]):
+            index.add(f"id{i}", vector)
+
+        # Treino no executor: a estrutura atual continua servindo
+        assert index.is_training and not index.is_trained
+        assert index.search(vectors[3], k=1)[0][0] == "id3"
+
+        # Mudanças durante o treino são reaplicadas na troca
+        for i, vector in enumerate(vectors[500:], 500):
+            index.add(f"id{i}", vector)
+        index.remove("id10")
+
+        await index.wait_trained()
+        return index
+
+    index = asyncio.run(run())
+
+    assert index.is_trained and not index.is_training
+    assert len(index) == 599
+    assert "id10" not in index
+    assert "id550" in index
+    np.testing.assert_allclose(index.get("id550"), vectors[550], rtol=1e-6)
+
+
+def test_ivf_add_during_retrain_of_trained_index_survives_swap():
+    vectors = random_vectors(900)
+
+    async def run():
+        index = IVFFlatIndex(min_train_size=200, retrain_factor=4.0)
+        for i, vector in enumerate(vectors[:200]):
+            index.add(f"id{i}", vector)
+        await index.wait_trained()
+        assert index.is_trained
+
+        # Crescer até disparar o re-treino do índice já treinado
+        i = 200
+        while not index.is_training:
+            index.add(f"id{i}", vectors[i])
+            i += 1
+
+        # Atualização de um id existente e um id novo durante o re-treino
+        index.add("id5", vectors[899])
+        index.add("late", vectors[898])
+
+        await index.wait_trained()
+        return index, i
+
+    index, count = asyncio.run(run())
+
+    assert not index.is_training
+    assert len(index) == count + 1
+    np.testing.assert_allclose(index.get("id5"), vectors[899], rtol=1e-6)
+    np.testing.assert_allclose(index.get("late"), vectors[898], rtol=1e-6)
+    assert index.search(vectors[898], k=1)[0][0] == "late"
+
+
+def test_ivf_save_and_load_roundtrip(tmp_path):
+    vectors = random_vectors(40)
+    index = IVFFlatIndex(min_train_size=20)
+    for i, vector in enumerate(vectors):
+        index.add(f"id{i}", vector)
+
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = IVFFlatIndex(min_train_size=20)
+
+    assert loaded.load(path) == 40
+    assert loaded.search(vectors[5], k=1)[0][0] == "id5"
+
+
+def test_create_ann_index_falls_back_to_brute():
+    assert isinstance(create_ann_index("unknown"), BruteForceIndex)
+    assert isinstance(create_ann_index("ivf", nprobe=4), IVFFlatIndex)
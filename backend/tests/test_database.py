@@ -0,0 +1,20 @@
+"""
+Testes das linhas montadas pelo SupabaseManager para o EventWriter
+"""
+
+from core.database import SupabaseManager
+
+
+def test_people_event_row_sets_camera_id_only_for_registered_cameras():
+    camera_uuid = '6f1c2a9e-4b7d-4c1e-9a55-0d6b8e2f3a10'
+
+    row = SupabaseManager.people_event_row('ENTER', person_tracking_id='p1', camera_id=camera_uuid)
+    assert row['camera_id'] == camera_uuid
+    assert row['metadata']['camera_id'] == camera_uuid
+
+    # ID de bridge não referencia cameras(id): fica só em metadata
+    row = SupabaseManager.people_event_row('EXIT', person_tracking_id='p2', camera_id='bridge', metadata={'ai_enabled': True})
+    assert 'camera_id' not in row
+    assert row['metadata'] == {'ai_enabled': True, 'camera_id': 'bridge'}
+
+    assert 'camera_id' not in SupabaseManager.people_event_row('ENTER')
@@ -0,0 +1,220 @@
+"""
+Testes do EventWriter: agrupamento, retry, spill, dead letter e replay
+"""
+
+import asyncio
+import json
+import os
+
+from postgrest.exceptions import APIError
+
+from core.event_writer import EventWriter
+
+
+class FakeDB:
+    """Registra as chamadas; falhas configuráveis por tabela"""
+
+    def __init__(self):
+        self.client = object()
+        self.calls = []
+        self.transient_failures = 0  # Próximas N chamadas levantam timeout
+        self.rejected_tables = set()
+
+    async def _write(self, table, rows, on_conflict=None):
+        self.calls.append((table, on_conflict, [dict(row) for row in rows]))
+        if self.transient_failures:
+            self.transient_failures -= 1
+            raise TimeoutError("timeout")
+        if table in self.rejected_tables:
+            raise APIError({'code': '42P01', 'message': f'relation "{table}" does not exist'})
+        return len(rows)
+
+    async def insert_rows(self, table, rows):
+        return await self._write(table, rows)
+
+    async def upsert_rows(self, table, rows, on_conflict):
+        return await self._write(table, rows, on_conflict)
+
+
+def make_writer(tmp_path, db, **kwargs) -> EventWriter:
+    return EventWriter(
+        db,
+        retry_backoff=0.0,
+        spill_path=str(tmp_path / "spill.jsonl"),
+        dead_letter_dir=str(tmp_path / "dead_letter"),
+        **kwargs
+    )
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_groups_by_table_and_columns():
+    items = [
+        ('camera_events', None, {'a': 1}),
+        ('camera_events', None, {'a': 2, 'b': 1}),
+        ('camera_events', None, {'a': 3}),
+        ('people_events', None, {'a': 4})
+    ]
+
+    groups = EventWriter._group(items)
+
+    assert groups == [
+        ('camera_events', None, [{'a': 1}, {'a': 3}]),
+        ('camera_events', None, [{'a': 2, 'b': 1}]),
+        ('people_events', None, [{'a': 4}])
+    ]
+
+
+def test_upserts_keep_last_row_per_key():
+    items = [
+        ('customer_segments', 'customer_id', {'customer_id': 'c1', 'visit_count': 1}),
+        ('customer_segments', 'customer_id', {'customer_id': 'c2', 'visit_count': 1}),
+        ('customer_segments', 'customer_id', {'customer_id': 'c1', 'visit_count': 2})
+    ]
+
+    (_, on_conflict, rows), = EventWriter._group(items)
+
+    assert on_conflict == 'customer_id'
+    assert rows == [{'customer_id': 'c2', 'visit_count': 1}, {'customer_id': 'c1', 'visit_count': 2}]
+
+
+def test_flush_writes_in_batches(tmp_path):
+    db = FakeDB()
+    writer = make_writer(tmp_path, db, batch_size=2)
+    for i in range(5):
+        writer.enqueue('camera_events', {'i': i})
+
+    asyncio.run(writer.flush())
+
+    assert [len(rows) for _, _, rows in db.calls] == [2, 2, 1]
+    assert writer.stats['written'] == 5
+    assert not writer.queue
+
+
+def test_transient_error_is_retried(tmp_path):
+    db = FakeDB()
+    db.transient_failures = 2
+    writer = make_writer(tmp_path, db, max_retries=3)
+    writer.enqueue('camera_events', {'i': 1})
+
+    asyncio.run(writer.flush())
+
+    assert writer.stats['retries'] == 2
+    assert writer.stats['written'] == 1
+    assert not os.path.exists(tmp_path / "spill.jsonl")
+
+
+def test_unreachable_database_spills_remaining_groups(tmp_path):
+    db = FakeDB()
+    db.transient_failures = 100
+    writer = make_writer(tmp_path, db, max_retries=1)
+    writer.enqueue('camera_events', {'i': 1})
+    writer.enqueue('people_events', {'j': 1})
+
+    asyncio.run(writer.flush())
+
+    # Só o primeiro grupo tenta (1 + 1 retry); o segundo vai direto para o spill
+    assert len(db.calls) == 2
+    spilled = read_jsonl(tmp_path / "spill.jsonl")
+    assert [entry['table'] for entry in spilled] == ['camera_events', 'people_events']
+    assert writer.stats['spilled'] == 2
+
+
+def test_rejected_batch_goes_to_dead_letter_without_retry(tmp_path):
+    db = FakeDB()
+    db.rejected_tables = {'predictions'}
+    writer = make_writer(tmp_path, db, max_retries=3)
+    writer.enqueue('predictions', {'prediction_type': 'next_hour'})
+    writer.enqueue('camera_events', {'i': 1})
+
+    asyncio.run(writer.flush())
+
+    assert [table for table, _, _ in db.calls] == ['predictions', 'camera_events']
+    assert writer.stats['retries'] == 0
+    assert writer.stats['written'] == 1
+    dead = read_jsonl(tmp_path / "dead_letter" / "predictions.jsonl")
+    assert dead[0]['row'] == {'prediction_type': 'next_hour'}
+    assert '42P01' in dead[0]['error']
+    assert not os.path.exists(tmp_path / "spill.jsonl")
+
+
+def test_full_queue_spills_in_one_write_on_flush(tmp_path):
+    db = FakeDB()
+    writer = make_writer(tmp_path, db, max_queue=1)
+    writer.enqueue('camera_events', {'i': 0})
+    writer.enqueue('camera_events', {'i': 1})
+    writer.enqueue('camera_events', {'i': 2})
+
+    # Nada é gravado em disco no caminho do frame
+    assert not os.path.exists(tmp_path / "spill.jsonl")
+    assert writer.get_stats()['spill_buffered'] == 2
+
+    asyncio.run(writer.flush())
+
+    assert [entry['row']['i'] for entry in read_jsonl(tmp_path / "spill.jsonl")] == [1, 2]
+    assert writer.get_stats()['spill_buffered'] == 0
+
+
+def test_replay_writes_spill_and_dead_letters_poison_rows(tmp_path):
+    db = FakeDB()
+    db.transient_failures = 100
+    writer = make_writer(tmp_path, db, max_retries=0)
+    writer.enqueue('camera_events', {'i': 1})
+    writer.enqueue('predictions', {'prediction_type': 'next_hour'})
+    asyncio.run(writer.flush())
+    assert writer.stats['spilled'] == 2
+
+    db.transient_failures = 0
+    db.rejected_tables = {'predictions'}
+    written = asyncio.run(writer.replay_spill())
+
+    assert written == 1
+    assert not os.path.exists(tmp_path / "spill.jsonl")
+    assert not os.path.exists(tmp_path / "spill.jsonl.replay")
+    assert len(read_jsonl(tmp_path / "dead_letter" / "predictions.jsonl")) == 1
+
+    # Segundo replay não encontra nada para reenviar
+    assert asyncio.run(writer.replay_spill()) == 0
+
+
+class GatedDB(FakeDB):
+    """Segura cada escrita até o teste liberar o gate"""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = asyncio.Event()
+        self.writing = asyncio.Event()
+
+    async def _write(self, table, rows, on_conflict=None):
+        self.writing.set()
+        await self.gate.wait()
+        return await super()._write(table, rows, on_conflict)
+
+
+def test_close_during_flush_keeps_in_flight_rows(tmp_path):
+    async def scenario():
+        db = GatedDB()
+        writer = make_writer(tmp_path, db, flush_interval_ms=1.0)
+        await writer.start()
+        writer.enqueue('camera_events', {'i': 1})
+        writer.enqueue('camera_events', {'i': 2})
+
+        # O loop já tirou as linhas da fila e está no meio do insert
+        await db.writing.wait()
+        assert not writer.queue
+
+        closing = asyncio.create_task(writer.close())
+        await asyncio.sleep(0.01)
+        writer.enqueue('camera_events', {'i': 3})
+        db.gate.set()
+        await closing
+        return db, writer
+
+    db, writer = asyncio.run(scenario())
+
+    assert sorted(row['i'] for _, _, rows in db.calls for row in rows) == [1, 2, 3]
+    assert writer.stats['written'] == 3
+    assert not os.path.exists(tmp_path / "spill.jsonl")
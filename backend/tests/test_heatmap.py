@@ -0,0 +1,78 @@
+"""
+Testes do HeatmapAccumulator (decaimento preguiçoso e buckets por hora)
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from core.ai.heatmap import HeatmapAccumulator
+
+
+def test_decay_halves_after_half_life():
+    heatmap = HeatmapAccumulator(320, 240, half_life=60.0)
+    start = datetime(2026, 1, 1, 10, 0, 0)
+    heatmap.add_points([(100, 100)], start)
+
+    peak = heatmap.values(start).max()
+
+    assert heatmap.values(start + timedelta(seconds=60)).max() == pytest.approx(peak / 2)
+    assert heatmap.values(start + timedelta(seconds=120)).max() == pytest.approx(peak / 4)
+
+
+def test_newer_points_weigh_more_than_decayed_ones():
+    heatmap = HeatmapAccumulator(320, 240, half_life=60.0, sigma=0.5)
+    start = datetime(2026, 1, 1, 10, 0, 0)
+    heatmap.add_points([(20, 20)], start)
+    heatmap.add_points([(300, 200)], start + timedelta(seconds=60))
+
+    grid = heatmap.values()
+
+    assert grid[heatmap._cell(300, 200)] == pytest.approx(2 * grid[heatmap._cell(20, 20)])
+
+
+def test_renormalization_keeps_values():
+    heatmap = HeatmapAccumulator(320, 240, half_life=1.0)
+    start = datetime(2026, 1, 1, 10, 0, 0)
+    heatmap.add_points([(100, 100)], start)
+    later = start + timedelta(seconds=100)  # Expoente > 50: renormaliza a grade
+    heatmap.add_points([(200, 200)], later)
+
+    assert heatmap.reference_time == later.timestamp()
+    assert heatmap.values(later)[heatmap._cell(200, 200)] == pytest.approx(1.0)
+
+
+def test_hour_buckets_count_without_decay():
+    heatmap = HeatmapAccumulator(320, 240, half_life=1.0)
+    ten = datetime(2026, 1, 1, 10, 15)
+    eleven = datetime(2026, 1, 1, 11, 5)
+    heatmap.add_points([(100, 100), (100, 100)], ten)
+    heatmap.add_points([(100, 100)], eleven)
+    heatmap.add_points([(-10, 5000)], eleven)  # Fora da grade: ignorado
+
+    assert heatmap.hourly['2026-01-01T10'].sum() == 2
+    assert heatmap.hourly['2026-01-01T11'].sum() == 1
+    assert heatmap.render_hour(datetime(2026, 1, 1, 12)) is None
+
+    image = heatmap.render_hour(ten)
+    assert image.dtype == np.uint8
+    assert image.shape == (240, 320)
+    assert heatmap.render_hour(ten, full_resolution=False).max() == 255
+
+
+def test_hour_buckets_are_bounded():
+    heatmap = HeatmapAccumulator(64, 64, max_hour_buckets=3)
+    start = datetime(2026, 1, 1, 0, 0)
+    for hour in range(5):
+        heatmap.add_points([(10, 10)], start + timedelta(hours=hour))
+
+    assert list(heatmap.hourly) == ['2026-01-01T02', '2026-01-01T03', '2026-01-01T04']
+
+
+def test_render_empty_heatmap():
+    heatmap = HeatmapAccumulator(64, 48)
+    image = heatmap.render()
+
+    assert image.shape == (48, 64)
+    assert not image.any()
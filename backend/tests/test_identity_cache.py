@@ -0,0 +1,63 @@
+"""
+Testes do cache de identidade por track (re-verificação, TTL e limite de tamanho)
+"""
+
+from core.ai.identity_cache import TrackIdentityCache
+
+
+def test_new_track_needs_verification():
+    cache = TrackIdentityCache()
+    assert cache.needs_verification(cache.get("cam:1", now=0.0), quality=0.5, now=0.0)
+
+
+def test_confident_identity_is_reused_until_reverify_interval():
+    cache = TrackIdentityCache(reverify_interval=10.0)
+    entry = cache.store("cam:1", "customer", "c1", confidence=0.9, quality=0.5, now=0.0)
+
+    assert not cache.needs_verification(entry, quality=0.5, now=9.9)
+    assert cache.needs_verification(entry, quality=0.5, now=10.0)
+
+
+def test_low_confidence_reverifies_sooner():
+    cache = TrackIdentityCache(reverify_interval=9.0, low_confidence=0.3)
+    entry = cache.store("cam:1", "customer", "c1", confidence=0.1, quality=0.5, now=0.0)
+
+    assert cache.needs_verification(entry, quality=0.5, now=3.0)
+
+
+def test_better_face_forces_reverification():
+    cache = TrackIdentityCache(retry_interval=1.0, quality_gain=0.2)
+    entry = cache.store("cam:1", "customer", "c1", confidence=0.9, quality=0.5, now=0.0)
+
+    assert not cache.needs_verification(entry, quality=0.55, now=2.0)
+    assert cache.needs_verification(entry, quality=0.7, now=2.0)
+
+
+def test_failed_attempt_waits_retry_interval():
+    cache = TrackIdentityCache(retry_interval=1.0)
+    entry = cache.mark_attempt("cam:1", "unknown", now=0.0)
+
+    assert not cache.needs_verification(entry, quality=0.0, now=0.5)
+    assert cache.needs_verification(entry, quality=0.0, now=1.0)
+
+
+def test_prune_removes_entries_past_ttl():
+    cache = TrackIdentityCache(ttl=60.0)
+    cache.store("cam:1", "customer", "c1", confidence=0.9, quality=0.5, now=0.0)
+    cache.store("cam:2", "customer", "c2", confidence=0.9, quality=0.5, now=30.0)
+
+    # get() renova o last_seen e move o track para o fim
+    cache.get("cam:1", now=50.0)
+
+    assert cache.prune(now=89.0) == 0
+    assert cache.prune(now=95.0) == 1
+    assert list(cache.entries) == ["cam:1"]
+
+
+def test_prune_enforces_max_size():
+    cache = TrackIdentityCache(ttl=1e9, max_size=2)
+    for i in range(4):
+        cache.store(f"cam:{i}", "customer", f"c{i}", confidence=0.9, quality=0.5, now=float(i))
+
+    assert cache.prune(now=4.0) == 2
+    assert list(cache.entries) == ["cam:2", "cam:3"]
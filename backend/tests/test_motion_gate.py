@@ -0,0 +1,55 @@
+"""
+Testes do gate de movimento
+"""
+
+import numpy as np
+
+from core.motion_gate import MotionGate
+
+
+def static_frame():
+    return np.full((240, 320, 3), 80, dtype=np.uint8)
+
+
+def test_first_frame_always_inferred():
+    gate = MotionGate()
+    assert gate.should_infer(static_frame(), now=0.0)
+    assert gate.last_motion_ratio == 1.0
+
+
+def test_static_empty_scene_is_gated():
+    gate = MotionGate(force_interval=5.0)
+    gate.should_infer(static_frame(), now=0.0)
+    gate.record_inference([], result={}, now=0.0)
+
+    assert not gate.should_infer(static_frame(), now=1.0)
+    assert gate.frames_gated == 1
+    assert gate.get_stats()['gated_ratio'] == 0.5
+
+
+def test_people_in_last_detection_force_inference():
+    gate = MotionGate(force_interval=5.0)
+    gate.should_infer(static_frame(), now=0.0)
+    gate.record_inference([{'center': [10, 10]}], result={}, now=0.0)
+
+    assert gate.should_infer(static_frame(), now=1.0)
+
+
+def test_motion_forces_inference():
+    gate = MotionGate(force_interval=5.0)
+    gate.should_infer(static_frame(), now=0.0)
+    gate.record_inference([], result={}, now=0.0)
+
+    moved = static_frame()
+    moved[60:180, 100:220] = 255
+    assert gate.should_infer(moved, now=1.0)
+    assert gate.last_motion_ratio > gate.motion_threshold
+
+
+def test_force_interval_expires():
+    gate = MotionGate(force_interval=5.0)
+    gate.should_infer(static_frame(), now=0.0)
+    gate.record_inference([], result={}, now=0.0)
+
+    assert not gate.should_infer(static_frame(), now=4.9)
+    assert gate.should_infer(static_frame(), now=5.0)
@@ -0,0 +1,137 @@
+"""
+Testes do registro de pipeline por câmera (criação, isolamento, eviction, detect)
+"""
+
+import asyncio
+
+import numpy as np
+
+from core.motion_gate import MotionGate
+from core.pipeline_state import DETECTED, GATED, PREDICTED, CameraPipelineRegistry, CameraPipelineState
+from core.tracker import DetectionCadence, PersonTracker
+
+
+def make_registry(**kwargs) -> CameraPipelineRegistry:
+    return CameraPipelineRegistry(
+        tracker_factory=PersonTracker,
+        cadence_factory=lambda camera_id: DetectionCadence(),
+        **kwargs
+    )
+
+
+def detection(x, y, confidence=0.9, size=40):
+    return {
+        'bbox': [x - size // 2, y - size, x + size // 2, y + size],
+        'center': [x, y],
+        'confidence': confidence,
+        'width': size,
+        'height': 2 * size
+    }
+
+
+class FakeDetector:
+    def __init__(self, detections):
+        self.detections = detections
+        self.calls = 0
+
+    async def detect_persons(self, frame):
+        self.calls += 1
+        return [dict(d) for d in self.detections]
+
+
+def test_get_creates_one_state_per_camera():
+    registry = make_registry()
+
+    first = registry.get('cam-a')
+    assert registry.get('cam-a') is first
+    second = registry.get('cam-b')
+
+    assert second is not first
+    assert second.tracker is not first.tracker
+    assert second.motion_gate is not first.motion_gate
+    assert set(registry.states) == {'cam-a', 'cam-b'}
+
+
+def test_motion_gate_disabled():
+    registry = make_registry(motion_gate_enabled=False)
+    assert registry.get('cam-a').motion_gate is None
+
+
+def test_evict_idle_drops_only_idle_cameras():
+    registry = make_registry(idle_timeout=60.0, eviction_interval=0.0)
+    idle = registry.get('idle')
+    active = registry.get('active')
+    now = active.last_seen + 120.0
+    active.last_seen = now - 1.0
+
+    evicted = asyncio.run(registry.evict_idle(now=now))
+
+    assert evicted == ['idle']
+    assert 'idle' not in registry.states
+    assert registry.get('active') is active
+    assert registry.get('idle') is not idle
+
+
+def test_evict_idle_skips_locked_camera():
+    registry = make_registry(idle_timeout=60.0, eviction_interval=0.0)
+    state = registry.get('busy')
+
+    async def run():
+        async with state.lock:
+            return await registry.evict_idle(now=state.last_seen + 120.0)
+
+    assert asyncio.run(run()) == []
+    assert 'busy' in registry.states
+
+
+def test_evict_idle_respects_interval():
+    registry = make_registry(idle_timeout=0.0, eviction_interval=30.0)
+    registry.get('cam-a').last_seen = 900.0
+    registry._last_eviction = 1000.0
+
+    assert asyncio.run(registry.evict_idle(now=1010.0)) == []
+    assert asyncio.run(registry.evict_idle(now=1031.0)) == ['cam-a']
+
+
+def test_detect_follows_cadence():
+    state = CameraPipelineState('cam', PersonTracker(), DetectionCadence(interval=3, crowded_tracks=8))
+    detector = FakeDetector([detection(100, 100)])
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    sources = [asyncio.run(state.detect(frame, detector))[1] for _ in range(6)]
+
+    assert sources == [DETECTED, PREDICTED, PREDICTED, DETECTED, PREDICTED, PREDICTED]
+    assert detector.calls == 2
+
+
+def test_detect_reuses_gated_result():
+    gate = MotionGate(force_interval=1e9)
+    state = CameraPipelineState('cam', PersonTracker(), DetectionCadence(), motion_gate=gate)
+    detector = FakeDetector([])
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    detections, source = asyncio.run(state.detect(frame, detector))
+    assert source == DETECTED and detections == []
+    gate.record_inference(detections, result={'people': 0})
+
+    detections, source = asyncio.run(state.detect(frame, detector))
+    assert source == GATED
+    assert detector.calls == 1
+
+
+def test_track_ids_are_unique_across_cameras_and_evictions():
+    registry = make_registry(idle_timeout=60.0, eviction_interval=0.0)
+    first_a = [detection(100, 100)]
+    first_b = [detection(100, 100)]
+    registry.get('cam-a').tracker.update(first_a)
+    registry.get('cam-b').tracker.update(first_b)
+    assert first_a[0]['track_id'] != first_b[0]['track_id']
+
+    # Câmera descartada e recriada: person_0001 do novo tracker não herda o ID antigo
+    state = registry.get('cam-a')
+    asyncio.run(registry.evict_idle(now=state.last_seen + 120.0))
+    again = [detection(100, 100)]
+    registry.get('cam-a').tracker.update(again)
+
+    assert again[0]['track_id'] not in (first_a[0]['track_id'], first_b[0]['track_id'])
+    assert again[0]['track_id'].endswith('_0001')
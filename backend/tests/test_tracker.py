@@ -0,0 +1,162 @@
+"""
+Testes do tracking: associação húngara (centroid), estágios do ByteTrack, predição e cadência
+"""
+
+from core.tracker import ByteTracker, DetectionCadence, PersonTracker, create_tracker, detector_confidence
+
+
+def detection(x, y, confidence=0.9, width=40, height=80):
+    return {
+        'bbox': [x - width / 2, y - height / 2, x + width / 2, y + height / 2],
+        'center': [x, y],
+        'confidence': confidence,
+        'width': width,
+        'height': height
+    }
+
+
+def test_hungarian_prefers_global_optimum():
+    tracker = PersonTracker(max_distance=50.0)
+    first = [detection(100, 100), detection(130, 100)]
+    tracker.update(first)
+    track_a, track_b = first[0]['track_id'], first[1]['track_id']
+
+    # Guloso casaria A com a detecção em 120 (mais próxima) e deixaria B sem par
+    second = [detection(120, 100), detection(95, 100)]
+    tracker.update(second)
+
+    assert second[1]['track_id'] == track_a
+    assert second[0]['track_id'] == track_b
+    assert len(tracker.tracked_persons) == 2
+
+
+def test_gating_creates_new_track_beyond_max_distance():
+    tracker = PersonTracker(max_distance=50.0)
+    first = [detection(100, 100)]
+    tracker.update(first)
+
+    second = [detection(300, 100)]
+    tracker.update(second)
+
+    assert second[0]['track_id'] != first[0]['track_id']
+    assert len(tracker.tracked_persons) == 2
+
+
+def test_bytetrack_low_confidence_only_extends_existing_tracks():
+    tracker = ByteTracker(high_threshold=0.5, low_threshold=0.1)
+    first = [detection(100, 100, confidence=0.9)]
+    tracker.update(first)
+    track_id = first[0]['track_id']
+
+    # Oclusão: mesma pessoa com confiança baixa + detecção baixa sem track
+    second = [detection(102, 100, confidence=0.3), detection(400, 300, confidence=0.3)]
+    tracker.update(second)
+
+    assert second[0]['track_id'] == track_id
+    assert 'track_id' not in second[1]
+    assert list(tracker.tracked_persons) == [track_id]
+
+
+def test_bytetrack_high_confidence_matched_first():
+    tracker = ByteTracker(high_threshold=0.5, low_threshold=0.1)
+    first = [detection(100, 100, confidence=0.9)]
+    tracker.update(first)
+    track_id = first[0]['track_id']
+
+    second = [detection(101, 100, confidence=0.2), detection(103, 100, confidence=0.8)]
+    tracker.update(second)
+
+    assert second[1]['track_id'] == track_id
+    assert 'track_id' not in second[0]
+
+
+def test_bytetrack_drops_below_low_threshold():
+    tracker = ByteTracker(high_threshold=0.5, low_threshold=0.1)
+    detections = [detection(100, 100, confidence=0.05)]
+    tracker.update(detections)
+
+    assert 'track_id' not in detections[0]
+    assert not tracker.tracked_persons
+
+
+def test_bytetrack_removes_track_after_buffer():
+    tracker = ByteTracker(track_buffer=2)
+    tracker.update([detection(100, 100)])
+
+    for _ in range(3):
+        tracker.update([])
+
+    assert not tracker.tracked_persons
+
+
+def test_create_tracker_and_detector_confidence():
+    assert isinstance(create_tracker('bytetrack', low_threshold=0.2), ByteTracker)
+    assert type(create_tracker('unknown', low_threshold=0.2)) is PersonTracker
+    assert detector_confidence('bytetrack', 0.5, 0.1) == 0.1
+    assert detector_confidence('centroid', 0.5, 0.1) == 0.5
+
+
+def test_predict_skips_tracks_missed_by_the_detector():
+    tracker = PersonTracker(max_distance=50.0)
+    tracker.update([detection(100, 100), detection(300, 100)])
+
+    # Só a primeira pessoa é detectada de novo: a segunda não vira fantasma nos frames previstos
+    second = [detection(105, 100)]
+    tracker.update(second)
+    tracker.predict()
+
+    assert [d['track_id'] for d in tracker.get_track_detections()] == [second[0]['track_id']]
+    assert len(tracker.active_persons()) == 1
+    assert len(tracker.tracked_persons) == 2
+
+
+def test_predicted_frames_are_capped():
+    tracker = PersonTracker(max_predicted_frames=2)
+    first = [detection(100, 100)]
+    tracker.update(first)
+
+    for _ in range(2):
+        tracker.predict()
+        assert tracker.get_track_detections()[0]['predicted']
+
+    tracker.predict()
+
+    assert tracker.get_track_detections() == []
+    assert not tracker.active_persons()
+    # Sem tracks ativos a cadência volta a detectar no próximo frame
+    assert DetectionCadence(interval=4).should_detect(len(tracker.active_persons()))
+
+    # Detectado de novo, o track volta a ser ativo com o mesmo ID
+    again = [detection(102, 100)]
+    tracker.update(again)
+    assert again[0]['track_id'] == first[0]['track_id']
+    assert len(tracker.active_persons()) == 1
+
+
+def test_line_crossing_ignores_predicted_positions():
+    tracker = PersonTracker(max_distance=100.0)
+    tracker.update([detection(100, 300)])
+    tracker.update([detection(100, 340)])
+
+    # Kalman extrapola a descida além da linha (y=360) sem nenhuma detecção
+    tracker.predict()
+    assert tracker.tracked_persons['person_0001'].positions[-1][1] > 360
+    assert tracker.check_line_crossings(0.5) == []
+
+    # A pessoa volta a ser vista antes da linha: nada foi contado
+    tracker.update([detection(100, 350)])
+    assert tracker.check_line_crossings(0.5) == []
+
+    # Cruzamento medido pelo detector conta uma vez
+    tracker.update([detection(100, 380)])
+    crossings = tracker.check_line_crossings(0.5)
+    assert [(c['person_id'], c['action']) for c in crossings] == [('person_0001', 'ENTER')]
+
+
+def test_cadence_shrinks_interval_when_crowded():
+    cadence = DetectionCadence(interval=4, crowded_tracks=8)
+
+    assert cadence.current_interval(1) == 4
+    assert cadence.current_interval(8) == 1
+    assert cadence.should_detect(0)
+    assert [cadence.should_detect(1) for _ in range(4)] == [False, False, False, True]
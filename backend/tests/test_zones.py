@@ -0,0 +1,61 @@
+"""
+Testes das zonas: ZoneRaster (bitmasks) e retângulos exatos do TemporalPurchaseAnalyzer
+"""
+
+import numpy as np
+
+from core.ai.temporal_analysis.purchase_analyzer import TemporalPurchaseAnalyzer
+from core.ai.zone_raster import ZoneRaster
+
+
+def square(x1, y1, x2, y2):
+    return [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+
+
+def test_raster_lookup_and_overlap():
+    raster = ZoneRaster(400, 300, scale=0.25).build({
+        'left': square(0, 0, 200, 300),
+        'center': square(100, 100, 300, 200)
+    })
+
+    masks = raster.lookup(np.array([50, 150, 350, 1000]), np.array([50, 150, 150, 50]))
+
+    assert raster.zones_in(masks[0]) == ['left']
+    assert raster.zones_in(masks[1]) == ['left', 'center']
+    assert raster.zones_in(masks[2]) == []
+    assert masks[3] == 0
+
+
+def test_raster_first_zone_follows_definition_order():
+    raster = ZoneRaster(100, 100, scale=1.0).build({
+        'a': square(0, 0, 50, 50),
+        'b': square(0, 0, 100, 100)
+    })
+
+    assert raster.first_zone(raster.lookup(np.array([10]), np.array([10]))[0]) == 'a'
+    assert raster.first_zone(raster.lookup(np.array([80]), np.array([80]))[0]) == 'b'
+    assert raster.first_zone(0) is None
+
+
+def test_raster_widens_dtype_with_zone_count():
+    zones = {f"z{i}": square(i, 0, i + 1, 1) for i in range(20)}
+    assert ZoneRaster(20, 1, scale=1.0).build(zones).raster.dtype == np.uint32
+
+
+def test_purchase_zones_match_exact_rectangle_test():
+    analyzer = TemporalPurchaseAnalyzer()
+
+    def reference(x, y):
+        for zone_id, zone in analyzer.store_zones.items():
+            c = zone.coordinates
+            if c['x1'] <= x <= c['x2'] and c['y1'] <= y <= c['y2']:
+                return zone_id
+        return 'other'
+
+    points = [tuple(p) for p in np.random.default_rng(0).uniform(-5, 105, size=(5000, 2))]
+    # Bordas exatas das zonas (onde o raster arredondado errava)
+    points += [(40, 60), (40.2, 60), (30, 70), (70, 85), (100, 100), (15, 15), (42.5, 20)]
+
+    assert analyzer.get_zones(points) == [reference(x, y) for x, y in points]
+    assert analyzer.get_zone((50, 75)) == 'cashier'
+    assert analyzer.get_zones([]) == []
@@ -4,7 +4,7 @@
 CREATE TABLE IF NOT EXISTS public.customer_segments (
     id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
     customer_id TEXT NOT NULL,
-    segment TEXT NOT NULL CHECK (segment IN ('regular', 'new', 'vip', 'frequent', 'occasional', 'browser', 'buyer')),
+    segment TEXT NOT NULL CHECK (segment IN ('regular', 'new', 'vip', 'frequent', 'occasional', 'browser', 'buyer', 'at_risk')),
     first_visit TIMESTAMPTZ DEFAULT NOW(),
     last_visit TIMESTAMPTZ DEFAULT NOW(),
     visit_count INTEGER DEFAULT 1 CHECK (visit_count >= 1),
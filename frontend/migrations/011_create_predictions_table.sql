@@ -0,0 +1,36 @@
+-- Predictions Table - Armazena predições do Predictive Engine (validadas depois com o valor real)
+-- Execute este SQL no dashboard do Supabase
+
+CREATE TABLE IF NOT EXISTS public.predictions (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    prediction_type TEXT NOT NULL,
+    prediction_value JSONB NOT NULL DEFAULT '{}',
+    actual_value JSONB,
+    confidence_score REAL DEFAULT 0.5,
+    accuracy_score REAL CHECK (accuracy_score >= 0.0 AND accuracy_score <= 1.0),
+    metadata JSONB DEFAULT '{}',
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Índices para melhor performance
+CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON public.predictions(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_predictions_prediction_type ON public.predictions(prediction_type);
+
+-- Índice composto para queries comuns (histórico por tipo e UPDATE de accuracy por tipo + timestamp)
+CREATE INDEX IF NOT EXISTS idx_predictions_type_timestamp ON public.predictions(prediction_type, timestamp DESC);
+
+-- RLS (Row Level Security)
+ALTER TABLE public.predictions ENABLE ROW LEVEL SECURITY;
+
+-- Política para permitir operações para usuários autenticados
+CREATE POLICY "Allow all operations for authenticated users" ON public.predictions
+    FOR ALL USING (true);
+
+-- Comentários para documentação
+COMMENT ON TABLE public.predictions IS 'Predições de fluxo, conversão e staffing com validação posterior';
+COMMENT ON COLUMN public.predictions.prediction_type IS 'Tipo da predição (next_hour, conversion_prob, optimal_staff, etc.)';
+COMMENT ON COLUMN public.predictions.prediction_value IS 'Valor previsto em formato JSON';
+COMMENT ON COLUMN public.predictions.actual_value IS 'Valor real observado (preenchido na validação)';
+COMMENT ON COLUMN public.predictions.confidence_score IS 'Confiança do modelo na predição (score do modelo)';
+COMMENT ON COLUMN public.predictions.accuracy_score IS 'Accuracy calculada contra o valor real (0-1)';
@@ -0,0 +1,10 @@
+-- Customer Segments - Segmento 'at_risk' (clientes recorrentes que pararam de vir)
+-- Execute este SQL no dashboard do Supabase (bancos criados antes desta migration)
+-- O CustomerSegmentation classifica em new, regular, vip, occasional e at_risk;
+-- sem 'at_risk' no CHECK o upsert de perfis é rejeitado.
+
+ALTER TABLE public.customer_segments DROP CONSTRAINT IF EXISTS customer_segments_segment_check;
+ALTER TABLE public.customer_segments ADD CONSTRAINT customer_segments_segment_check
+    CHECK (segment IN ('regular', 'new', 'vip', 'frequent', 'occasional', 'browser', 'buyer', 'at_risk'));
+
+COMMENT ON COLUMN public.customer_segments.segment IS 'Segmento do cliente (vip, regular, new, occasional, at_risk, etc.)';